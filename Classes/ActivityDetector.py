@@ -0,0 +1,170 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class ActivityDetector:
+    """
+    Detecta movimento na quadra para decidir quando salvar clipes. Cada
+    frame analisado é reduzido (ex: 160x120) e convertido para cinza numa
+    área pré-alocada; a diferença para o frame anterior (ou para um fundo
+    médio) é limiarizada e contada só dentro das regiões de interesse.
+    Tudo roda em operações vetorizadas do OpenCV, sem laços em Python.
+
+    A histerese evita ligar/desligar a cada frame: a atividade começa após
+    `on_frames` análises seguidas acima de `on_ratio` e termina depois de
+    `hold_s` segundos abaixo de `off_ratio`.
+    """
+
+    METHOD_DIFF = "diff"              # Diferença para o frame analisado anterior
+    METHOD_BACKGROUND = "background"  # Diferença para um fundo médio (média móvel)
+
+    def __init__(self, frame_size: tuple, fps: float, width: int = 160, method: str = METHOD_DIFF,
+                 roi=None, pixel_threshold: int = 25, on_ratio: float = 0.004, off_ratio: float = 0.001,
+                 on_frames: int = 3, hold_s: float = 3.0, stride: int = 2, alpha: float = 0.05,
+                 budget_ms: float = 2.0):
+        """
+        :param frame_size: (largura, altura) dos frames capturados.
+        :param fps: Taxa de quadros da captura.
+        :param width: Largura da imagem reduzida usada na análise.
+        :param method: 'diff' (frame anterior) ou 'background' (fundo médio).
+        :param roi: Regiões de interesse: lista de polígonos com pontos
+                    normalizados [(x, y), ...] entre 0 e 1, ou uma máscara
+                    (array 2D, não-zero = analisar). None = imagem inteira.
+        :param pixel_threshold: Diferença mínima de cinza para um pixel contar como movimento.
+        :param on_ratio: Fração da ROI em movimento para considerar atividade.
+        :param off_ratio: Fração abaixo da qual a atividade é considerada parada.
+        :param on_frames: Análises seguidas acima de on_ratio para iniciar a atividade.
+        :param hold_s: Segundos abaixo de off_ratio para encerrar a atividade.
+        :param stride: Analisa 1 a cada N frames.
+        :param alpha: Taxa de adaptação do fundo médio (método 'background').
+        :param budget_ms: Orçamento de CPU por frame analisado (só para as estatísticas).
+        """
+        if method not in (self.METHOD_DIFF, self.METHOD_BACKGROUND):
+            raise ValueError(f"Método de detecção inválido: {method}")
+        frame_width, frame_height = frame_size
+        self._size = (width, max(2, int(round(frame_height * width / frame_width))))
+        self._method = method
+        self._pixel_threshold = pixel_threshold
+        self._on_ratio = on_ratio
+        self._off_ratio = off_ratio
+        self._on_frames = on_frames
+        self._stride = max(1, stride)
+        self._off_frames = max(1, int(round(hold_s * fps / self._stride)))
+        self._alpha = alpha
+        self._budget_ms = budget_ms
+
+        # Áreas de trabalho pré-alocadas: nenhuma alocação por frame
+        w, h = self._size
+        self._small = np.empty((h, w, 3), dtype=np.uint8)
+        self._gray = np.empty((h, w), dtype=np.uint8)
+        self._previous = np.empty((h, w), dtype=np.uint8)
+        self._background = np.empty((h, w), dtype=np.float32)
+        self._reference = np.empty((h, w), dtype=np.uint8)
+        self._diff = np.empty((h, w), dtype=np.uint8)
+        self._mask = self._build_mask(roi)
+        self._mask_pixels = max(1, int(cv2.countNonZero(self._mask)))
+        self._primed = False
+
+        self._counter = 0
+        self._above = 0
+        self._below = 0
+        self.active = False
+
+        self._stats_lock = threading.Lock()
+        self._processed = 0
+        self._events = 0
+        self._last_ratio = 0.0
+        self._cost_total = 0.0
+        self._cost_max = 0.0
+        self._over_budget = 0
+
+    def _build_mask(self, roi):
+        w, h = self._size
+        if roi is None:
+            return np.full((h, w), 255, dtype=np.uint8)
+        if isinstance(roi, np.ndarray):
+            mask = (roi != 0).astype(np.uint8) * 255
+            return cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        polygons = [np.array([(x * (w - 1), y * (h - 1)) for x, y in polygon], dtype=np.int32)
+                    for polygon in roi]
+        cv2.fillPoly(mask, polygons, 255)
+        return mask
+
+    def process(self, frame):
+        """
+        Analisa um frame (chamado para todos os frames; só 1 a cada
+        `stride` é processado).
+
+        :return: 'start' quando a atividade começa, 'end' quando termina, ou None.
+        """
+        self._counter += 1
+        if self._counter % self._stride:
+            return None
+        started = time.perf_counter()
+
+        cv2.resize(frame, self._size, dst=self._small, interpolation=cv2.INTER_NEAREST)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if not self._primed:
+            np.copyto(self._previous, self._gray)
+            self._background[...] = self._gray
+            self._primed = True
+            return None
+
+        if self._method == self.METHOD_DIFF:
+            cv2.absdiff(self._gray, self._previous, dst=self._diff)
+            np.copyto(self._previous, self._gray)
+        else:
+            cv2.convertScaleAbs(self._background, dst=self._reference)
+            cv2.absdiff(self._gray, self._reference, dst=self._diff)
+            cv2.accumulateWeighted(self._gray, self._background, self._alpha)
+        cv2.threshold(self._diff, self._pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        cv2.bitwise_and(self._diff, self._mask, dst=self._diff)
+        ratio = cv2.countNonZero(self._diff) / self._mask_pixels
+
+        event = self._update(ratio)
+        cost_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._processed += 1
+            self._last_ratio = ratio
+            self._cost_total += cost_ms
+            self._cost_max = max(self._cost_max, cost_ms)
+            if cost_ms > self._budget_ms:
+                self._over_budget += 1
+            if event is not None:
+                self._events += 1
+        return event
+
+    def _update(self, ratio):
+        """Histerese: liga após on_frames acima de on_ratio, desliga após hold_s abaixo de off_ratio."""
+        if not self.active:
+            self._above = self._above + 1 if ratio >= self._on_ratio else 0
+            if self._above >= self._on_frames:
+                self.active = True
+                self._below = 0
+                return "start"
+            return None
+        self._below = self._below + 1 if ratio < self._off_ratio else 0
+        if self._below >= self._off_frames:
+            self.active = False
+            self._above = 0
+            return "end"
+        return None
+
+    def stats(self):
+        """Frames analisados, eventos e custo por frame (média/máximo em ms)."""
+        with self._stats_lock:
+            return {
+                "processed": self._processed,
+                "active": self.active,
+                "events": self._events,
+                "last_ratio": self._last_ratio,
+                "cost_ms_mean": self._cost_total / self._processed if self._processed else 0.0,
+                "cost_ms_max": self._cost_max,
+                "budget_ms": self._budget_ms,
+                "over_budget": self._over_budget,
+                "analysis_size": self._size,
+            }
@@ -0,0 +1,223 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+
+class ClipExporter:
+    """
+    Exporta clipes fora da thread de captura.
+
+    O fluxo tem duas etapas:
+    1. Cópia: uma thread dedicada copia a janela marcada do buffer circular
+       logo após o pedido (rápido, limitado pela memória).
+    2. Codificação: um pool de threads grava os frames copiados no arquivo
+       (o cv2.VideoWriter e o pipe do ffmpeg liberam o GIL enquanto escrevem).
+
+    A fila de clipes aguardando codificação é limitada (max_queue): quando
+    cheia, submit() bloqueia ou recusa o pedido, evitando acumular cópias de
+    centenas de MB na memória.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 2):
+        """
+        Inicializa o exportador.
+
+        :param max_workers: Número de threads de codificação.
+        :param max_queue: Máximo de clipes copiados aguardando codificação.
+        """
+        self._max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._copy_queue = queue.Queue()
+        self._encode_queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "in_progress": 0,
+            "frames_lost_in_copy": 0,
+            "last_copy_s": 0.0,
+            "last_encode_s": 0.0,
+            "max_encode_s": 0.0,
+            "total_encode_s": 0.0,
+        }
+        self._closed = False
+
+        self._copy_thread = threading.Thread(target=self._copy_loop, name="ClipExporter-copy", daemon=True)
+        self._copy_thread.start()
+        self._workers = []
+        for n in range(max_workers):
+            worker = threading.Thread(target=self._encode_loop, name=f"ClipExporter-encode-{n}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    # --- API pública ---
+
+    def submit(self, buffer, title: str, encoder, fps: float, size: tuple,
+               callback=None, block: bool = True, timeout: float = None,
+               start_time: float = None, end_time: float = None, decimation: int = 1,
+               scale: float = 1.0, metadata: dict = None, namer=None):
+        """
+        Pede a exportação da janela atual do buffer.
+
+        :param buffer: FrameRingBuffer de onde os frames serão copiados.
+        :param title: Caminho completo do arquivo de saída.
+        :param encoder: VideoEncoder usado para gravar o clipe (ver Classes/Encoders.py).
+        :param fps: Taxa de quadros do arquivo.
+        :param size: (largura, altura) dos frames.
+        :param callback: Função chamada com o Future quando o clipe terminar.
+        :param block: Se False, recusa o pedido quando a fila estiver cheia.
+        :param timeout: Tempo máximo de espera por espaço na fila.
+        :param start_time: Início da janela (horário de captura); None = frame mais antigo.
+        :param end_time: Fim da janela; None = frame mais novo.
+        :param decimation: Grava 1 a cada N frames (o fps do arquivo é dividido por N).
+        :param scale: Fração da resolução gravada (1.0 = resolução da captura).
+        :param metadata: Dados extras incluídos no resultado do clipe.
+        :param namer: Função que recebe o horário de captura do primeiro frame
+                      copiado e retorna o caminho final do clipe (no lugar de title).
+        :return: Future cujo resultado é um dicionário com os dados do clipe.
+        :raises queue.Full: Se a fila estiver cheia (block=False ou timeout).
+        """
+        if self._closed:
+            raise RuntimeError("ClipExporter já foi finalizado.")
+
+        # A janela é marcada agora (barato), a cópia é feita na thread de cópia
+        mark = buffer.mark(start_time, end_time)
+        if decimation > 1:
+            # Só os frames mantidos são copiados do buffer
+            slots, timestamps = mark
+            mark = (slots[::decimation], timestamps[::decimation])
+        if scale != 1.0:
+            # Dimensões pares: exigidas pelo yuv420p dos encoders
+            size = (max(2, int(size[0] * scale) // 2 * 2), max(2, int(size[1] * scale) // 2 * 2))
+        options = {"fps": fps / decimation, "size": size, "metadata": metadata or {}, "namer": namer}
+        requested_at = time.time()
+
+        if not self._slots.acquire(blocking=block, timeout=timeout if block else None):
+            self._count("rejected")
+            raise queue.Full("Fila de exportação cheia.")
+
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        self._count("submitted")
+        self._copy_queue.put((buffer, mark, title, encoder, options, requested_at, future))
+        return future
+
+    def queue_depth(self):
+        """Número de clipes aguardando cópia ou codificação."""
+        return self._copy_queue.qsize() + self._encode_queue.qsize()
+
+    def metrics(self):
+        """Retorna um dicionário com as métricas do exportador."""
+        with self._metrics_lock:
+            data = dict(self._metrics)
+        data["queue_depth"] = self.queue_depth()
+        data["max_queue"] = self._max_queue
+        done = data["completed"] + data["failed"]
+        data["avg_encode_s"] = data["total_encode_s"] / done if done else 0.0
+        return data
+
+    def shutdown(self, wait: bool = True):
+        """Para de aceitar pedidos e (opcionalmente) espera os clipes pendentes."""
+        if self._closed:
+            return
+        self._closed = True
+        self._copy_queue.put(None)
+        if wait:
+            self._copy_thread.join()
+            for worker in self._workers:
+                worker.join()
+
+    # --- Threads internas ---
+
+    def _count(self, key, value=1):
+        with self._metrics_lock:
+            self._metrics[key] += value
+
+    def _copy_loop(self):
+        while True:
+            job = self._copy_queue.get()
+            if job is None:
+                # Propaga o sinal de parada para cada worker de codificação
+                for _ in self._workers:
+                    self._encode_queue.put(None)
+                return
+            buffer, mark, title, encoder, options, requested_at, future = job
+            start = time.perf_counter()
+            try:
+                frames, timestamps, lost = buffer.copy_marked(mark)
+            except Exception as e:
+                self._slots.release()
+                self._count("failed")
+                future.set_exception(e)
+                continue
+            with self._metrics_lock:
+                self._metrics["last_copy_s"] = time.perf_counter() - start
+                self._metrics["frames_lost_in_copy"] += lost
+            self._encode_queue.put((frames, timestamps, title, encoder, options, requested_at, future))
+
+    def _encode_loop(self):
+        while True:
+            job = self._encode_queue.get()
+            if job is None:
+                return
+            frames, timestamps, title, encoder, options, requested_at, future = job
+            fps, size = options["fps"], options["size"]
+            if options["namer"] is not None and len(timestamps):
+                # Nome pelo primeiro frame realmente gravado (o pedido chega no fim da janela)
+                title = options["namer"](float(timestamps[0]))
+            # O clipe saiu da fila: libera espaço para o próximo pedido
+            self._slots.release()
+            self._count("in_progress")
+            start = time.perf_counter()
+            try:
+                self._encode(frames, title, encoder, fps, size)
+                elapsed = time.perf_counter() - start
+                result = {
+                    "path": title,
+                    "codec": encoder.codec,
+                    "encoder": encoder.describe(),
+                    "fps": fps,
+                    "frames": len(frames),
+                    "start_time": float(timestamps[0]) if len(timestamps) else requested_at,
+                    "end_time": float(timestamps[-1]) if len(timestamps) else requested_at,
+                    "requested_at": requested_at,
+                    "encode_s": elapsed,
+                    "size": size,
+                }
+                result.update(options["metadata"])
+                self._finish(elapsed, "completed")
+                future.set_result(result)
+            except Exception as e:
+                self._finish(time.perf_counter() - start, "failed")
+                future.set_exception(e)
+
+    def _finish(self, elapsed, status):
+        with self._metrics_lock:
+            self._metrics["in_progress"] -= 1
+            self._metrics[status] += 1
+            self._metrics["last_encode_s"] = elapsed
+            self._metrics["total_encode_s"] += elapsed
+            self._metrics["max_encode_s"] = max(self._metrics["max_encode_s"], elapsed)
+
+    @staticmethod
+    def _encode(frames, title, encoder, fps, size):
+        out = encoder.open(title, fps, size)
+        try:
+            if len(frames) and (frames.shape[2], frames.shape[1]) != tuple(size):
+                # Resolução reduzida: redimensiona num único array reaproveitado
+                small = np.empty((size[1], size[0], frames.shape[3]), dtype=np.uint8)
+                for frame in frames:
+                    cv2.resize(frame, tuple(size), dst=small, interpolation=cv2.INTER_AREA)
+                    out.write(small)
+            else:
+                for frame in frames:
+                    out.write(frame)
+        finally:
+            out.release()
@@ -0,0 +1,403 @@
+"""
+Extração de um trecho por horário (ex: "o lance das 19:42:10 às 19:42:40")
+sem recodificar: os clipes que cobrem o intervalo são encontrados pelo
+índice (busca binária), cortados nos keyframes e os pacotes são copiados
+(remux) para um único arquivo pelo demuxer concat do ffmpeg.
+
+Os resultados ficam num cache LRU em disco com tamanho máximo: o mesmo
+lance pedido de novo é servido direto do arquivo já extraído.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from Classes.ClipIndex import get_clip_index
+from Classes.ClipLayout import location_slug
+from Classes.Log import get_logger
+from Classes.Metrics import REGISTRY
+from Classes.Transcoder import probe_clip
+
+log = get_logger("extract")
+
+EXTRACT_TOTAL = REGISTRY.counter("sport_capture_extract_total",
+                                 "Extrações de trechos por resultado (hit, miss, error).", ("result",))
+EXTRACT_SECONDS = REGISTRY.histogram("sport_capture_extract_seconds",
+                                     "Tempo de extração (remux) de um trecho, sem os acertos do cache (s).")
+
+# Temporários do cache: .<chave>.<pid>.<thread>, e a lista do concat com .txt no fim
+TEMP_NAME = re.compile(r"^\..+\.(\d+)\.\d+(?:\.txt)?$")
+
+
+class ExtractCache:
+    """
+    Cache LRU em disco: um arquivo por trecho extraído, nomeado pela chave.
+    Quando o total passa de `max_bytes`, os menos usados recentemente são
+    apagados. A ordem de uso é a data de acesso (atualizada a cada acerto; a
+    de modificação fica, para o ETag não mudar), então sobrevive a reinícios.
+
+    Vários processos da API (uvicorn/gunicorn com --workers) podem usar a
+    mesma pasta: a pasta é a fonte da verdade (um arquivo gerado por outro
+    processo também é um acerto), os temporários levam o PID de quem os
+    escreve e a limpeza relê a pasta sob uma trava de arquivo (flock).
+    """
+
+    LOCK_NAME = ".lock"
+    # Temporário mais velho que isso é de uma extração abandonada (o remux tem timeout de 300 s)
+    STALE_TEMP_S = 600.0
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._dir = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_temps()
+        self._enforce_limit()
+
+    @property
+    def directory(self):
+        return self._dir
+
+    def get(self, name: str):
+        """Caminho do arquivo em cache (marcado como usado agora) ou None."""
+        path = os.path.join(self._dir, name)
+        try:
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def temp_path(self, name: str):
+        """Caminho temporário para gerar uma entrada (renomeado em put())."""
+        return os.path.join(self._dir, f".{name}.{os.getpid()}.{threading.get_ident()}")
+
+    def put(self, name: str, temp_path: str):
+        """Move o arquivo gerado para o cache (troca atômica) e aplica o limite de tamanho."""
+        path = os.path.join(self._dir, name)
+        os.replace(temp_path, path)
+        self._enforce_limit(keep=name)
+        return path
+
+    def _remove_stale_temps(self):
+        """Apaga temporários de extrações interrompidas: de processos que já terminaram ou antigos demais."""
+        now = time.time()
+        for entry in os.scandir(self._dir):
+            if not entry.name.startswith(".") or entry.name == self.LOCK_NAME or not entry.is_file():
+                continue
+            owner = TEMP_NAME.match(entry.name)
+            stale = owner is not None and not _pid_alive(int(owner.group(1)))
+            try:
+                if stale or now - entry.stat().st_mtime > self.STALE_TEMP_S:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _enforce_limit(self, keep=None):
+        """
+        Relê a pasta e apaga os trechos menos usados até o total caber em
+        max_bytes. A trava de arquivo impede que dois processos decidam ao
+        mesmo tempo a partir de listas diferentes.
+        """
+        with self._lock, _FileLock(os.path.join(self._dir, self.LOCK_NAME)):
+            files = []
+            for entry in os.scandir(self._dir):
+                if entry.name.startswith("."):
+                    continue  # Temporários (em escrita) e a trava
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_atime, entry.name, st.st_size))
+            files.sort()
+            total = sum(size for _, _, size in files)
+            count = len(files)
+            for _, name, size in files:
+                if total <= self._max_bytes:
+                    break
+                if name == keep:
+                    # A entrada nova sozinha passa do limite: fica até a próxima
+                    continue
+                try:
+                    os.remove(os.path.join(self._dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                count -= 1
+                self.evictions += 1
+            self._entries, self._bytes = count, total
+
+    def stats(self):
+        with self._lock:
+            return {"entries": self._entries, "bytes": self._bytes, "max_bytes": self._max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class _FileLock:
+    """Trava exclusiva entre processos (flock); sem fcntl (Windows) vale só a trava de threads."""
+
+    def __init__(self, path):
+        self._path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ClipExtractor:
+    """
+    Monta o trecho [start, end] de um local a partir dos clipes gravados.
+
+    O custo depende do tamanho do trecho, não da quantidade de clipes: o
+    índice devolve só os clipes que começaram até `max_clip_s` antes do
+    início, a duração de cada um é lida (ffprobe) uma única vez e o ffmpeg
+    só copia os pacotes do intervalo. Com o catálogo (bdManager.ClipCatalog)
+    o início e o fim de cada clipe vêm dos horários de captura registrados
+    (mais precisos que o nome, que tem resolução de 1 s). O corte do início
+    volta até o keyframe anterior (o lance nunca começa cortado); clipes que
+    se sobrepõem (ex: pré-roll de gatilhos seguidos) entram só com a parte
+    ainda não coberta.
+    """
+
+    def __init__(self, video_dir: str, cache_dir: str = None, cache_mb: float = 2048,
+                 max_clip_s: float = 300.0, max_range_s: float = 600.0,
+                 ffmpeg_bin: str = "ffmpeg", ffprobe_bin: str = "ffprobe", catalog=None):
+        """
+        :param video_dir: Pasta raiz dos clipes (a mesma da API).
+        :param cache_dir: Pasta do cache dos trechos (padrão: pasta temporária do sistema).
+        :param cache_mb: Tamanho máximo do cache, em MB.
+        :param max_clip_s: Duração máxima de um clipe (até onde procurar antes do início).
+        :param max_range_s: Duração máxima de um trecho pedido.
+        :param catalog: ClipCatalog (ou o caminho do arquivo SQLite) com os horários dos clipes, opcional.
+        """
+        if isinstance(catalog, str):
+            from bdManager import ClipCatalog
+            catalog = ClipCatalog(catalog)
+        self._catalog = catalog
+        self._video_dir = video_dir
+        self._cache = ExtractCache(cache_dir or os.path.join(tempfile.gettempdir(), "sport_capture_extract"),
+                                   int(cache_mb * 1024 * 1024))
+        self._max_clip_s = max_clip_s
+        self._max_range_s = max_range_s
+        self._ffmpeg = ffmpeg_bin
+        self._ffprobe = ffprobe_bin
+        # (caminho, mtime_ns, tamanho) -> (codec, duração): cada clipe é lido pelo ffprobe uma vez
+        self._probes = {}
+        self._probes_lock = threading.Lock()
+        # Extrações em andamento: pedidos iguais esperam a mesma extração
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return self._cache
+
+    # --- Seleção ---
+
+    def _probe(self, path, st):
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._probes_lock:
+            cached = self._probes.get(key)
+        if cached is None:
+            cached = probe_clip(path, self._ffprobe)
+            if cached[1] is not None:
+                # Falhas não ficam guardadas (ex: clipe ainda sendo gravado)
+                with self._probes_lock:
+                    self._probes[key] = cached
+        return cached
+
+    def select(self, start: float, end: float, location: str = None):
+        """
+        Partes dos clipes que cobrem [start, end], em ordem cronológica:
+        dicts com name, path, codec, inpoint e outpoint (segundos dentro do clipe).
+
+        :raises ValueError: Intervalo inválido, vários locais sem filtro ou codecs diferentes.
+        :raises LookupError: Nenhum clipe no intervalo.
+        :raises RuntimeError: ffprobe ausente.
+        """
+        if shutil.which(self._ffprobe) is None:
+            raise RuntimeError("A extração de trechos precisa do ffprobe.")
+        if end <= start:
+            raise ValueError("O fim do trecho deve ser depois do início.")
+        if end - start > self._max_range_s:
+            raise ValueError(f"Trecho maior que o máximo de {self._max_range_s:.0f} s.")
+        prefix = location_slug(location) + "/" if location else None
+        candidates = get_clip_index(self._video_dir).range_with_times(start - self._max_clip_s, end)
+        recorded = {}
+        if self._catalog is not None:
+            for row in self._catalog.list_clips(start - self._max_clip_s, end):
+                recorded[row["path"]] = row
+        parts = []
+        covered_until = start
+        for clip_start, name in candidates:
+            name = name.replace(os.sep, "/")
+            if prefix is not None and not name.startswith(prefix):
+                continue
+            path = os.path.join(self._video_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            codec, duration = self._probe(path, st)
+            row = recorded.get(os.path.abspath(path))
+            if row is not None:
+                # Horários de captura do primeiro e do último frame (+ duração do último)
+                clip_start = row["start_time"]
+                duration = row["end_time"] - row["start_time"] + (1.0 / row["fps"] if row.get("fps") else 0.0)
+            if not duration:
+                log.warning("Duração desconhecida, clipe ignorado: %s", name)
+                continue
+            inpoint = max(0.0, covered_until - clip_start)
+            outpoint = min(duration, end - clip_start)
+            if outpoint <= inpoint:
+                continue
+            parts.append({"name": name, "path": path, "codec": codec, "size": st.st_size,
+                          "mtime_ns": st.st_mtime_ns, "inpoint": inpoint, "outpoint": outpoint})
+            covered_until = clip_start + outpoint
+        if not parts:
+            raise LookupError("Nenhum clipe no intervalo pedido.")
+        if prefix is None and len({part["name"].split("/")[0] for part in parts if "/" in part["name"]}) > 1:
+            raise ValueError("Há clipes de vários locais no intervalo: informe o local.")
+        if len({part["codec"] for part in parts}) > 1:
+            # O remux exige o mesmo codec (ex: parte do intervalo já foi para o nível compacto)
+            raise ValueError("Os clipes do intervalo usam codecs diferentes; não é possível juntar sem recodificar.")
+        return parts
+
+    # --- Extração ---
+
+    def extract(self, start: float, end: float, location: str = None):
+        """
+        Retorna (caminho do trecho, veio do cache). Pedidos iguais ao mesmo
+        tempo geram uma única extração.
+
+        :raises RuntimeError: ffmpeg ausente ou falha no remux.
+        """
+        parts = self.select(start, end, location)
+        container = os.path.splitext(parts[0]["name"])[1].lower()
+        signature = [(p["name"], p["size"], p["mtime_ns"], round(p["inpoint"], 3), round(p["outpoint"], 3))
+                     for p in parts]
+        name = hashlib.sha1(json.dumps(signature).encode()).hexdigest() + container
+
+        while True:
+            path = self._cache.get(name)
+            if path is not None:
+                EXTRACT_TOTAL.labels("hit").inc()
+                return path, True
+            with self._inflight_lock:
+                event = self._inflight.get(name)
+                if event is None:
+                    event = self._inflight[name] = threading.Event()
+                    break
+            # Outra requisição está extraindo o mesmo trecho
+            event.wait()
+
+        try:
+            started = time.perf_counter()
+            path = self._remux(parts, name)
+            EXTRACT_SECONDS.observe(time.perf_counter() - started)
+            EXTRACT_TOTAL.labels("miss").inc()
+            return path, False
+        except Exception:
+            EXTRACT_TOTAL.labels("error").inc()
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[name]
+            event.set()
+
+    def _remux(self, parts, name):
+        if shutil.which(self._ffmpeg) is None:
+            raise RuntimeError("A extração de trechos precisa do ffmpeg.")
+        temp_path = self._cache.temp_path(name)
+        list_path = temp_path + ".txt"
+        with open(list_path, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            for part in parts:
+                f.write(f"file '{_escape_concat(part['path'])}'\n")
+                f.write(f"inpoint {part['inpoint']:.3f}\n")
+                f.write(f"outpoint {part['outpoint']:.3f}\n")
+        container = os.path.splitext(name)[1]
+        cmd = [
+            self._ffmpeg, "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-map", "0", "-c", "copy",  # Só remux: o início vai até o keyframe anterior ao inpoint
+            "-avoid_negative_ts", "make_zero",
+        ]
+        if container in (".mp4", ".mov"):
+            # moov no início: o player começa a tocar antes do download terminar
+            cmd += ["-movflags", "+faststart"]
+        cmd += ["-f", {".mp4": "mp4", ".mov": "mov", ".mkv": "matroska", ".webm": "webm", ".avi": "avi"}.get(
+            container, "mp4"), temp_path]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=300)
+            if result.returncode != 0:
+                raise RuntimeError(f"Falha no remux do trecho: {result.stderr.decode(errors='replace').strip()}")
+            return self._cache.put(name, temp_path)
+        finally:
+            for leftover in (list_path, temp_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+
+def _escape_concat(path):
+    # Aspas simples no formato do demuxer concat
+    return path.replace("'", "'\\''")
+
+
+def download_name(start: float, location: str = None, container: str = ".mp4"):
+    """Nome sugerido para o trecho (ex: 'quadra_1_2024-11-09T19-42-10.mp4')."""
+    stamp = datetime.fromtimestamp(start).strftime("%Y-%m-%dT%H-%M-%S")
+    return (f"{location_slug(location)}_{stamp}" if location else stamp) + container
+
+
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+def get_clip_extractor(video_dir: str, **options):
+    """Extrator compartilhado de uma pasta (um cache por processo da API)."""
+    key = os.path.abspath(video_dir)
+    with _extractors_lock:
+        extractor = _extractors.get(key)
+        if extractor is None:
+            extractor = ClipExtractor(video_dir, **options)
+            _extractors[key] = extractor
+        return extractor
@@ -0,0 +1,297 @@
+import bisect
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+from datetime import datetime
+
+from Classes.ClipLayout import CLIP_NAME_FORMAT, VIDEO_EXTENSIONS, iter_partitions, scan_partitions
+
+# Formatos de data aceitos nos nomes dos clipes (o Recorder usa o primeiro;
+# o segundo é o das pastas antigas, antes da organização por data)
+FILENAME_FORMATS = (CLIP_NAME_FORMAT, "%d_%m_%Y_%H_%M_%S")
+
+# Formatos aceitos nos filtros de início/fim da API
+FILTER_FORMATS = ("%Y-%m-%d_%H-%M-%S", "%Y-%m-%d_%H-%M", "%Y-%m-%d", "%d_%m_%Y_%H_%M_%S")
+
+
+def parse_clip_timestamp(filename: str):
+    """
+    Converte o nome de um clipe (ex: '2024-11-09T10-30-00.mp4') no
+    timestamp do início da gravação. Retorna None se o nome não segue
+    nenhum formato conhecido.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    for fmt in FILENAME_FORMATS:
+        try:
+            return datetime.strptime(stem, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_filter_timestamp(value):
+    """Converte um filtro de data da API (ISO 8601 ou '2024-11-09_10-00') em timestamp."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        pass
+    for fmt in FILTER_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Data inválida: {value}")
+
+
+class _Inotify:
+    """Acesso mínimo ao inotify do Linux via ctypes."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    EVENT = struct.Struct("iIII")
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self, path):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        try:
+            self.root_wd = self.add_watch(path)
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_watch(self, path):
+        """Observa mais uma pasta; retorna o descritor (wd) usado nos eventos."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou para {path}")
+        return wd
+
+    def read_events(self, timeout):
+        """Retorna [(wd, mask, nome)] ou [] se nada aconteceu dentro do timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ClipIndex:
+    """
+    Índice em memória dos clipes de uma pasta, ordenado pelo horário de
+    início (lido do nome do arquivo uma única vez). Consultas por intervalo
+    usam busca binária. O índice é atualizado a partir das notificações do
+    inotify (Linux) ou, na falta dele, por varreduras periódicas.
+
+    Aceita clipes soltos na pasta e na organização por data (ver
+    ClipLayout); os clipes particionados são identificados pelo caminho
+    relativo (ex: 'quadra_1/2024/11/09/10/2024-11-09T10-30-00.mp4').
+    """
+
+    def __init__(self, directory: str, extensions=VIDEO_EXTENSIONS, poll_interval: float = 5.0,
+                 scan_workers: int = 4):
+        """
+        :param directory: Pasta dos clipes.
+        :param extensions: Extensões consideradas vídeo.
+        :param poll_interval: Intervalo entre varreduras quando não há inotify.
+        :param scan_workers: Partições listadas em paralelo nas varreduras.
+        """
+        self._directory = directory
+        self._extensions = tuple(extensions)
+        self._poll_interval = poll_interval
+        self._scan_workers = scan_workers
+        self._lock = threading.Lock()
+        self._keys = []       # Lista ordenada de (timestamp, nome)
+        self._by_name = {}    # nome -> timestamp
+        self._stop_event = threading.Event()
+        self._watcher = None
+        self.mode = None      # 'inotify' ou 'polling'
+        self.rescan()
+
+    # --- Atualização ---
+
+    def _accepts(self, name):
+        return name.lower().endswith(self._extensions)
+
+    def add(self, name: str):
+        """Adiciona um arquivo ao índice (ignorado se o nome não tem data)."""
+        if not self._accepts(name):
+            return
+        timestamp = parse_clip_timestamp(name)
+        if timestamp is None:
+            return
+        with self._lock:
+            if name in self._by_name:
+                return
+            self._by_name[name] = timestamp
+            bisect.insort(self._keys, (timestamp, name))
+
+    def remove(self, name: str):
+        with self._lock:
+            timestamp = self._by_name.pop(name, None)
+            if timestamp is None:
+                return
+            i = bisect.bisect_left(self._keys, (timestamp, name))
+            if i < len(self._keys) and self._keys[i] == (timestamp, name):
+                del self._keys[i]
+
+    def remove_prefix(self, prefix: str):
+        """Remove todos os clipes de uma pasta (ex: partição apagada pela retenção)."""
+        prefix = prefix.rstrip("/") + "/"
+        with self._lock:
+            names = [name for name in self._by_name if name.startswith(prefix)]
+            if not names:
+                return
+            for name in names:
+                del self._by_name[name]
+            removed = set(names)
+            self._keys = [key for key in self._keys if key[1] not in removed]
+
+    def rescan(self):
+        """Reconstrói o índice a partir da pasta (usado na carga e em overflow)."""
+        by_name = {}
+        # Partições listadas em paralelo; a raiz entra para os clipes soltos
+        directories = [path for _, _, path in iter_partitions(self._directory)]
+        directories.append(self._directory)
+        for directory, entries in scan_partitions(directories, self._scan_workers, self._extensions):
+            relative = os.path.relpath(directory, self._directory).replace(os.sep, "/")
+            for name, _, _ in entries:
+                timestamp = parse_clip_timestamp(name)
+                if timestamp is not None:
+                    by_name[name if relative == "." else f"{relative}/{name}"] = timestamp
+        keys = sorted((ts, name) for name, ts in by_name.items())
+        with self._lock:
+            self._by_name = by_name
+            self._keys = keys
+
+    # --- Consultas ---
+
+    def __len__(self):
+        return len(self._keys)
+
+    def range(self, start: float = None, end: float = None):
+        """Nomes (caminhos relativos) dos clipes com início em [start, end], em ordem cronológica."""
+        return [name for _, name in self.range_with_times(start, end)]
+
+    def range_with_times(self, start: float = None, end: float = None):
+        """Como range(), mas retorna [(timestamp, nome)]."""
+        with self._lock:
+            lo = 0 if start is None else bisect.bisect_left(self._keys, (start, ""))
+            hi = len(self._keys) if end is None else bisect.bisect_right(self._keys, (end, "\uffff"))
+            return self._keys[lo:hi]
+
+    # --- Observação da pasta ---
+
+    def start(self):
+        """Inicia a thread que mantém o índice atualizado."""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="ClipIndex-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        try:
+            inotify = _Inotify(self._directory)
+            # wd -> pasta relativa à raiz ('' para a própria raiz)
+            watched = {inotify.root_wd: ""}
+            self._watch_tree(inotify, watched, self._directory, "")
+        except (OSError, AttributeError, TypeError):
+            # Sem inotify (outro sistema, pasta inexistente ou limite de
+            # observações atingido): varredura periódica
+            self.mode = "polling"
+            while not self._stop_event.wait(self._poll_interval):
+                self.rescan()
+            return
+
+        self.mode = "inotify"
+        # Arquivos criados entre a carga inicial e o início da observação
+        self.rescan()
+        try:
+            while not self._stop_event.is_set():
+                for wd, mask, name in inotify.read_events(timeout=1.0):
+                    if mask & _Inotify.IN_Q_OVERFLOW:
+                        self.rescan()
+                        continue
+                    if mask & _Inotify.IN_IGNORED:
+                        watched.pop(wd, None)
+                        continue
+                    parent = watched.get(wd)
+                    if parent is None:
+                        continue
+                    relative = f"{parent}/{name}" if parent else name
+                    if mask & _Inotify.IN_ISDIR:
+                        if mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                            # Nova partição: observa e indexa o que já foi gravado nela
+                            try:
+                                self._watch_tree(inotify, watched, os.path.join(self._directory, relative),
+                                                 relative, index_files=True)
+                            except OSError:
+                                pass
+                        elif mask & (_Inotify.IN_DELETE | _Inotify.IN_MOVED_FROM):
+                            self.remove_prefix(relative)
+                    elif mask & (_Inotify.IN_CLOSE_WRITE | _Inotify.IN_MOVED_TO):
+                        self.add(relative)
+                    elif mask & (_Inotify.IN_DELETE | _Inotify.IN_MOVED_FROM):
+                        self.remove(relative)
+        finally:
+            inotify.close()
+
+    def _watch_tree(self, inotify, watched, path, relative, index_files=False):
+        """Observa as subpastas de `path` (locais e partições), recursivamente."""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                child = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir():
+                    watched[inotify.add_watch(entry.path)] = child
+                    self._watch_tree(inotify, watched, entry.path, child, index_files)
+                elif index_files:
+                    self.add(child)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_clip_index(directory: str, **options):
+    """Retorna o índice (único por processo) da pasta, já observando mudanças."""
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = ClipIndex(key, **options)
+            index.start()
+            _indexes[key] = index
+        return index
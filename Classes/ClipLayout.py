@@ -0,0 +1,319 @@
+"""
+Organização dos clipes em pastas por data:
+
+    <raiz>/<local>/AAAA/MM/DD/HH/AAAA-MM-DDTHH-MM-SS.mp4
+
+Os nomes seguem a ISO 8601 (com '-' no lugar de ':'), então a ordem
+alfabética é a ordem cronológica. Cada pasta de hora é uma partição:
+consultas só listam as partições do intervalo pedido e a retenção apaga
+partições inteiras de uma vez.
+
+Para converter uma pasta antiga (todos os clipes no mesmo diretório):
+
+    python -m Classes.ClipLayout Videos/h264 --root Videos --location "Quadra 1"
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Nome dos clipes (ISO 8601 ordenável, sem ':' para funcionar em qualquer sistema de arquivos)
+CLIP_NAME_FORMAT = "%Y-%m-%dT%H-%M-%S"
+
+# Níveis das partições abaixo da pasta do local: ano, mês, dia e hora
+PARTITION_FORMATS = ("%Y", "%m", "%d", "%H")
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+
+def location_slug(location: str):
+    """Nome seguro para a pasta do local (ex: 'Quadra 3' -> 'quadra_3')."""
+    return re.sub(r"[^a-z0-9_-]+", "_", location.lower()).strip("_") or "camera"
+
+
+def clip_name(timestamp: float, containerv: str):
+    """Nome do clipe que começou em `timestamp` (ex: '2024-11-09T10-30-00.mp4')."""
+    return datetime.fromtimestamp(timestamp).strftime(CLIP_NAME_FORMAT) + containerv
+
+
+def partition_relpath(timestamp: float):
+    """Caminho relativo da partição (AAAA/MM/DD/HH) de um horário."""
+    moment = datetime.fromtimestamp(timestamp)
+    return os.path.join(*(moment.strftime(fmt) for fmt in PARTITION_FORMATS))
+
+
+def clip_path(root: str, location: str, timestamp: float, containerv: str, makedirs: bool = True):
+    """
+    Caminho completo de um clipe novo. Cria a pasta da partição se preciso
+    (um único stat quando ela já existe).
+    """
+    directory = os.path.join(root, location_slug(location), partition_relpath(timestamp))
+    if makedirs:
+        os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, clip_name(timestamp, containerv))
+
+
+def _interval(parts):
+    """Início e fim (timestamps) do período de uma partição parcial, ex: ('2024', '11')."""
+    year = int(parts[0])
+    month = int(parts[1]) if len(parts) > 1 else 1
+    day = int(parts[2]) if len(parts) > 2 else 1
+    hour = int(parts[3]) if len(parts) > 3 else 0
+    start = datetime(year, month, day, hour)
+    if len(parts) == 1:
+        end = datetime(year + 1, 1, 1)
+    elif len(parts) == 2:
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    else:
+        # Dia e hora: soma a duração em segundos e renormaliza (vale também na troca de horário)
+        step = 86400 if len(parts) == 3 else 3600
+        return start.timestamp(), start.timestamp() + step
+    return start.timestamp(), end.timestamp()
+
+
+def _numeric_subdirs(path, width):
+    """Subpastas com nome numérico de `width` dígitos, em ordem."""
+    try:
+        with os.scandir(path) as entries:
+            names = [e.name for e in entries if len(e.name) == width and e.name.isdigit() and e.is_dir()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    return sorted(names)
+
+
+def location_dirs(root: str, location: str = None):
+    """Pastas dos locais dentro da raiz (só a do `location` se informado)."""
+    if location is not None:
+        path = os.path.join(root, location_slug(location))
+        return [path] if os.path.isdir(path) else []
+    try:
+        with os.scandir(root) as entries:
+            return sorted(e.path for e in entries if e.is_dir() and not e.name.isdigit())
+    except FileNotFoundError:
+        return []
+
+
+def iter_partitions(root: str, start: float = None, end: float = None, location: str = None):
+    """
+    Percorre as partições (pastas de hora) que têm clipes em [start, end],
+    em ordem cronológica por local. Só lista as pastas de ano/mês/dia que
+    se sobrepõem ao intervalo: uma consulta de uma hora toca ~4 pastas.
+
+    :return: Gerador de (início, fim, caminho) de cada partição.
+    """
+    def overlaps(parts):
+        lo, hi = _interval(parts)
+        return (start is None or hi > start) and (end is None or lo <= end)
+
+    widths = (4, 2, 2, 2)
+
+    def walk(path, parts):
+        level = len(parts)
+        for name in _numeric_subdirs(path, widths[level]):
+            sub_parts = parts + (name,)
+            try:
+                if not overlaps(sub_parts):
+                    continue
+            except ValueError:
+                continue  # Pasta numérica que não é data válida (ex: mês 13)
+            sub_path = os.path.join(path, name)
+            if level + 1 == len(widths):
+                lo, hi = _interval(sub_parts)
+                yield lo, hi, sub_path
+            else:
+                yield from walk(sub_path, sub_parts)
+
+    for location_dir in location_dirs(root, location):
+        yield from walk(location_dir, ())
+
+
+def _scan_partition(path, extensions):
+    """Lista os clipes de uma partição: [(nome, tamanho, mtime)]."""
+    clips = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(extensions):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                clips.append((entry.name, st.st_size, st.st_mtime))
+    except FileNotFoundError:
+        pass
+    return clips
+
+
+def scan_partitions(paths, workers: int = 4, extensions=VIDEO_EXTENSIONS):
+    """
+    Lista várias partições em paralelo (uma tarefa por pasta). A espera
+    de I/O de cada scandir (cartão SD, disco de rede) se sobrepõe.
+
+    :return: Lista de (pasta, [(nome, tamanho, mtime)]) na ordem de `paths`.
+    """
+    paths = list(paths)
+    extensions = tuple(extensions)
+    if workers <= 1 or len(paths) <= 1:
+        return [(path, _scan_partition(path, extensions)) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ClipLayout-scan") as pool:
+        return list(zip(paths, pool.map(lambda p: _scan_partition(p, extensions), paths)))
+
+
+def scan_clips(root: str, start: float = None, end: float = None, location: str = None,
+               workers: int = 4, include_flat: bool = True, extensions=VIDEO_EXTENSIONS):
+    """
+    Clipes com início em [start, end], em ordem cronológica: [(timestamp, caminho, tamanho)].
+    Só as partições do intervalo são listadas. Com include_flat=True os
+    arquivos soltos na raiz (organização antiga) também entram.
+    """
+    # Import local: ClipIndex depende deste módulo
+    from Classes.ClipIndex import parse_clip_timestamp
+
+    paths = [path for _, _, path in iter_partitions(root, start, end, location)]
+    if include_flat:
+        paths.append(root)
+    clips = []
+    for directory, entries in scan_partitions(paths, workers, extensions):
+        for name, size, mtime in entries:
+            timestamp = parse_clip_timestamp(name)
+            if timestamp is None:
+                timestamp = mtime
+            if (start is None or timestamp >= start) and (end is None or timestamp <= end):
+                clips.append((timestamp, os.path.join(directory, name), size))
+    clips.sort()
+    return clips
+
+
+def iter_clip_files(root: str, extensions=VIDEO_EXTENSIONS):
+    """Todos os clipes da raiz (soltos e particionados): gerador de (caminho, tamanho)."""
+    for _, path, size in scan_clips(root, extensions=extensions):
+        yield path, size
+
+
+def expired_partitions(root: str, cutoff: float, location: str = None):
+    """Partições cujo período inteiro terminou antes de `cutoff` (podem ser apagadas inteiras)."""
+    return [path for _, hi, path in iter_partitions(root, end=cutoff, location=location) if hi <= cutoff]
+
+
+def partition_of(path: str):
+    """Pasta da partição de um clipe, ou None se ele não está numa partição."""
+    directory = os.path.dirname(path)
+    parts = directory.split(os.sep)[-4:]
+    if len(parts) == 4 and all(p.isdigit() for p in parts) and len(parts[0]) == 4:
+        return directory
+    return None
+
+
+def prune_empty_parents(path: str, min_age_s: float = 3600.0):
+    """
+    Remove a partição de `path` e as pastas acima dela (dia, mês, ano) se
+    estiverem vazias. Partições da última hora são mantidas, pois o
+    Recorder pode estar para gravar nelas.
+    """
+    # Aceita o caminho de um clipe ou da própria pasta da partição
+    directory = partition_of(path) or partition_of(os.path.join(path, ""))
+    if directory is None:
+        return
+    parts = directory.split(os.sep)[-4:]
+    try:
+        _, hi = _interval(tuple(parts))
+    except ValueError:
+        return
+    if hi > time.time() - min_age_s:
+        return
+    for _ in range(4):
+        try:
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass  # Já removida: continua pelas pastas acima
+        except OSError:
+            return  # Não está vazia
+        directory = os.path.dirname(directory)
+
+
+def migrate_flat_directory(source: str, root: str, location: str, workers: int = 8,
+                           dry_run: bool = False, catalog=None):
+    """
+    Move os clipes de uma pasta antiga (todos no mesmo diretório) para a
+    organização por data, renomeando-os no formato ISO 8601. Os arquivos
+    são movidos com os.rename (sem cópia) em paralelo; a raiz deve estar
+    no mesmo sistema de arquivos que a origem.
+
+    :param source: Pasta antiga.
+    :param root: Raiz da nova organização (pode ser a própria `source`).
+    :param location: Local dos clipes (nome da pasta do local).
+    :param workers: Renomeações simultâneas.
+    :param dry_run: Só calcula os destinos, sem mover nada.
+    :param catalog: bdManager.ClipCatalog opcional; os caminhos são atualizados nele.
+    :return: Dicionário com os contadores (moved, skipped, errors) e o tempo gasto.
+    """
+    from Classes.ClipIndex import parse_clip_timestamp
+
+    started = time.perf_counter()
+    moves = []
+    skipped = 0
+    for name, _, mtime in _scan_partition(source, VIDEO_EXTENSIONS):
+        timestamp = parse_clip_timestamp(name)
+        if timestamp is None:
+            timestamp = mtime
+        target = clip_path(root, location, timestamp, os.path.splitext(name)[1], makedirs=False)
+        source_path = os.path.join(source, name)
+        if os.path.abspath(target) == os.path.abspath(source_path):
+            skipped += 1
+            continue
+        moves.append((source_path, target))
+
+    result = {"planned": len(moves), "moved": 0, "skipped": skipped, "errors": 0, "dry_run": dry_run}
+    if dry_run:
+        result["elapsed_s"] = time.perf_counter() - started
+        return result
+
+    # Cria as partições antes, uma vez cada, para as renomeações não disputarem o makedirs
+    for directory in sorted({os.path.dirname(target) for _, target in moves}):
+        os.makedirs(directory, exist_ok=True)
+
+    def move(pair):
+        source_path, target = pair
+        if os.path.exists(target):
+            return "skipped"
+        try:
+            os.rename(source_path, target)
+        except OSError as e:
+            print(f"Erro ao mover {source_path}: {e}")
+            return "errors"
+        return "moved"
+
+    renamed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ClipLayout-migrate") as pool:
+        for pair, status in zip(moves, pool.map(move, moves)):
+            result[status] += 1
+            if status == "moved":
+                renamed.append(pair)
+    if catalog is not None and renamed:
+        catalog.update_paths(renamed)
+    result["elapsed_s"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte uma pasta de clipes antiga para a organização por data.")
+    parser.add_argument("source", help="Pasta antiga (todos os clipes no mesmo diretório)")
+    parser.add_argument("--root", help="Raiz da nova organização (padrão: a própria pasta)")
+    parser.add_argument("--location", required=True, help="Local dos clipes (ex: 'Quadra 1')")
+    parser.add_argument("--workers", type=int, default=8, help="Renomeações simultâneas")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra quantos arquivos seriam movidos")
+    args = parser.parse_args()
+
+    result = migrate_flat_directory(args.source, args.root or args.source, args.location,
+                                    workers=args.workers, dry_run=args.dry_run)
+    print(f"Planejados: {result['planned']} | Movidos: {result['moved']} | "
+          f"Ignorados: {result['skipped']} | Erros: {result['errors']} | {result['elapsed_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
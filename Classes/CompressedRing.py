@@ -0,0 +1,253 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from Classes.Log import get_logger
+
+log = get_logger("jpeg_ring")
+
+
+class DecodedFrames:
+    """
+    Sequência de frames de uma janela do CompressedFrameRing, decodificados
+    sob demanda em lotes paralelos: enquanto o encoder grava um lote, o
+    próximo já está sendo decodificado. Só dois lotes ficam em memória, em
+    vez da janela inteira em frames crus.
+    """
+
+    def __init__(self, jpegs, shape, pool, batch: int):
+        self._jpegs = jpegs
+        self.shape = (len(jpegs),) + tuple(shape)
+        self._pool = pool
+        self._batch = max(1, batch)
+
+    def __len__(self):
+        return len(self._jpegs)
+
+    def _decode_batch(self, start):
+        return self._pool.map(_decode, self._jpegs[start:start + self._batch])
+
+    def __iter__(self):
+        pending = self._decode_batch(0) if len(self._jpegs) else None
+        for start in range(0, len(self._jpegs), self._batch):
+            current = pending
+            following = start + self._batch
+            pending = self._decode_batch(following) if following < len(self._jpegs) else None
+            yield from current
+
+
+def _decode(jpeg):
+    # cv2.imdecode libera o GIL: os lotes decodificam em paralelo nas threads do pool
+    return cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class CompressedFrameRing:
+    """
+    Janela de frames guardada em JPEG (cv2.imencode) com orçamento fixo de
+    memória em bytes. Permite janelas de 60-120 s em máquinas com pouca
+    RAM: um frame 1280x720 cru ocupa 2,7 MB, em JPEG tipicamente 50-150 KB.
+
+    A captura continua escrevendo num FrameRingBuffer pequeno (staging);
+    push(index) só enfileira o slot e um pool de threads comprime os frames
+    fora da thread de captura. Os frames comprimidos entram no anel na ordem
+    de captura e os mais antigos saem quando o total passa do orçamento (ou
+    da janela máxima, se informada).
+
+    Implementa mark()/copy_marked() como o FrameRingBuffer, então o
+    ClipExporter usa o anel diretamente: a "cópia" só guarda as referências
+    dos JPEGs e a decodificação é feita em lotes paralelos durante a gravação.
+    """
+
+    def __init__(self, staging, budget_mb: float = 256.0, quality: int = 80, workers: int = 2,
+                 decode_workers: int = 2, batch: int = 16, max_seconds: float = None):
+        """
+        :param staging: FrameRingBuffer pequeno onde a captura escreve os frames.
+        :param budget_mb: Memória máxima ocupada pelos JPEGs, em MB.
+        :param quality: Qualidade do JPEG (0-100).
+        :param workers: Threads de compressão.
+        :param decode_workers: Threads de decodificação na exportação.
+        :param batch: Frames decodificados por lote na exportação.
+        :param max_seconds: Janela máxima guardada (None = só o orçamento limita).
+        """
+        if budget_mb <= 0:
+            raise ValueError("O orçamento de memória deve ser maior que zero.")
+        self._staging = staging
+        self._budget = int(budget_mb * 1024 * 1024)
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        self._max_seconds = max_seconds
+        self._batch = batch
+        self._frame_shape = staging.frame_shape
+        self._raw_bytes = int(np.prod(self._frame_shape))
+
+        # Frames comprimidos em ordem de captura: (timestamp, jpeg)
+        self._frames = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Reordenação: os workers terminam fora de ordem, o anel recebe em ordem
+        self._seq = 0
+        self._next_seq = 0
+        self._done = {}
+
+        self._stats_lock = threading.Lock()
+        self._compressed = 0
+        self._compress_total = 0.0
+        self._compress_max = 0.0
+        self.dropped_frames = 0   # Compressão atrasada: o slot foi sobrescrito ou a fila encheu
+        self.evicted_frames = 0
+
+        # A fila não pode ser maior que o staging: além disso os slots já foram sobrescritos
+        self._queue = queue.Queue(maxsize=max(1, staging.capacity - 1))
+        self._stop_event = threading.Event()
+        self._workers = []
+        for n in range(workers):
+            worker = threading.Thread(target=self._compress_loop, name=f"CompressedRing-{n}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="CompressedRing-decode")
+
+    # --- Captura ---
+
+    def push(self, index: int):
+        """
+        Informa que o slot `index` do staging tem um frame novo. Não bloqueia:
+        se a compressão estiver atrasada o frame é descartado.
+        """
+        try:
+            self._queue.put_nowait((self._seq, index, self._staging.timestamp_at(index)))
+        except queue.Full:
+            self.dropped_frames += 1
+            return
+        self._seq += 1
+
+    def _compress_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            seq, index, timestamp = job
+            # A captura já voltou a este slot (fila atrasada): nem comprime
+            if not self._staging.is_intact(index, timestamp):
+                self._insert(seq, timestamp, None)
+                continue
+            start = time.perf_counter()
+            ok, jpeg = cv2.imencode(".jpg", self._staging.slot(index), self._params)
+            elapsed = time.perf_counter() - start
+            # Slot sobrescrito ou sendo escrito (é a cabeça) durante a compressão:
+            # o JPEG pode misturar dois frames e é descartado
+            if not ok or not self._staging.is_intact(index, timestamp):
+                jpeg = None
+            else:
+                jpeg = jpeg.tobytes()
+                with self._stats_lock:
+                    self._compressed += 1
+                    self._compress_total += elapsed
+                    self._compress_max = max(self._compress_max, elapsed)
+            self._insert(seq, timestamp, jpeg)
+
+    def _insert(self, seq, timestamp, jpeg):
+        with self._lock:
+            self._done[seq] = (timestamp, jpeg)
+            while self._next_seq in self._done:
+                timestamp, jpeg = self._done.pop(self._next_seq)
+                self._next_seq += 1
+                if jpeg is None:
+                    self.dropped_frames += 1
+                    continue
+                self._frames.append((timestamp, jpeg))
+                self._bytes += len(jpeg)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        newest = self._frames[-1][0] if self._frames else None
+        while self._frames and (self._bytes > self._budget or (
+                self._max_seconds is not None and newest - self._frames[0][0] > self._max_seconds)):
+            _, jpeg = self._frames.popleft()
+            self._bytes -= len(jpeg)
+            self.evicted_frames += 1
+
+    # --- Interface do FrameRingBuffer usada pelo ClipExporter ---
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def frame_shape(self):
+        return self._frame_shape
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelos JPEGs, em bytes."""
+        return self._bytes
+
+    @property
+    def budget_bytes(self):
+        return self._budget
+
+    def mark(self, start_time: float = None, end_time: float = None):
+        """
+        Congela a janela atual: retorna os JPEGs (referências, sem cópia) e
+        seus tempos de captura, do mais antigo ao mais novo.
+        """
+        with self._lock:
+            frames = list(self._frames)
+        if start_time is not None or end_time is not None:
+            frames = [(ts, jpeg) for ts, jpeg in frames
+                      if (start_time is None or ts >= start_time) and (end_time is None or ts <= end_time)]
+        timestamps = np.array([ts for ts, _ in frames], dtype=np.float64)
+        return [jpeg for _, jpeg in frames], timestamps
+
+    def copy_marked(self, mark):
+        """
+        Retorna (frames, timestamps, perdidos). Os JPEGs são imutáveis e
+        não somem com a remoção do anel, então nenhum frame é perdido; os
+        frames são decodificados em lotes quando o encoder os percorre.
+        """
+        jpegs, timestamps = mark
+        return DecodedFrames(jpegs, self._frame_shape, self._decoder, self._batch), timestamps, 0
+
+    # --- Estatísticas ---
+
+    def window_seconds(self):
+        """Janela efetivamente guardada (do frame mais antigo ao mais novo), em segundos."""
+        with self._lock:
+            if len(self._frames) < 2:
+                return 0.0
+            return self._frames[-1][0] - self._frames[0][0]
+
+    def stats(self):
+        with self._stats_lock:
+            compressed = self._compressed
+            compress_mean = self._compress_total / compressed if compressed else None
+            compress_max = self._compress_max
+        with self._lock:
+            frames = len(self._frames)
+            used = self._bytes
+        avg_frame = used / frames if frames else None
+        return {
+            "frames": frames,
+            "bytes": used,
+            "budget_bytes": self._budget,
+            "fill": used / self._budget,
+            "window_s": self.window_seconds(),
+            "max_seconds": self._max_seconds,
+            "avg_frame_bytes": avg_frame,
+            "compression_ratio": self._raw_bytes / avg_frame if avg_frame else None,
+            "compressed": compressed,
+            "compress_ms_mean": compress_mean * 1000 if compress_mean is not None else None,
+            "compress_ms_max": compress_max * 1000,
+            "dropped": self.dropped_frames,
+            "evicted": self.evicted_frames,
+            "queue": self._queue.qsize(),
+        }
+
+    def close(self):
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._decoder.shutdown(wait=True)
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+
+from Classes.Log import get_logger
+
+log = get_logger("degradation")
+
+# Presets do x264/x265 do mais lento (melhor compressão) ao mais rápido
+PRESET_ORDER = ("veryslow", "slower", "slow", "medium", "fast", "faster", "veryfast", "superfast", "ultrafast")
+
+
+def cpu_busy_sampler():
+    """
+    Retorna uma função que mede a fração de CPU ocupada (0 a 1) desde a
+    chamada anterior, lendo /proc/stat. Sem /proc, usa a carga média
+    dividida pelo número de núcleos.
+    """
+    last = [None]
+
+    def sample():
+        try:
+            with open("/proc/stat") as f:
+                fields = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            try:
+                return min(1.0, os.getloadavg()[0] / (os.cpu_count() or 1))
+            except OSError:
+                return None
+        idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+        total = sum(fields)
+        previous, last[0] = last[0], (idle, total)
+        if previous is None or total == previous[1]:
+            return None
+        return 1.0 - (idle - previous[0]) / (total - previous[1])
+
+    return sample
+
+
+class DegradationController:
+    """
+    Reduz o custo da codificação quando a máquina não acompanha e o
+    restaura quando a carga cai. A captura nunca é afetada: o buffer
+    continua recebendo todos os frames na resolução cheia; os níveis valem
+    para os clipes exportados.
+
+    Os níveis seguem sempre a mesma ordem:
+    1. preset mais rápido do encoder (só no backend ffmpeg);
+    2. decimação de frames (1 a cada 2, 1 a cada 3...), com o fps gravado ajustado;
+    3. resolução menor.
+
+    Sinais de sobrecarga: codificação mais lenta que o tempo real do clipe
+    (encode_s / duração), fila de exportação cheia ou CPU alta. A histerese
+    exige `degrade_after` amostras seguidas acima dos limites para piorar,
+    `recover_after` abaixo para melhorar e pelo menos `min_dwell_s` entre
+    duas mudanças.
+    """
+
+    def __init__(self, preset: str = None, decimations=(2, 3), scales=(0.75, 0.5),
+                 high_lag: float = 0.9, low_lag: float = 0.5, high_cpu: float = 0.85, low_cpu: float = 0.6,
+                 degrade_after: int = 3, recover_after: int = 15, min_dwell_s: float = 10.0,
+                 interval_s: float = 2.0, queue_depth=None, max_queue: int = None, on_change=None):
+        """
+        :param preset: Preset configurado no encoder (None = backend sem preset, ex: OpenCV).
+        :param decimations: Passos de decimação (manter 1 a cada N frames).
+        :param scales: Passos de resolução (fração da largura/altura).
+        :param high_lag: encode_s / duração do clipe acima do qual o encoder está atrasado.
+        :param low_lag: Abaixo disso (e da CPU baixa) o nível pode melhorar.
+        :param high_cpu: Fração de CPU ocupada considerada sobrecarga.
+        :param low_cpu: Fração de CPU abaixo da qual o nível pode melhorar.
+        :param degrade_after: Amostras seguidas em sobrecarga para piorar um nível.
+        :param recover_after: Amostras seguidas com folga para melhorar um nível.
+        :param min_dwell_s: Tempo mínimo num nível antes de outra mudança.
+        :param interval_s: Intervalo entre amostras.
+        :param queue_depth: Função que retorna a profundidade da fila de exportação.
+        :param max_queue: Tamanho máximo da fila (fila cheia = sobrecarga).
+        :param on_change: Função chamada com (nível antigo, nível novo, estado novo).
+        """
+        self.levels = self._build_levels(preset, decimations, scales)
+        self._high_lag = high_lag
+        self._low_lag = low_lag
+        self._high_cpu = high_cpu
+        self._low_cpu = low_cpu
+        self._degrade_after = degrade_after
+        self._recover_after = recover_after
+        self._min_dwell_s = min_dwell_s
+        self._interval_s = interval_s
+        self._queue_depth = queue_depth
+        self._max_queue = max_queue
+        self._on_change = on_change
+        self._cpu_sample = cpu_busy_sampler()
+
+        self._lock = threading.Lock()
+        self._level = 0
+        self._changed_at = time.monotonic()
+        self._lag = None        # Média móvel de encode_s / duração, desde a última mudança
+        self._above = 0
+        self._below = 0
+        self._last_cpu = None
+        self._history = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _build_levels(preset, decimations, scales):
+        levels = [{"level": 0, "preset": preset, "decimation": 1, "scale": 1.0}]
+        current = dict(levels[0])
+        if preset in PRESET_ORDER:
+            for faster in PRESET_ORDER[PRESET_ORDER.index(preset) + 1:]:
+                current = dict(current, preset=faster)
+                levels.append(current)
+        for decimation in decimations:
+            current = dict(current, decimation=decimation)
+            levels.append(current)
+        for scale in scales:
+            current = dict(current, scale=scale)
+            levels.append(current)
+        return [dict(level, level=n) for n, level in enumerate(levels)]
+
+    # --- Estado ---
+
+    def state(self):
+        """Nível atual: {'level', 'preset', 'decimation', 'scale'}."""
+        with self._lock:
+            return dict(self.levels[self._level])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "level": self._level,
+                "max_level": len(self.levels) - 1,
+                "state": dict(self.levels[self._level]),
+                "lag": self._lag,
+                "cpu": self._last_cpu,
+                "changes": list(self._history[-20:]),
+            }
+
+    # --- Sinais ---
+
+    def observe_clip(self, encode_s: float, duration_s: float):
+        """Registra quanto tempo um clipe levou para codificar em relação à sua duração."""
+        if not duration_s:
+            return
+        ratio = encode_s / duration_s
+        with self._lock:
+            self._lag = ratio if self._lag is None else 0.5 * self._lag + 0.5 * ratio
+
+    def sample(self):
+        """Lê a CPU e a fila e decide se muda de nível. Chamado pela thread a cada interval_s."""
+        cpu = self._cpu_sample()
+        depth = self._queue_depth() if self._queue_depth is not None else 0
+        with self._lock:
+            self._last_cpu = cpu
+            lag = self._lag
+            overloaded = ((lag is not None and lag > self._high_lag)
+                          or (self._max_queue and depth >= self._max_queue)
+                          or (cpu is not None and cpu > self._high_cpu))
+            relaxed = ((lag is None or lag < self._low_lag) and depth == 0
+                       and (cpu is None or cpu < self._low_cpu))
+            self._above = self._above + 1 if overloaded else 0
+            self._below = self._below + 1 if relaxed else 0
+            if time.monotonic() - self._changed_at < self._min_dwell_s:
+                return None
+            if self._above >= self._degrade_after and self._level < len(self.levels) - 1:
+                return self._change_locked(self._level + 1, lag, cpu, depth)
+            if self._below >= self._recover_after and self._level > 0:
+                return self._change_locked(self._level - 1, lag, cpu, depth)
+        return None
+
+    def _change_locked(self, level, lag, cpu, depth):
+        old = self._level
+        self._level = level
+        self._changed_at = time.monotonic()
+        self._above = self._below = 0
+        # O atraso medido valia para o nível anterior
+        self._lag = None
+        state = dict(self.levels[level])
+        self._history.append({"time": time.time(), "from": old, "to": level, "lag": lag, "cpu": cpu,
+                              "queue": depth})
+        log.warning("Nível de degradação %d -> %d (atraso %s, CPU %s, fila %d): %s", old, level,
+                    "?" if lag is None else f"{lag:.2f}", "?" if cpu is None else f"{cpu:.0%}", depth, state)
+        if self._on_change is not None:
+            self._on_change(old, level, state)
+        return state
+
+    # --- Thread ---
+
+    def start(self):
+        self._cpu_sample()  # Primeira leitura: referência para a próxima amostra
+        self._thread = threading.Thread(target=self._loop, name="DegradationController", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop_event.wait(self._interval_s):
+            try:
+                self.sample()
+            except Exception as e:
+                log.error("Erro no controle de degradação: %s", e)
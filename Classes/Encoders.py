@@ -0,0 +1,244 @@
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+
+# Tradução dos FourCC usados com o OpenCV para os encoders do ffmpeg
+FOURCC_TO_FFMPEG = {
+    "avc1": "libx264",
+    "H264": "libx264",
+    "X264": "libx264",
+    "hvc1": "libx265",
+    "HEVC": "libx265",
+    "mp4v": "mpeg4",
+    "XVID": "mpeg4",
+    "MJPG": "mjpeg",
+    "AV01": "libsvtav1",
+    "VP09": "libvpx-vp9",
+    "vp09": "libvpx-vp9",
+}
+
+# O libsvtav1 só aceita presets inteiros, de 0 (mais lento) a 13 (mais rápido):
+# equivalentes aproximados dos nomes do x264/x265
+SVT_AV1_PRESETS = {
+    "placebo": 0,
+    "veryslow": 2,
+    "slower": 4,
+    "slow": 5,
+    "medium": 7,
+    "fast": 8,
+    "faster": 9,
+    "veryfast": 10,
+    "superfast": 11,
+    "ultrafast": 12,
+}
+
+# Encoders com qualidade constante (-crf)
+CRF_ENCODERS = ("libx264", "libx265", "libsvtav1", "libvpx-vp9")
+
+
+def quality_args(vcodec: str, preset=None, crf: int = None):
+    """
+    Argumentos de preset e CRF do encoder do ffmpeg. O preset usa os nomes
+    do x264/x265 (ultrafast ... veryslow): o libsvtav1 recebe o inteiro
+    equivalente e os encoders sem preset (ex: libvpx-vp9) o ignoram. No
+    libvpx-vp9 o CRF só vale como qualidade constante com -b:v 0.
+    """
+    args = []
+    if preset is not None:
+        if vcodec in ("libx264", "libx265"):
+            args += ["-preset", str(preset)]
+        elif vcodec == "libsvtav1":
+            number = SVT_AV1_PRESETS.get(preset, preset)
+            if str(number).isdigit() and 0 <= int(number) <= 13:
+                args += ["-preset", str(number)]
+    if crf is not None and vcodec in CRF_ENCODERS:
+        args += ["-crf", str(crf)]
+        if vcodec == "libvpx-vp9":
+            args += ["-b:v", "0"]
+    return args
+
+
+class VideoEncoder:
+    """
+    Interface dos backends de codificação. open() retorna um objeto com a
+    mesma API usada do cv2.VideoWriter (write, release, isOpened), então o
+    restante do código não precisa saber qual backend está em uso.
+    """
+
+    backend = None
+
+    def __init__(self, codec: str):
+        self.codec = codec
+
+    def open(self, path: str, fps: float, size: tuple):
+        """Abre um arquivo de saída e retorna o writer."""
+        raise NotImplementedError
+
+    def describe(self):
+        """Retorna um dicionário com o backend e as opções do encoder."""
+        return {"backend": self.backend, "codec": self.codec}
+
+
+class OpenCVEncoder(VideoEncoder):
+    """Backend padrão: cv2.VideoWriter com um FourCC."""
+
+    backend = "opencv"
+
+    def open(self, path, fps, size):
+        fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        writer = cv2.VideoWriter(path, fourcc, float(fps), size)
+        if not writer.isOpened():
+            raise RuntimeError(f"Não foi possível abrir o VideoWriter ({self.codec}) para {path}.")
+        return writer
+
+
+class FFmpegPipeWriter:
+    """
+    Envia frames BGR crus para o stdin de um processo ffmpeg. Os frames são
+    escritos a partir de um memoryview do array, sem cópia via tobytes().
+    """
+
+    def __init__(self, cmd, frame_shape):
+        self._cmd = cmd
+        self._frame_shape = frame_shape
+        # bufsize=0: escreve direto no pipe, sem a cópia do BufferedWriter
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=0)
+        self._stdin = self._proc.stdin
+
+    def isOpened(self):
+        return self._proc.poll() is None
+
+    def write(self, frame):
+        if frame.shape != self._frame_shape:
+            raise ValueError(f"Frame {frame.shape} diferente do esperado {self._frame_shape}.")
+        if not frame.flags["C_CONTIGUOUS"]:
+            frame = np.ascontiguousarray(frame)
+        view = memoryview(frame).cast("B")
+        # Escrita em pipe pode ser parcial: continua de onde parou
+        while view:
+            written = self._stdin.write(view)
+            view = view[written:]
+
+    def release(self):
+        if self._stdin.closed:
+            return
+        self._stdin.close()
+        returncode = self._proc.wait()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg terminou com código {returncode}: {' '.join(self._cmd)}")
+
+
+class FFmpegEncoder(VideoEncoder):
+    """
+    Backend que usa o ffmpeg (subprocesso) lendo frames pelo stdin, como em
+    testes/test2.py. Permite escolher preset, CRF e número de threads.
+    """
+
+    backend = "ffmpeg"
+
+    def __init__(self, codec: str, preset: str = "ultrafast", crf: int = 23, threads: int = 0,
+                 pix_fmt: str = "yuv420p", ffmpeg_bin: str = "ffmpeg", extra_args: list = None):
+        """
+        :param codec: FourCC (ex: 'avc1') ou nome do encoder do ffmpeg (ex: 'libx264').
+        :param preset: Preset do encoder (ultrafast ... veryslow; no AV1 vira o inteiro do SVT-AV1).
+        :param crf: Qualidade constante (menor = melhor qualidade, arquivo maior).
+        :param threads: Threads do encoder (0 = automático).
+        :param pix_fmt: Formato de pixel da saída.
+        :param ffmpeg_bin: Executável do ffmpeg.
+        :param extra_args: Argumentos extras de saída.
+        """
+        super().__init__(codec)
+        self.vcodec = FOURCC_TO_FFMPEG.get(codec, codec)
+        self.preset = preset
+        self.crf = crf
+        self.threads = threads
+        self.pix_fmt = pix_fmt
+        self.ffmpeg_bin = ffmpeg_bin
+        self.extra_args = list(extra_args or [])
+        if shutil.which(ffmpeg_bin) is None:
+            raise RuntimeError(f"Executável do ffmpeg não encontrado: {ffmpeg_bin}")
+
+    def describe(self):
+        data = super().describe()
+        data.update(vcodec=self.vcodec, preset=self.preset, crf=self.crf, threads=self.threads)
+        return data
+
+    def _input_args(self, fps, size):
+        width, height = size
+        return [
+            self.ffmpeg_bin, "-y", "-loglevel", "error",
+            "-f", "rawvideo",
+            "-vcodec", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-r", str(fps),
+            "-i", "-",  # Frames chegam pelo stdin
+            "-an",
+        ]
+
+    def _codec_args(self):
+        args = ["-vcodec", self.vcodec, "-pix_fmt", self.pix_fmt, "-threads", str(self.threads)]
+        return args + quality_args(self.vcodec, self.preset, self.crf) + self.extra_args
+
+    def open(self, path, fps, size):
+        cmd = self._input_args(fps, size) + self._codec_args() + [path]
+        return FFmpegPipeWriter(cmd, (size[1], size[0], 3))
+
+    def open_segmented(self, directory, containerv, fps, size, segment_s, list_path):
+        """
+        Abre um único processo ffmpeg persistente que divide a saída em
+        segmentos de `segment_s` segundos, cada um começando num keyframe.
+        Os segmentos concluídos são anotados em `list_path` (CSV:
+        arquivo,início,fim).
+        """
+        gop = max(1, int(round(fps * segment_s)))
+        cmd = self._input_args(fps, size) + self._codec_args() + [
+            "-g", str(gop),
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_s})",
+            "-f", "segment",
+            "-segment_time", str(segment_s),
+            "-reset_timestamps", "1",
+            "-segment_list", list_path,
+            "-segment_list_type", "csv",
+            "-segment_list_flags", "+live",
+            os.path.join(directory, f"seg_%08d{containerv}"),
+        ]
+        return FFmpegPipeWriter(cmd, (size[1], size[0], 3))
+
+    def open_hls(self, playlist_path, fps, size, segment_s, list_size):
+        """
+        Abre um processo ffmpeg persistente que gera uma playlist HLS ao vivo
+        com `list_size` segmentos de `segment_s` segundos. Segmentos antigos
+        são apagados pelo próprio ffmpeg e cada segmento leva o horário de
+        início (EXT-X-PROGRAM-DATE-TIME), usado para medir a latência.
+        """
+        gop = max(1, int(round(fps * segment_s)))
+        cmd = self._input_args(fps, size) + self._codec_args() + [
+            "-g", str(gop),
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_s})",
+            "-f", "hls",
+            "-hls_time", str(segment_s),
+            "-hls_list_size", str(list_size),
+            "-hls_flags", "delete_segments+program_date_time+independent_segments+temp_file",
+            playlist_path,
+        ]
+        return FFmpegPipeWriter(cmd, (size[1], size[0], 3))
+
+
+ENCODER_BACKENDS = {
+    OpenCVEncoder.backend: OpenCVEncoder,
+    FFmpegEncoder.backend: FFmpegEncoder,
+}
+
+
+def make_encoder(codec: str, backend: str = "opencv", **options):
+    """Cria o encoder do backend escolhido ('opencv' ou 'ffmpeg')."""
+    try:
+        cls = ENCODER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de codificação desconhecido: {backend}")
+    return cls(codec, **options)
@@ -0,0 +1,189 @@
+import threading
+import time
+
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Buffer circular de frames pré-alocado em um único array contíguo
+    (N, H, W, 3) uint8. A captura escreve diretamente no próximo slot
+    (ex: cap.read(image=buffer.next_slot())), evitando alocar e liberar
+    um frame novo a cada 33 ms.
+    """
+
+    def __init__(self, capacity: int, height: int, width: int, channels: int = 3):
+        """
+        Inicializa o buffer.
+
+        :param capacity: Número de frames guardados (ex: frame * stime).
+        :param height: Altura do frame em pixels.
+        :param width: Largura do frame em pixels.
+        :param channels: Número de canais (3 para BGR).
+        """
+        if capacity <= 0:
+            raise ValueError("A capacidade do buffer deve ser maior que zero.")
+
+        self._capacity = capacity
+        self._frames = np.zeros((capacity, height, width, channels), dtype=np.uint8)
+        # Tempo de captura (time.time()) de cada slot
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._head = 0   # Índice do próximo slot a ser escrito
+        self._count = 0  # Quantidade de slots válidos
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def frame_shape(self):
+        """Retorna o formato (H, W, C) de um frame."""
+        return self._frames.shape[1:]
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelos frames, em bytes."""
+        return self._frames.nbytes
+
+    def is_full(self):
+        return self._count == self._capacity
+
+    # --- Escrita ---
+
+    def next_slot(self):
+        """
+        Retorna uma view do próximo slot a ser escrito. O frame só passa a
+        fazer parte do buffer depois de commit().
+        """
+        return self._frames[self._head]
+
+    def commit(self, timestamp: float = None):
+        """
+        Confirma o slot retornado por next_slot() e avança a cabeça do anel.
+        Retorna o índice do slot confirmado.
+        """
+        with self._lock:
+            index = self._head
+            self._timestamps[index] = time.time() if timestamp is None else timestamp
+            self._head = (index + 1) % self._capacity
+            if self._count < self._capacity:
+                self._count += 1
+        return index
+
+    def append(self, frame, timestamp: float = None):
+        """Copia um frame já existente para o próximo slot (caminho lento)."""
+        np.copyto(self._frames[self._head], frame)
+        return self.commit(timestamp)
+
+    def clear(self):
+        with self._lock:
+            self._head = 0
+            self._count = 0
+
+    # --- Leitura ---
+
+    def _ordered_slices(self):
+        """Retorna os intervalos de índices do mais antigo ao mais novo."""
+        if self._count < self._capacity:
+            return [(0, self._count)]
+        if self._head == 0:
+            return [(0, self._capacity)]
+        return [(self._head, self._capacity), (0, self._head)]
+
+    def ordered_views(self):
+        """
+        Retorna até duas views (sem cópia) que, concatenadas, formam os
+        frames em ordem cronológica. As views apontam para a memória do
+        anel: a captura pode sobrescrevê-las, então use snapshot() se os
+        frames forem lidos fora da thread de captura.
+        """
+        with self._lock:
+            return [self._frames[a:b] for a, b in self._ordered_slices()]
+
+    def ordered_timestamps(self):
+        """Retorna os tempos de captura em ordem cronológica (cópia)."""
+        with self._lock:
+            return np.concatenate([self._timestamps[a:b] for a, b in self._ordered_slices()])
+
+    def iter_frames(self):
+        """Itera sobre os frames (views) do mais antigo ao mais novo."""
+        for view in self.ordered_views():
+            for frame in view:
+                yield frame
+
+    def slot(self, index: int):
+        """Retorna uma view do slot de índice `index`."""
+        return self._frames[index]
+
+    def timestamp_at(self, index: int):
+        """Retorna o tempo de captura do slot de índice `index`."""
+        return float(self._timestamps[index])
+
+    def is_intact(self, index: int, timestamp: float):
+        """
+        Indica se o slot `index` ainda guarda o frame capturado em `timestamp`:
+        False se ele foi sobrescrito (o tempo mudou) ou se é a cabeça do anel
+        (a captura pode estar escrevendo nele agora, antes do commit()).
+        """
+        return self._timestamps[index] == timestamp and self._head != index
+
+    def latest(self):
+        """Retorna uma view do último frame confirmado, ou None se vazio."""
+        if self._count == 0:
+            return None
+        return self._frames[(self._head - 1) % self._capacity]
+
+    def mark(self, start_time: float = None, end_time: float = None):
+        """
+        Congela a janela atual sem copiar pixels: retorna os índices dos slots
+        (do mais antigo ao mais novo) e seus tempos de captura. A cópia pode
+        ser feita depois, fora da thread de captura, com copy_marked().
+
+        :param start_time: Se informado, só os frames capturados a partir desse horário.
+        :param end_time: Se informado, só os frames capturados até esse horário.
+        """
+        with self._lock:
+            slots = np.concatenate([np.arange(a, b) for a, b in self._ordered_slices()])
+            timestamps = self._timestamps[slots].copy()
+        if start_time is not None or end_time is not None:
+            keep = np.ones(len(slots), dtype=bool)
+            if start_time is not None:
+                keep &= timestamps >= start_time
+            if end_time is not None:
+                keep &= timestamps <= end_time
+            slots, timestamps = slots[keep], timestamps[keep]
+        return slots, timestamps
+
+    def copy_marked(self, mark):
+        """
+        Copia os frames de uma janela obtida com mark(), do mais antigo ao mais
+        novo, enquanto a captura continua escrevendo no anel. Como a captura
+        sobrescreve sempre o slot mais antigo, os frames perdidos durante a
+        cópia formam um prefixo e são descartados.
+
+        Retorna (frames, timestamps, perdidos).
+        """
+        slots, timestamps = mark
+        frames = np.empty((len(slots),) + self.frame_shape, dtype=np.uint8)
+        first_valid = 0
+        for n, i in enumerate(slots):
+            np.copyto(frames[n], self._frames[i])
+            # Slot sobrescrito (tempo mudou) ou sendo escrito agora (é a cabeça)
+            if not self.is_intact(i, timestamps[n]):
+                first_valid = n + 1
+        return frames[first_valid:], timestamps[first_valid:], first_valid
+
+    def snapshot(self):
+        """
+        Copia os frames e tempos de captura, em ordem cronológica, para
+        arrays próprios. Retorna (frames, timestamps).
+        """
+        with self._lock:
+            slices = self._ordered_slices()
+            frames = np.concatenate([self._frames[a:b] for a, b in slices])
+            timestamps = np.concatenate([self._timestamps[a:b] for a, b in slices])
+        return frames, timestamps
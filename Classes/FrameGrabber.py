@@ -0,0 +1,172 @@
+import math
+import threading
+import time
+
+import cv2
+
+from Classes.Log import get_logger
+
+log = get_logger("capture")
+
+
+def fit_into_slot(frame, slot):
+    """Copia (redimensionando se preciso) um frame para o slot do buffer."""
+    if frame.shape == slot.shape:
+        slot[...] = frame
+    else:
+        cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot)
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Thread dedicada à captura: chama grab()/retrieve() sem parar e decodifica
+    direto no próximo slot do buffer circular. Não depende de janela nem de
+    cv2.waitKey, então roda em máquinas sem interface gráfica.
+    """
+
+    def __init__(self, cap, buffer, on_commit=None, max_failures: int = 30):
+        """
+        :param cap: Fonte de frames com a API do cv2.VideoCapture.
+        :param buffer: FrameRingBuffer que recebe os frames.
+        :param on_commit: Função chamada com o índice do slot após cada frame.
+        :param max_failures: Falhas seguidas de grab() antes de desistir.
+        """
+        super().__init__(name="FrameGrabber", daemon=True)
+        self._cap = cap
+        self._buffer = buffer
+        self._on_commit = on_commit
+        self._max_failures = max_failures
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._frames = 0
+        self._failures = 0
+        self._started_at = None
+        self._last_ts = None
+        # Intervalo entre frames (Welford: média e variância em uma passada)
+        self._interval_n = 0
+        self._interval_mean = 0.0
+        self._interval_m2 = 0.0
+        self._interval_max = 0.0
+        # Captura -> buffer (só para fontes com frame_time)
+        self._latency_n = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        consecutive_failures = 0
+        while not self._stop_event.is_set():
+            if not self._cap.grab():
+                consecutive_failures += 1
+                with self._stats_lock:
+                    self._failures += 1
+                # Fontes de rede reconectam sozinhas: durante a queda não desiste
+                if consecutive_failures >= self._max_failures and not getattr(self._cap, "reconnecting", False):
+                    log.error("Erro ao capturar frame: limite de falhas atingido.")
+                    break
+                continue
+            timestamp = time.time()
+
+            slot = self._buffer.next_slot()
+            ret, frame = self._cap.retrieve(image=slot)
+            if not ret:
+                consecutive_failures += 1
+                continue
+            consecutive_failures = 0
+            if frame is not slot:
+                fit_into_slot(frame, slot)
+            index = self._buffer.commit(timestamp)
+            # Fontes simuladas informam quando o frame "saiu do sensor"
+            frame_time = getattr(self._cap, "frame_time", None)
+            self._record(timestamp, time.time() - frame_time if frame_time is not None else None)
+
+            if self._on_commit is not None:
+                self._on_commit(index)
+
+    def _record(self, timestamp, latency=None):
+        with self._stats_lock:
+            if latency is not None:
+                self._latency_n += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+            self._frames += 1
+            if self._started_at is None:
+                self._started_at = timestamp
+            if self._last_ts is not None:
+                interval = timestamp - self._last_ts
+                self._interval_n += 1
+                delta = interval - self._interval_mean
+                self._interval_mean += delta / self._interval_n
+                self._interval_m2 += delta * (interval - self._interval_mean)
+                self._interval_max = max(self._interval_max, interval)
+            self._last_ts = timestamp
+
+    def stats(self):
+        """
+        Retorna frames capturados, fps médio, jitter (desvio padrão do
+        intervalo entre frames) e latência captura -> buffer, em milissegundos.
+        """
+        with self._stats_lock:
+            elapsed = (self._last_ts - self._started_at) if self._frames > 1 else 0.0
+            variance = self._interval_m2 / self._interval_n if self._interval_n else 0.0
+            return {
+                "frames": self._frames,
+                "failures": self._failures,
+                "fps": (self._frames - 1) / elapsed if elapsed > 0 else 0.0,
+                "interval_mean_ms": self._interval_mean * 1000,
+                "jitter_ms": math.sqrt(variance) * 1000,
+                "interval_max_ms": self._interval_max * 1000,
+                "latency_mean_ms": self._latency_total / self._latency_n * 1000 if self._latency_n else None,
+                "latency_max_ms": self._latency_max * 1000 if self._latency_n else None,
+                "dropped": getattr(self._cap, "dropped", 0),
+            }
+
+
+class PreviewPublisher(threading.Thread):
+    """
+    Publica uma prévia reduzida (ex: 5 fps, metade da resolução) do último
+    frame do buffer para os assinantes. Roda na sua própria thread, então
+    não interfere no ritmo da captura.
+    """
+
+    def __init__(self, buffer, fps: float = 5.0, scale: float = 0.5):
+        super().__init__(name="PreviewPublisher", daemon=True)
+        self._buffer = buffer
+        self._interval = 1.0 / fps
+        self._scale = scale
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def subscribe(self, callback):
+        """Registra uma função que recebe cada frame da prévia."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                continue
+            frame = self._buffer.latest()
+            if frame is None:
+                continue
+            small = cv2.resize(frame, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+            for callback in subscribers:
+                try:
+                    callback(small)
+                except Exception as e:
+                    log.warning("Erro no assinante da prévia: %s", e)
@@ -0,0 +1,438 @@
+import os
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from Classes.Log import get_logger
+
+log = get_logger("capture")
+
+
+class _Pacer:
+    """
+    Ritmo de uma fonte simulada. Como numa câmera real, se o leitor atrasar
+    mais de um frame os frames perdidos são descartados (contados em
+    `dropped`) em vez de entregues em rajada.
+    """
+
+    def __init__(self, fps: float, speed: float, drop_late: bool):
+        self._period = 1.0 / (fps * speed) if speed else 0.0
+        self._drop_late = drop_late
+        self._next_due = None
+        self.dropped = 0
+        # Horário (time.time) em que o frame atual "saiu do sensor"
+        self.frame_time = None
+
+    def wait(self):
+        """Espera o próximo frame; retorna quantos frames foram perdidos no atraso."""
+        now = time.perf_counter()
+        if not self._period:
+            self.frame_time = time.time()
+            return 0
+        if self._next_due is None:
+            self._next_due = now
+        elif now < self._next_due:
+            time.sleep(self._next_due - now)
+            now = time.perf_counter()
+        missed = 0
+        if self._drop_late and now - self._next_due >= self._period:
+            missed = int((now - self._next_due) / self._period)
+            self._next_due += missed * self._period
+            self.dropped += missed
+        self.frame_time = time.time() - (now - self._next_due)
+        self._next_due += self._period
+        return missed
+
+
+class SyntheticSource:
+    """
+    Fonte de frames gerados com NumPy (sem câmera), com a mesma API do
+    cv2.VideoCapture usada pelo Recorder: isOpened, grab, retrieve, read,
+    release. Um bloco branco percorre a imagem e o número do frame fica
+    codificado nos primeiros pixels, o que permite conferir a ordem depois.
+    """
+
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 30.0, realtime: bool = True,
+                 max_frames: int = None, speed: float = None, drop_late: bool = True):
+        """
+        :param width: Largura dos frames.
+        :param height: Altura dos frames.
+        :param fps: Taxa de quadros simulada.
+        :param realtime: Se True, grab() espera o tempo de cada frame.
+        :param max_frames: Encerra a fonte após esse número de frames (None = infinito).
+        :param speed: Multiplicador do ritmo (2.0 = duas vezes mais rápido, 0 = sem espera);
+                      substitui `realtime` quando informado.
+        :param drop_late: Descarta os frames que o leitor não pegou a tempo (como uma câmera).
+        """
+        self._width = width
+        self._height = height
+        self._fps = fps
+        self._max_frames = max_frames
+        self._index = -1
+        self._pacer = _Pacer(fps, speed if speed is not None else float(realtime), drop_late)
+        self._opened = True
+        # Fundo em degradê, calculado uma única vez
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        self._background = np.repeat(np.repeat(gradient[None, :, None], height, axis=0), 3, axis=2)
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self._fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._height)
+        return 0.0
+
+    def grab(self):
+        if not self._opened:
+            return False
+        if self._max_frames is not None and self._index + 1 >= self._max_frames:
+            return False
+        # Frames perdidos também avançam o bloco (o número do frame denuncia o buraco)
+        self._index += 1 + self._pacer.wait()
+        return True
+
+    @property
+    def dropped(self):
+        """Frames descartados porque o leitor atrasou."""
+        return self._pacer.dropped
+
+    @property
+    def frame_time(self):
+        """Horário de captura (time.time) do último frame."""
+        return self._pacer.frame_time
+
+    def retrieve(self, image=None):
+        if image is None or image.shape != self._background.shape:
+            image = np.empty_like(self._background)
+        np.copyto(image, self._background)
+        # Bloco branco que se move a cada frame
+        size = max(8, self._height // 8)
+        x = (self._index * 8) % max(1, self._width - size)
+        image[self._height // 2 - size // 2:self._height // 2 + size // 2, x:x + size] = 255
+        # Número do frame nos 4 primeiros pixels (canal azul)
+        image[0, :4, 0] = np.frombuffer(np.uint32(self._index).tobytes(), dtype=np.uint8)
+        return True, image
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self._opened = False
+
+
+class FileSource:
+    """
+    Reproduz um arquivo de vídeo como se fosse uma câmera, no ritmo real
+    (realtime=True), acelerado (speed=4.0) ou o mais rápido possível,
+    opcionalmente em loop.
+    """
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = True, fps: float = None,
+                 speed: float = None, drop_late: bool = True):
+        """
+        :param path: Arquivo de vídeo.
+        :param realtime: Se True, entrega os frames no fps do arquivo.
+        :param loop: Volta ao início no fim do arquivo.
+        :param fps: Substitui o fps lido do arquivo.
+        :param speed: Multiplicador do ritmo (0 = sem espera); substitui `realtime` quando informado.
+        :param drop_late: Descarta os frames que o leitor não pegou a tempo (como uma câmera).
+        """
+        self._path = path
+        self._loop = loop
+        self._cap = cv2.VideoCapture(path)
+        self._fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._pacer = _Pacer(self._fps, speed if speed is not None else float(realtime), drop_late)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self._fps)
+        return self._cap.get(prop)
+
+    def grab(self):
+        # Frames perdidos no atraso são pulados no arquivo (grab sem decodificar)
+        for _ in range(self._pacer.wait() + 1):
+            if not self._grab_next():
+                return False
+        return True
+
+    def _grab_next(self):
+        if self._cap.grab():
+            return True
+        if not self._loop:
+            return False
+        # Fim do arquivo: volta para o início
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return self._cap.grab()
+
+    @property
+    def dropped(self):
+        """Frames descartados porque o leitor atrasou."""
+        return self._pacer.dropped
+
+    @property
+    def frame_time(self):
+        """Horário de captura (time.time) do último frame."""
+        return self._pacer.frame_time
+
+    def retrieve(self, image=None):
+        return self._cap.retrieve(image)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        self._cap.release()
+
+
+class NetworkSource:
+    """
+    Câmera IP (RTSP ou HTTP MJPEG) decodificada numa thread própria: a
+    oscilação da rede nunca bloqueia a captura. A thread guarda só o frame
+    mais recente (dois buffers alternados); se o leitor atrasar, os frames
+    não lidos são descartados em vez de acumular latência.
+
+    Se o stream cair, a thread reconecta com espera exponencial (com
+    variação aleatória) e contabiliza a queda: duração e frames perdidos
+    estimados pelo fps do stream.
+    """
+
+    NETWORK_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://")
+
+    def __init__(self, url: str, fps: float = None, backoff_min_s: float = 0.5, backoff_max_s: float = 30.0,
+                 open_timeout_s: float = 5.0, read_timeout_s: float = 5.0, grab_timeout_s: float = 1.0,
+                 rtsp_transport: str = "tcp"):
+        """
+        :param url: Endereço do stream (rtsp://..., http://.../video.mjpg).
+        :param fps: fps esperado (padrão: o informado pelo stream, ou 30).
+        :param backoff_min_s: Primeira espera antes de reconectar.
+        :param backoff_max_s: Espera máxima entre tentativas.
+        :param open_timeout_s: Tempo máximo para abrir o stream.
+        :param read_timeout_s: Tempo sem frames até considerar o stream caído.
+        :param grab_timeout_s: Tempo máximo que grab() espera por um frame novo.
+        :param rtsp_transport: Transporte do RTSP ('tcp' evita frames corrompidos por perda de pacotes).
+        """
+        self._url = url
+        self._fps = fps
+        self._backoff_min_s = backoff_min_s
+        self._backoff_max_s = backoff_max_s
+        self._open_timeout_s = open_timeout_s
+        self._read_timeout_s = read_timeout_s
+        self._grab_timeout_s = grab_timeout_s
+        if url.startswith("rtsp") and rtsp_transport:
+            # Opções do backend FFMPEG do OpenCV (lidas ao abrir o stream)
+            os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", f"rtsp_transport;{rtsp_transport}")
+
+        self._cond = threading.Condition()
+        self._buffers = [None, None]
+        self._latest = None          # Índice do buffer com o frame mais recente
+        self._seq = 0                # Frames decodificados
+        self._consumed = 0           # Último frame entregue ao leitor
+        self._frame_time = None
+        self._delivered_time = None
+        self._size = (0, 0)
+        self._closed = False
+        self.reconnecting = False    # True durante uma queda (o FrameGrabber não desiste)
+
+        self._stats = {"decoded": 0, "stale_dropped": 0, "connects": 0, "outages": 0,
+                       "outage_s": 0.0, "outage_lost_frames": 0, "last_error": None}
+        self._outage_started = None
+        self._thread = threading.Thread(target=self._decode_loop, name="NetworkSource", daemon=True)
+        self._thread.start()
+
+    # --- API do cv2.VideoCapture ---
+
+    def isOpened(self):
+        """True enquanto a fonte não for liberada (as quedas são tratadas pela thread)."""
+        return not self._closed
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self._fps or 30.0)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._size[1])
+        return 0.0
+
+    def grab(self):
+        """Espera um frame novo (até grab_timeout_s); False se não chegou nenhum."""
+        deadline = time.monotonic() + self._grab_timeout_s
+        with self._cond:
+            while self._seq == self._consumed and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            if self._closed:
+                return False
+            # Frames decodificados e nunca lidos foram substituídos pelo mais recente
+            self._stats["stale_dropped"] += self._seq - self._consumed - 1
+            self._consumed = self._seq
+            self._delivered_time = self._frame_time
+            return True
+
+    def retrieve(self, image=None):
+        with self._cond:
+            frame = self._buffers[self._latest]
+            if image is not None and image.shape == frame.shape:
+                np.copyto(image, frame)
+                return True, image
+            return True, frame.copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    @property
+    def dropped(self):
+        """Frames perdidos: substituídos antes de serem lidos e estimados nas quedas."""
+        with self._cond:
+            return self._stats["stale_dropped"] + self._stats["outage_lost_frames"]
+
+    @property
+    def frame_time(self):
+        """Horário (time.time) em que o último frame entregue foi decodificado."""
+        return self._delivered_time
+
+    def stats(self):
+        """Conexões, quedas (número, duração, frames perdidos) e frames descartados."""
+        with self._cond:
+            data = dict(self._stats)
+            data["connected"] = not self.reconnecting
+            if self._outage_started is not None:
+                data["outage_s"] += time.monotonic() - self._outage_started
+        return data
+
+    # --- Thread de decodificação ---
+
+    def _open(self):
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self._open_timeout_s * 1000),
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self._read_timeout_s * 1000)]
+        cap = cv2.VideoCapture(self._url, cv2.CAP_FFMPEG, params)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        if self._fps is None:
+            self._fps = cap.get(cv2.CAP_PROP_FPS) or None
+            if self._fps is not None and not 1 <= self._fps <= 240:
+                self._fps = None  # Alguns streams informam valores absurdos (ex: 90000)
+        return cap
+
+    def _decode_loop(self):
+        attempt = 0
+        cap = None
+        self._start_outage()
+        while not self._closed:
+            if cap is None:
+                cap = self._open()
+                if cap is None:
+                    attempt += 1
+                    self._stats["last_error"] = f"Não foi possível abrir {self._url}"
+                    self._backoff(attempt)
+                    continue
+                attempt = 0
+                self._end_outage()
+
+            with self._cond:
+                target = 0 if self._latest != 0 else 1
+            ok, frame = cap.read(self._buffers[target])
+            if not ok or frame is None:
+                # Stream caiu ou ficou read_timeout_s sem frames: reconecta
+                cap.release()
+                cap = None
+                self._stats["last_error"] = "Stream interrompido"
+                self._start_outage()
+                continue
+            with self._cond:
+                self._buffers[target] = frame
+                self._latest = target
+                self._seq += 1
+                self._frame_time = time.time()
+                self._size = (frame.shape[1], frame.shape[0])
+                self._stats["decoded"] += 1
+                self._cond.notify_all()
+        if cap is not None:
+            cap.release()
+
+    def _backoff(self, attempt):
+        """Espera exponencial (0.5, 1, 2, 4... até backoff_max_s) com ±20% de variação."""
+        delay = min(self._backoff_max_s, self._backoff_min_s * 2 ** (attempt - 1))
+        delay *= random.uniform(0.8, 1.2)
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed, timeout=delay)
+
+    def _start_outage(self):
+        with self._cond:
+            if self._outage_started is None:
+                self._outage_started = time.monotonic()
+                self.reconnecting = True
+
+    def _end_outage(self):
+        with self._cond:
+            self._stats["connects"] += 1
+            if self._outage_started is not None and self._stats["connects"] > 1:
+                # A primeira conexão não conta como queda
+                duration = time.monotonic() - self._outage_started
+                self._stats["outages"] += 1
+                self._stats["outage_s"] += duration
+                self._stats["outage_lost_frames"] += int(duration * (self._fps or 30.0))
+                log.warning("Stream reconectado após %.1fs: %s", duration, self._url)
+            self._outage_started = None
+            self.reconnecting = False
+
+
+def open_source(source):
+    """
+    Abre uma fonte de frames a partir de uma descrição simples (que pode
+    ser enviada para outro processo):
+
+    - None ou int: câmera local (cv2.VideoCapture(índice));
+    - str rtsp://, http://...: câmera IP (NetworkSource, com reconexão);
+    - outra str: arquivo aberto pelo cv2.VideoCapture;
+    - dict com "kind": "camera" ({"index": 0}), "synthetic" ou "file" e os
+      parâmetros da fonte;
+    - função sem argumentos que retorna a fonte.
+    """
+    if source is None:
+        return cv2.VideoCapture(0)
+    if isinstance(source, str) and source.lower().startswith(NetworkSource.NETWORK_SCHEMES):
+        return NetworkSource(source)
+    if isinstance(source, (int, str)):
+        return cv2.VideoCapture(source)
+    if isinstance(source, dict):
+        options = dict(source)
+        kind = options.pop("kind")
+        if kind == "camera":
+            return cv2.VideoCapture(options.get("index", 0))
+        if kind == "synthetic":
+            return SyntheticSource(**options)
+        if kind == "file":
+            return FileSource(**options)
+        if kind == "network":
+            return NetworkSource(**options)
+        raise ValueError(f"Tipo de fonte desconhecido: {kind}")
+    if callable(source):
+        return source()
+    raise TypeError(f"Fonte de frames inválida: {source!r}")
@@ -0,0 +1,95 @@
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+# Tamanho dos blocos quando não há sendfile (envio em Python)
+CHUNK_SIZE = 256 * 1024
+
+# Clipes nunca mudam depois de gravados: proxies e navegadores podem guardar
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def file_etag(st):
+    """ETag forte baseado na identidade do arquivo (inode, tamanho, mtime)."""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def last_modified(st):
+    return formatdate(st.st_mtime, usegmt=True)
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def is_not_modified(st, etag, if_none_match, if_modified_since):
+    """Verifica as condições de um GET condicional (resposta 304)."""
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(st.st_mtime) <= int(since)
+    return False
+
+
+def parse_range(header, size, etag=None, if_range=None):
+    """
+    Interpreta o cabeçalho Range para um arquivo de `size` bytes.
+
+    Retorna:
+    - None: sem Range (ou If-Range não confere), enviar o arquivo inteiro;
+    - (início, fim_exclusivo): um intervalo válido (resposta 206);
+    - False: intervalo impossível de atender (resposta 416).
+
+    Pedidos com vários intervalos são atendidos com o arquivo inteiro.
+    """
+    if not header:
+        return None
+    if if_range and if_range.strip() != etag:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Sufixo: últimos N bytes
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(0, size - length), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start >= size or start < 0 or end <= start:
+        return False
+    return start, min(end, size)
+
+
+def iter_file(f, start, length, chunk_size=CHUNK_SIZE):
+    """Lê `length` bytes a partir de `start`, em blocos, e fecha o arquivo."""
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def resolve_path(base_dir, filename):
+    """Junta base_dir e filename impedindo acesso fora da pasta (ex: '../')."""
+    base = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base, filename))
+    if os.path.commonpath([base, path]) != base:
+        return None
+    return path
@@ -0,0 +1,167 @@
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from Classes.ClipLayout import location_slug
+from Classes.Encoders import FFmpegEncoder
+from Classes.Log import get_logger
+from Classes.SegmentRing import default_segment_dir
+
+# Pasta das playlists ao vivo (tmpfs), compartilhada com o api_solver
+DEFAULT_LIVE_DIR = os.environ.get("LIVE_DIR", os.path.join(default_segment_dir(), "sport_capture_live"))
+
+PLAYLIST_NAME = "index.m3u8"
+
+log = get_logger("live")
+
+
+class HLSLiveStream:
+    """
+    Gera uma transmissão HLS ao vivo a partir dos frames capturados pelo
+    Recorder. Um único processo ffmpeg codifica cada frame uma vez; todos
+    os espectadores recebem os mesmos segmentos, servidos como arquivos
+    estáticos pelo api_solver (/live/<nome>/index.m3u8).
+
+    A janela da playlist é limitada (list_size segmentos) e o ffmpeg apaga
+    os segmentos antigos. Com stamp_time=True o horário de captura é
+    desenhado na imagem, o que permite medir a latência ponta a ponta
+    comparando com o relógio de quem assiste.
+    """
+
+    def __init__(self, staging, size: tuple, fps: float, name: str, directory: str = None,
+                 segment_s: float = 1.0, list_size: int = 4, scale: float = 1.0, fps_divisor: int = 1,
+                 stamp_time: bool = True, encoder_options: dict = None):
+        """
+        :param staging: FrameRingBuffer de onde os frames são lidos.
+        :param size: (largura, altura) dos frames capturados.
+        :param fps: Taxa de quadros da captura.
+        :param name: Local da transmissão; vira o nome da pasta e da URL (ex: 'quadra_3').
+        :param directory: Pasta base das transmissões (padrão: DEFAULT_LIVE_DIR).
+        :param segment_s: Duração de cada segmento (menor = menos latência).
+        :param list_size: Número de segmentos na playlist.
+        :param scale: Fator de redução da imagem ao vivo.
+        :param fps_divisor: Envia 1 a cada N frames (ex: 2 = metade do fps).
+        :param stamp_time: Desenha o horário de captura na imagem ao vivo.
+        :param encoder_options: Opções do FFmpegEncoder (preset, crf, threads...).
+        """
+        self._staging = staging
+        self._fps_divisor = max(1, fps_divisor)
+        self._fps = fps / self._fps_divisor
+        self._stamp_time = stamp_time
+        width, height = size
+        # O x264 exige dimensões pares
+        self._size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+        self._scratch = np.empty((self._size[1], self._size[0], 3), dtype=np.uint8)
+
+        # Mesmo nome da pasta dos clipes do local (ex: 'Quadra 3' -> 'quadra_3')
+        self.name = location_slug(name)
+        self.directory = os.path.join(directory or DEFAULT_LIVE_DIR, self.name)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+        self.playlist_path = os.path.join(self.directory, PLAYLIST_NAME)
+
+        options = {"preset": "ultrafast", "crf": 28, "extra_args": ["-tune", "zerolatency"]}
+        options.update(encoder_options or {})
+        self._encoder = FFmpegEncoder("avc1", **options)
+        self._segment_s = segment_s
+        self._list_size = list_size
+
+        self._counter = 0
+        self._queue = queue.Queue(maxsize=max(2, int(self._fps)))
+        self._stats_lock = threading.Lock()
+        self._frames_sent = 0
+        self._dropped = 0
+        self._last_lag_s = 0.0
+        # Erro que encerrou a transmissão (ffmpeg terminou, disco cheio...)
+        self.error = None
+        self._thread = threading.Thread(target=self._encode_loop, name=f"HLSLiveStream-{self.name}", daemon=True)
+        self._thread.start()
+
+    def push(self, index: int):
+        """Chamado na thread de captura para cada frame novo (não bloqueia)."""
+        self._counter += 1
+        if self._counter % self._fps_divisor or self.error is not None:
+            return
+        try:
+            self._queue.put_nowait((index, self._staging.timestamp_at(index)))
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+
+    def stats(self):
+        """Frames enviados/descartados e atraso entre a captura e o envio ao encoder."""
+        with self._stats_lock:
+            return {
+                "frames_sent": self._frames_sent,
+                "dropped": self._dropped,
+                "capture_to_encoder_s": self._last_lag_s,
+                "segment_s": self._segment_s,
+                "playlist": self.playlist_path,
+                "error": str(self.error) if self.error is not None else None,
+            }
+
+    def close(self, timeout: float = 5.0):
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                log.warning("Transmissão ao vivo %s não respondeu ao encerramento.", self.name)
+            self._thread.join(timeout)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _encode_loop(self):
+        writer = None
+        try:
+            writer = self._encoder.open_hls(self.playlist_path, self._fps, self._size,
+                                            self._segment_s, self._list_size)
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                index, timestamp = item
+                frame = None
+                if self._staging.is_intact(index, timestamp):
+                    frame = self._prepare(self._staging.slot(index), timestamp)
+                # Frame sobrescrito antes ou durante a cópia: não é publicado
+                if frame is None or not self._staging.is_intact(index, timestamp):
+                    with self._stats_lock:
+                        self._dropped += 1
+                    continue
+                writer.write(frame)
+                with self._stats_lock:
+                    self._frames_sent += 1
+                    self._last_lag_s = time.time() - timestamp
+        except Exception as e:
+            # A transmissão para; a gravação continua. push() passa a ignorar os frames
+            log.error("Transmissão ao vivo %s encerrada: %s", self.name, e)
+            self.error = e
+            try:
+                while True:
+                    self._queue.get_nowait()
+            except queue.Empty:
+                pass
+        finally:
+            if writer is not None:
+                try:
+                    writer.release()
+                except Exception as e:
+                    if self.error is None:
+                        log.warning("Erro ao fechar a transmissão ao vivo %s: %s", self.name, e)
+
+    def _prepare(self, frame, timestamp):
+        """Reduz e marca o frame numa área própria, sem alterar o buffer de gravação."""
+        if frame.shape[:2] == self._scratch.shape[:2]:
+            np.copyto(self._scratch, frame)
+        else:
+            cv2.resize(frame, self._size, dst=self._scratch, interpolation=cv2.INTER_AREA)
+        if self._stamp_time:
+            text = datetime.fromtimestamp(timestamp).strftime("%H:%M:%S.%f")[:-3]
+            cv2.putText(self._scratch, text, (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return self._scratch
+
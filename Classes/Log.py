@@ -0,0 +1,67 @@
+"""
+Log com níveis e limite de taxa para os laços quentes (captura,
+exportação, limpeza do disco), no lugar dos print() por frame/arquivo.
+
+Mensagens com o mesmo modelo (ex: "Erro ao deletar %s: %s") contam juntas:
+depois de `burst` mensagens em `interval_s` segundos as seguintes são
+descartadas e a próxima que passar informa quantas foram suprimidas.
+O nível vem da variável de ambiente SPORT_CAPTURE_LOG_LEVEL (padrão INFO).
+"""
+import logging
+import os
+import threading
+import time
+
+LOGGER_PREFIX = "sport_capture"
+
+
+class RateLimitFilter(logging.Filter):
+    """Limita cada modelo de mensagem a `burst` registros por `interval_s` segundos."""
+
+    def __init__(self, interval_s: float = 10.0, burst: int = 5):
+        super().__init__()
+        self._interval_s = interval_s
+        self._burst = burst
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self._interval_s:
+                started, count = now, 0
+            if count >= self._burst:
+                self._windows[key] = (started, count, suppressed + 1)
+                return False
+            self._windows[key] = (started, count + 1, 0)
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} mensagens iguais suprimidas)"
+        return True
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger(LOGGER_PREFIX)
+        if not root.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+            handler.addFilter(RateLimitFilter())
+            root.addHandler(handler)
+        root.setLevel(os.environ.get("SPORT_CAPTURE_LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str):
+    """Logger 'sport_capture.<name>' com o handler limitado configurado."""
+    _configure()
+    return logging.getLogger(f"{LOGGER_PREFIX}.{name}")
@@ -0,0 +1,305 @@
+"""
+Métricas no formato do Prometheus (contadores, gauges e histogramas).
+
+Registrar um valor custa uma chamada de método com um lock (poucas
+centenas de nanossegundos): os objetos com labels são resolvidos uma vez e
+guardados por quem mede. Valores que já existem em outro lugar (fps da
+captura, fila de exportação...) são lidos só na hora da coleta, por uma
+função (set_function), sem custo no laço de captura.
+
+O processo da API serve /metrics; o processo do Recorder pode expor as
+suas métricas enviando-as periodicamente (MetricsPusher) para a API ou
+para um Pushgateway.
+"""
+import bisect
+import json
+import math
+import threading
+import time
+import urllib.request
+
+from Classes.Log import get_logger
+
+# Buckets padrão (segundos) para latências de requisição
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+
+class _Value:
+    """Valor de um contador/gauge para uma combinação de labels."""
+
+    __slots__ = ("_value", "_lock", "_function")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._function = None
+
+    # acquire/release explícitos: mais baratos que o 'with' no caminho quente
+    def inc(self, amount: float = 1.0):
+        self._lock.acquire()
+        self._value += amount
+        self._lock.release()
+
+    def dec(self, amount: float = 1.0):
+        self._lock.acquire()
+        self._value -= amount
+        self._lock.release()
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function):
+        """O valor passa a ser lido de function() na coleta."""
+        self._function = function
+
+    def get(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return math.nan
+            return math.nan if value is None else value
+        return self._value
+
+    def samples(self, name, labels):
+        return [(name, labels, self.get())]
+
+
+class _HistogramValue:
+    """Histograma de uma combinação de labels: contagem por bucket, soma e total."""
+
+    __slots__ = ("_buckets", "_counts", "_sum", "_count", "_lock")
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        self._lock.acquire()
+        self._counts[index] += 1
+        self._sum += value
+        self._count += 1
+        self._lock.release()
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        samples = []
+        cumulative = 0
+        for bound, n in zip(self._buckets, counts):
+            cumulative += n
+            samples.append((name + "_bucket", dict(labels, le=_format_value(bound)), cumulative))
+        samples.append((name + "_bucket", dict(labels, le="+Inf"), count))
+        samples.append((name + "_sum", labels, total))
+        samples.append((name + "_count", labels, count))
+        return samples
+
+
+class Metric:
+    """
+    Família de métricas com o mesmo nome. Sem labels, a própria família
+    tem inc/set/observe; com labels, use labels(...) uma vez e guarde o
+    objeto retornado.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            child = self.labels()
+            # Atalhos sem labels: metric.inc(), metric.observe(...)
+            for attr in ("inc", "dec", "set", "set_function", "observe", "get"):
+                if hasattr(child, attr):
+                    setattr(self, attr, getattr(child, attr))
+
+    def labels(self, *values, **kwargs):
+        """Retorna (criando se preciso) o valor para essa combinação de labels."""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: esperados os labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = _HistogramValue(self._buckets) if self.kind == HISTOGRAM else _Value()
+                    self._children[values] = child
+        return child
+
+    def remove(self, *values):
+        """Remove uma combinação de labels (ex: um Recorder que foi fechado)."""
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in values), None)
+
+    def collect(self):
+        """Retorna {'name', 'type', 'help', 'samples': [(nome, labels, valor), ...]}."""
+        with self._lock:
+            children = list(self._children.items())
+        samples = []
+        for values, child in children:
+            samples.extend(child.samples(self.name, dict(zip(self.labelnames, values))))
+        return {"name": self.name, "type": self.kind, "help": self.help, "samples": samples}
+
+
+class MetricsRegistry:
+    """Conjunto de métricas de um processo."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name, help, kind, labelnames, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Metric(name, help, kind, labelnames, buckets)
+                self._metrics[name] = metric
+            elif metric.kind != kind or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo/labels.")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames=()):
+        return self._get_or_create(name, help, COUNTER, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames=()):
+        return self._get_or_create(name, help, GAUGE, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(name, help, HISTOGRAM, labelnames, buckets)
+
+    def collect(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.collect() for metric in metrics]
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        return render_families(self.collect())
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_families(families):
+    """Gera o texto do Prometheus; famílias com o mesmo nome são juntadas."""
+    merged = {}
+    for family in families:
+        target = merged.setdefault(family["name"], {"type": family["type"], "help": family["help"], "samples": []})
+        target["samples"].extend(family["samples"])
+    lines = []
+    for name, family in merged.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for sample_name, labels, value in family["samples"]:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(v)}"' for key, v in labels.items())
+                lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{sample_name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def with_labels(families, **labels):
+    """Cópia das famílias com labels extras em todas as amostras (ex: job do processo)."""
+    return [
+        dict(family, samples=[(name, dict(sample_labels, **labels), value)
+                              for name, sample_labels, value in family["samples"]])
+        for family in families
+    ]
+
+
+# Registro padrão do processo
+REGISTRY = MetricsRegistry()
+
+
+class PushedMetrics:
+    """
+    Métricas recebidas de outros processos (ex: Recorders), guardadas pelo
+    nome do job. Jobs que param de enviar somem depois de `stale_s`.
+    """
+
+    def __init__(self, stale_s: float = 300.0):
+        self._stale_s = stale_s
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def push(self, job: str, families):
+        with self._lock:
+            self._jobs[job] = (time.monotonic(), with_labels(families, job=job))
+
+    def collect(self):
+        now = time.monotonic()
+        with self._lock:
+            for job in [job for job, (at, _) in self._jobs.items() if now - at > self._stale_s]:
+                del self._jobs[job]
+            return [family for _, families in self._jobs.values() for family in families]
+
+
+class MetricsPusher(threading.Thread):
+    """
+    Envia as métricas do processo a cada `interval_s` segundos.
+
+    - url da API (ex: http://api:5000/metrics/push/quadra_1): JSON com as famílias;
+    - url de um Pushgateway (ex: http://pushgateway:9091/metrics/job/quadra_1)
+      com fmt='prometheus': texto do Prometheus.
+    """
+
+    def __init__(self, url: str, interval_s: float = 15.0, registry: MetricsRegistry = None,
+                 fmt: str = "json", timeout_s: float = 5.0):
+        super().__init__(name="MetricsPusher", daemon=True)
+        self._url = url
+        self._interval_s = interval_s
+        self._registry = registry or REGISTRY
+        self._fmt = fmt
+        self._timeout_s = timeout_s
+        self._stop_event = threading.Event()
+        self.failures = 0
+
+    def push_once(self):
+        if self._fmt == "prometheus":
+            body, content_type = self._registry.render().encode(), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(self._registry.collect()).encode(), "application/json"
+        request = urllib.request.Request(self._url, data=body, method="PUT",
+                                         headers={"Content-Type": content_type})
+        with urllib.request.urlopen(request, timeout=self._timeout_s) as response:
+            response.read()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self._interval_s):
+            try:
+                self.push_once()
+            except Exception as e:
+                self.failures += 1
+                get_logger("metrics").warning("Falha ao enviar métricas para %s: %s", self._url, e)
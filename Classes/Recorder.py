@@ -1,9 +1,45 @@
 import cv2
-from collections import deque
-from datetime import datetime 
+import functools
 import os
+import queue
+import threading
+import time
+from Classes.ActivityDetector import ActivityDetector
+from Classes.ClipExporter import ClipExporter
+from Classes.ClipLayout import clip_name, clip_path
+from Classes.CompressedRing import CompressedFrameRing
+from Classes.Degradation import DegradationController
+from Classes.Encoders import make_encoder
+from Classes.FrameBuffer import FrameRingBuffer
+from Classes.FrameGrabber import FrameGrabber, PreviewPublisher, fit_into_slot
+from Classes.FrameSources import NetworkSource, open_source
+from Classes.LiveStream import HLSLiveStream
+from Classes.Log import get_logger
+from Classes.Metrics import REGISTRY
+from Classes.SegmentRing import SegmentRing
+from Classes.Triggers import TriggerBus
 #import pigpio
 
+log = get_logger("recorder")
+
+# Métricas (servidas em /metrics pela API ou enviadas com MetricsPusher), uma série por local
+FRAMES_TOTAL = REGISTRY.counter("sport_capture_frames_total", "Frames que entraram no buffer.", ("location",))
+FRAMES_DROPPED = REGISTRY.counter("sport_capture_frames_dropped_total",
+                                  "Frames perdidos pela fonte (leitura atrasada ou queda da câmera).", ("location",))
+CAPTURE_FPS = REGISTRY.gauge("sport_capture_capture_fps", "fps medido pela thread de captura.", ("location",))
+BUFFER_FILL = REGISTRY.gauge("sport_capture_buffer_fill_ratio", "Ocupação do buffer circular (0 a 1).", ("location",))
+EXPORT_QUEUE = REGISTRY.gauge("sport_capture_export_queue_depth", "Clipes aguardando cópia ou codificação.",
+                              ("location",))
+CLIPS_TOTAL = REGISTRY.counter("sport_capture_clips_total",
+                               "Clipes pedidos, por resultado (saved, failed, queue_full, no_space).",
+                               ("location", "result"))
+ENCODE_MS_PER_FRAME = REGISTRY.histogram("sport_capture_encode_ms_per_frame", "Tempo de codificação por frame (ms).",
+                                         ("location", "codec"), buckets=(0.5, 1, 2, 5, 10, 20, 50, 100, 250))
+DEGRADATION_LEVEL = REGISTRY.gauge("sport_capture_degradation_level",
+                                   "Nível de degradação da exportação (0 = configuração original).", ("location",))
+CLIP_BYTES = REGISTRY.histogram("sport_capture_clip_bytes", "Tamanho dos clipes gravados (bytes).", ("location",),
+                                buckets=(1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9))
+
 class Recorder:
     # O método construtor agora inicializa os atributos privados.
     # Usamos o sublinhado (_) para indicar que são para uso interno da classe.
@@ -16,9 +52,23 @@ class Recorder:
     record = False
     recording_started = False
     out = None
-    buffer_frames = deque(maxlen=window_width)
+
+    # Modos de buffer
+    BUFFER_RAW = "raw"            # Frames BGR crus na memória, codificados ao salvar
+    BUFFER_SEGMENTS = "segments"  # Segmentos de 1 s já comprimidos, remux ao salvar
+    BUFFER_JPEG = "jpeg"          # Frames em JPEG com orçamento de memória em MB
+
+    # Organização dos clipes na pasta
+    LAYOUT_PARTITIONED = "partitioned"  # <path>/<local>/AAAA/MM/DD/HH/<ISO 8601>.mp4
+    LAYOUT_FLAT = "flat"                # Todos os clipes direto em <path>
     
-    def __init__(self, location: str, ip_address: str, cam_height: int, cam_width: int, path: str):
+    def __init__(self, location: str, ip_address: str, cam_height: int, cam_width: int, path: str,
+                 export_workers: int = 1, export_queue: int = 2, buffer_mode: str = BUFFER_RAW,
+                 encoder_backend: str = "opencv", encoder_options: dict = None,
+                 source=None, frame: int = None, stime: int = None, catalog=None, live: dict = None,
+                 storage=None, layout: str = LAYOUT_PARTITIONED, activity: dict = None,
+                 auto_save: bool = False, trigger_bus: dict = None, adaptive: dict = None,
+                 jpeg_buffer: dict = None):
         self._location = location
         self._ip_address = ip_address
         self._cam_height = cam_height
@@ -30,9 +80,102 @@ class Recorder:
         else:
             print("Diretório já existe.")
         self._path = path
+        # Fonte de frames (ver open_source): câmera 0 por padrão, ou arquivo,
+        # URL, fonte sintética... permite vários Recorders no mesmo processo.
+        # Se ip_address for o endereço de um stream (rtsp://, http://...),
+        # ele é a fonte padrão (câmera IP com reconexão automática)
+        if source is None and ip_address.lower().startswith(NetworkSource.NETWORK_SCHEMES):
+            source = ip_address
+        self._source = source
+        # FPS e janela próprios da instância (os atributos de classe são o padrão)
+        if frame is not None:
+            self.frame = frame
+        if stime is not None:
+            self.stime = stime
+        self.window_width = self.frame * self.stime
+        if buffer_mode not in (self.BUFFER_RAW, self.BUFFER_SEGMENTS, self.BUFFER_JPEG):
+            raise ValueError(f"Modo de buffer inválido: {buffer_mode}")
+        self._buffer_mode = buffer_mode
+        if layout not in (self.LAYOUT_PARTITIONED, self.LAYOUT_FLAT):
+            raise ValueError(f"Organização de pastas inválida: {layout}")
+        self._layout = layout
+        # Buffer circular próprio de cada instância (antes era um atributo de
+        # classe compartilhado por todos os Recorders). No modo de segmentos
+        # ele guarda só 1 s de frames crus até o codificador consumi-los (o
+        # mesmo no modo JPEG, até a compressão).
+        capacity = self.window_width if buffer_mode == self.BUFFER_RAW else self.frame
+        self.buffer_frames = FrameRingBuffer(capacity, cam_height, cam_width)
+        self._segments = None
+        # Opções do CompressedFrameRing no modo JPEG (ex: {'budget_mb': 128, 'quality': 80});
+        # a janela guardada é a menor entre stime e o que cabe no orçamento
+        self._jpeg_options = dict(jpeg_buffer or {})
+        self._jpeg = None
+        # Backend de codificação ('opencv' ou 'ffmpeg') e suas opções
+        # (ex: {'preset': 'ultrafast', 'crf': 23, 'threads': 2} para o ffmpeg)
+        self._encoder_backend = encoder_backend
+        self._encoder_options = dict(encoder_options or {})
+        self._encoders = {}
+        # Catálogo de clipes (bdManager.ClipCatalog), opcional
+        self._catalog = catalog
+        # Transmissão HLS ao vivo, opcional: dicionário com as opções do
+        # HLSLiveStream (ex: {'segment_s': 1, 'scale': 0.5}); {} usa o padrão
+        self._live_options = live
+        self._live = None
+        # StorageManager com o daemon rodando (start_daemon), opcional: reserva
+        # espaço antes de cada clipe e recebe os eventos de clipe gravado
+        self._storage = storage
+        # Detecção de atividade, opcional: dicionário com as opções do
+        # ActivityDetector (ex: {'roi': [[(0.1, 0.2), (0.9, 0.2), (0.9, 0.9), (0.1, 0.9)]]});
+        # {} usa o padrão. Os clipes são salvos quando a atividade termina
+        # (e a cada janela, se ela durar mais que o buffer)
+        self._activity_options = activity
+        self._detector = None
+        self._activity_frames = 0
+        # Salvamento cego a cada window_width frames (modo antigo), só se pedido
+        self._auto_save = auto_save
+        self._codec = None
+        self._containerv = None
+        # Barramento de gatilhos (botão, HTTP, teclado, socket), opcional:
+        # dicionário com as opções do TriggerBus (ex: {'pre_s': 10, 'post_s': 5});
+        # {} usa o padrão. A janela máxima de um clipe é o tamanho do buffer
+        self._bus_options = trigger_bus
+        self._bus = None
+        self._bus_sources = []
+        # Degradação adaptativa, opcional: dicionário com as opções do
+        # DegradationController ({} usa o padrão). Quando a máquina não
+        # acompanha, os clipes passam a usar um preset mais rápido, depois
+        # menos frames e depois resolução menor; a captura não muda
+        self._adaptive_options = adaptive
+        self._degrader = None
+        # Exportação assíncrona: a codificação não roda na thread de captura
+        self._export_queue = export_queue
+        self._exporter = ClipExporter(max_workers=export_workers, max_queue=export_queue)
+        # Modo headless: captura em thread própria e gatilhos por fila
+        self.triggers = queue.Queue()
+        self._cap = None
+        self._grabber = None
+        self._preview = None
+        self._trigger_thread = None
+        self._setup_metrics()
         # Corrigindo o f-string para a mensagem de criação
         print(f"Um {self.__class__.__name__} foi criado na localização: {self._location}!")
 
+    def _setup_metrics(self):
+        """Séries deste local; os valores já medidos em outro lugar são lidos só na coleta."""
+        location = self._location
+        self._frames_metric = FRAMES_TOTAL.labels(location)
+        FRAMES_DROPPED.labels(location).set_function(lambda: getattr(self._cap, "dropped", 0))
+        CAPTURE_FPS.labels(location).set_function(
+            lambda: self._grabber.stats()["fps"] if self._grabber is not None else None)
+        BUFFER_FILL.labels(location).set_function(self._buffer_fill)
+        EXPORT_QUEUE.labels(location).set_function(self._exporter.queue_depth)
+
+    def _buffer_fill(self):
+        """Ocupação do buffer (0 a 1): frames no modo cru, bytes do orçamento no modo JPEG."""
+        if self._jpeg is not None:
+            return self._jpeg.nbytes / self._jpeg.budget_bytes
+        return len(self.buffer_frames) / self.buffer_frames.capacity
+
     # --- Métodos GET (Acessores) ---
     # Usados para ler o valor dos atributos privados.
 
@@ -90,32 +233,29 @@ class Recorder:
 
     # Captura de Vídeo
     def streaming_video(self, codec, containerv):
+        cap = None
         try:
-            # Inicializa a captura de vídeo (0 = primeira câmera conectada)
-            cap = cv2.VideoCapture(0)
-
-            # Define o codec e o objeto VideoWriter
-            fourcc = cv2.VideoWriter_fourcc(*codec) # avc1 = h264
-            # Note: o VideoWriter deve ser criado apenas quando a gravação começar
-            # para garantir que o arquivo seja aberto e fechado corretamente.
-            # out = cv2.VideoWriter('output.mp4', fourcc, float(frame), (640, 480))
-
-            # Verifica se a câmera abriu corretamente
-            if not cap.isOpened():
-                print("Erro ao abrir a câmera.")
-                exit()
+            cap = self._open_capture()
+            self._start_pipeline(codec, containerv)
 
             print("Pronto para gravar... Pressione 'r' para começar a gravar os últimos 15 segundos.")
             print("Pressione 'q' para sair.")
             counter = 1
             while True:
-                ret, current_frame = cap.read()
+                # Decodifica direto no próximo slot do buffer circular
+                slot = self.buffer_frames.next_slot()
+                ret, current_frame = cap.read(image=slot)
                 if not ret:
-                    print("Erro ao capturar frame.")
+                    log.error("Erro ao capturar frame.")
                     break
 
-                # Adiciona o frame atual ao buffer de frames
-                self.buffer_frames.append(current_frame.copy())
+                # Se a câmera entregou outro tamanho, o OpenCV alocou um novo
+                # array: ajusta para o slot antes de confirmar
+                if current_frame is not slot:
+                    fit_into_slot(current_frame, slot)
+                    current_frame = slot
+                index = self.buffer_frames.commit(time.time())
+                self._on_frame_committed(index)
                 
                 # Mostra o frame (opcional, pode remover)
                 cv2.imshow("Captura", current_frame)
@@ -123,22 +263,15 @@ class Recorder:
                 # Verifica a entrada do usuário
                 key = cv2.waitKey(1) & 0xFF
                 
-                if key == ord('r') or ((counter % (self.window_width)) == 0):
-                        if((counter % (self.window_width)) == 0):
+                auto_save = self._auto_save and (counter % (self.window_width)) == 0
+                if key == ord('r') and self._bus is not None:
+                    # Com o barramento, o 'r' vira um gatilho (pré/pós-roll e junção)
+                    self._bus.emit("keyboard")
+                elif key == ord('r') or auto_save:
+                        if auto_save:
                             counter = 0
-                        print("Iniciando gravação...")
-                        title = self.get_path()+datetime.now().strftime("%d_%m_%Y_%H_%M_%S")+containerv
-                        print("Salvando em:", title)
-                        
-                        # Cria o objeto VideoWriter aqui
-                        out = cv2.VideoWriter(title, fourcc, float(self.frame), (self.get_cam_width(), self.get_cam_height()))
-                        
-                        
-                        # Grava os frames do buffer no arquivo
-                        for buffered_frame in self.buffer_frames:
-                            out.write(buffered_frame)
-                        
-                        out.release()
+                        # Não bloqueia a captura: se a fila estiver cheia o pedido é recusado
+                        self.export_clip(codec, containerv, block=False)
                 counter += 1
                 
 
@@ -146,23 +279,381 @@ class Recorder:
             print("Erro: ", e)            
         finally:            
             # Libera os recursos
-            cap.release()    
+            if cap is not None:
+                cap.release()    
             cv2.destroyAllWindows()
+            # Espera os clipes que ainda estão sendo gravados
+            self.close()
+
+    # --- Captura headless ---
+
+    def start_headless(self, codec, containerv, preview_fps: float = None, preview_scale: float = 0.5):
+        """
+        Inicia a captura numa thread dedicada, sem cv2.imshow/waitKey.
+        Os clipes são pedidos com trigger() ou colocando pedidos em
+        self.triggers. Retorna imediatamente; use stop_headless() para parar.
+
+        :param preview_fps: Se informado, publica uma prévia reduzida nesse fps
+                            (assine com subscribe_preview()).
+        :param preview_scale: Fator de redução da prévia.
+        """
+        if self._grabber is not None:
+            raise RuntimeError("A captura headless já está rodando.")
+        self._cap = self._open_capture()
+        self._start_pipeline(codec, containerv)
+
+        self._grabber = FrameGrabber(self._cap, self.buffer_frames, on_commit=self._on_frame_committed)
+        self._grabber.start()
+
+        self._trigger_thread = threading.Thread(
+            target=self._trigger_loop, args=(codec, containerv), name="Recorder-triggers", daemon=True,
+        )
+        self._trigger_thread.start()
+
+        if preview_fps:
+            self._preview = PreviewPublisher(self.buffer_frames, fps=preview_fps, scale=preview_scale)
+            self._preview.start()
+        print(f"Captura headless iniciada em: {self._location}")
+
+    def trigger(self, **options):
+        """Pede a gravação de um clipe (equivale a apertar 'r')."""
+        self.triggers.put(options)
+
+    def subscribe_preview(self, callback):
+        """Registra uma função que recebe os frames reduzidos da prévia."""
+        if self._preview is None:
+            raise RuntimeError("Prévia desativada: use start_headless(..., preview_fps=5).")
+        self._preview.subscribe(callback)
+
+    def get_capture_stats(self):
+        """Retorna fps e jitter medidos pela thread de captura (e as quedas, se for câmera IP)."""
+        if self._grabber is None:
+            return None
+        data = self._grabber.stats()
+        if isinstance(self._cap, NetworkSource):
+            data["network"] = self._cap.stats()
+        return data
+
+    def stop_headless(self):
+        """Para a captura headless e espera os clipes pendentes."""
+        if self._grabber is None:
+            return
+        self._grabber.stop()
+        self._grabber.join()
+        if self._preview is not None:
+            self._preview.stop()
+            self._preview.join()
+            self._preview = None
+        self.triggers.put(None)
+        self._trigger_thread.join()
+        self._cap.release()
+        self._grabber = None
+        self._cap = None
+        self.close()
+
+    def _trigger_loop(self, codec, containerv):
+        while True:
+            options = self.triggers.get()
+            if options is None:
+                return
+            # Não bloqueia: se a fila de exportação estiver cheia o pedido é recusado
+            options.setdefault("block", False)
+            try:
+                self.export_clip(codec, containerv, **options)
+            except Exception as e:
+                log.error("Erro ao processar gatilho: %s", e)
+
+    # --- Pipeline de captura ---
+
+    def _open_capture(self):
+        """Abre a fonte de vídeo (padrão: 0 = primeira câmera conectada)."""
+        cap = open_source(self._source)
+        # Verifica se a câmera abriu corretamente
+        if not cap.isOpened():
+            raise RuntimeError("Erro ao abrir a câmera.")
+        return cap
+
+    def _start_pipeline(self, codec, containerv):
+        """Prepara os consumidores dos frames capturados."""
+        self._codec = codec
+        self._containerv = containerv
+        if self._bus_options is not None and self._bus is None:
+            options = {"max_window_s": self.stime}
+            options.update(self._bus_options)
+            self._bus = TriggerBus(self._on_trigger_window, **options)
+            for source in self._bus_sources:
+                self._bus.add_source(source)
+        if self._adaptive_options is not None and self._degrader is None:
+            if self._buffer_mode == self.BUFFER_SEGMENTS:
+                # No modo de segmentos a codificação é contínua e a exportação é só remux
+                log.warning("Degradação adaptativa disponível só no modo de buffer 'raw'.")
+            else:
+                preset = None
+                if self._encoder_backend == "ffmpeg":
+                    preset = self._encoder_options.get("preset", "ultrafast")
+                options = {"preset": preset, "queue_depth": self._exporter.queue_depth,
+                           "max_queue": self._export_queue}
+                options.update(self._adaptive_options)
+                level_metric = DEGRADATION_LEVEL.labels(self._location)
+                self._degrader = DegradationController(
+                    on_change=lambda old, new, state: level_metric.set(new), **options)
+                self._degrader.start()
+        if self._activity_options is not None and self._detector is None:
+            self._detector = ActivityDetector(
+                (self.get_cam_width(), self.get_cam_height()), self.frame, **self._activity_options,
+            )
+        if self._buffer_mode == self.BUFFER_JPEG and self._jpeg is None:
+            options = {"max_seconds": self.stime}
+            options.update(self._jpeg_options)
+            self._jpeg = CompressedFrameRing(self.buffer_frames, **options)
+        if self._buffer_mode == self.BUFFER_SEGMENTS and self._segments is None:
+            self._segments = SegmentRing(
+                self.buffer_frames, self._make_encoder(codec), containerv, self.frame,
+                (self.get_cam_width(), self.get_cam_height()), self.stime,
+            )
+        if self._live_options is not None and self._live is None:
+            self._live = HLSLiveStream(
+                self.buffer_frames, (self.get_cam_width(), self.get_cam_height()), self.frame,
+                self._location, **self._live_options,
+            )
+            print(f"Transmissão ao vivo em: /live/{self._live.name}/index.m3u8")
+
+    def _on_frame_committed(self, index):
+        """Chamado na thread de captura logo após cada frame entrar no buffer."""
+        self._frames_metric.inc()
+        if self._segments is not None:
+            self._segments.push(index)
+        if self._jpeg is not None:
+            self._jpeg.push(index)
+        if self._live is not None:
+            self._live.push(index)
+        if self._detector is not None:
+            self._on_activity(self._detector.process(self.buffer_frames.slot(index)))
+
+    def _on_activity(self, event):
+        """Decide os clipes a partir dos eventos do detector de atividade."""
+        if event == "start":
+            log.info("Atividade detectada em: %s", self._location)
+            self._activity_frames = 0
+        elif self._detector.active:
+            self._activity_frames += 1
+            # Atividade mais longa que o buffer: salva uma janela inteira antes de perdê-la
+            if self._activity_frames >= self.window_width:
+                self._activity_frames = 0
+                self._request_clip()
+        if event == "end":
+            self._request_clip()
+
+    def _request_clip(self):
+        """Pede um clipe sem atrasar a captura (pela fila de gatilhos no modo headless)."""
+        if self._trigger_thread is not None:
+            self.triggers.put({})
+        else:
+            self.export_clip(self._codec, self._containerv, block=False)
 
     #função que o botao de interrupção externa vai apontar para gravar
     def recording_last_15s(self):
-        print("Iniciando gravação...")
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        title = self.path+datetime.now().strftime("%d_%m_%Y_%H_%M_%S.mp4")
-        print("Salvando em:", title)
-        
-        # Cria o objeto VideoWriter aqui
-        out = cv2.VideoWriter(title, fourcc, float(self.frame), (self._cam_width, self._cam_height))
-        
-        # Grava os frames do buffer no arquivo
-        for buffered_frame in self.buffer_frames:
-            out.write(buffered_frame)
-        out.release()
+        if self._bus is not None:
+            # Com o barramento o clipe inclui o pós-roll e é juntado a gatilhos próximos
+            self._bus.emit("button")
+            return None
+        return self.export_clip('avc1', '.mp4')
+
+    # --- Gatilhos ---
+
+    def add_trigger_source(self, source):
+        """
+        Registra uma fonte de gatilhos (ver Classes/Triggers.py: GPIOSource,
+        HTTPSource, KeyboardSource, SocketSource). Requer trigger_bus no construtor.
+        """
+        if self._bus_options is None:
+            raise RuntimeError("Barramento de gatilhos desativado: use Recorder(..., trigger_bus={}).")
+        if self._bus is not None:
+            self._bus.add_source(source)
+        else:
+            # Iniciada junto com a captura
+            self._bus_sources.append(source)
+        return source
+
+    def _on_trigger_window(self, window):
+        """Chamado pelo TriggerBus quando o pós-roll de uma janela termina."""
+        return self.export_clip(self._codec, self._containerv, block=False,
+                                start_time=window["start"], end_time=window["end"])
+
+    def get_trigger_stats(self):
+        """Gatilhos recebidos/juntados e histogramas de latência (ou None se desativado)."""
+        if self._bus is None:
+            return None
+        return self._bus.stats()
+
+    # --- Exportação de clipes ---
+
+    def export_clip(self, codec, containerv, callback=None, block=True, timeout=None,
+                    start_time=None, end_time=None):
+        """
+        Pede a gravação da janela atual do buffer em segundo plano.
+        Com start_time/end_time (horários de captura) grava só esse trecho.
+
+        Retorna um Future com os dados do clipe, ou None se a fila de
+        exportação estiver cheia.
+        """
+        if self._segments is not None:
+            # Modo de segmentos: o codec/contêiner são os da gravação contínua
+            containerv = self._segments.containerv
+        seconds = self.stime
+        if start_time is not None and end_time is not None:
+            seconds = min(self.stime, end_time - start_time)
+        # O nome do clipe é o horário de início da gravação (o pedido chega no fim da janela)
+        title = self._clip_title(containerv, start_time if start_time is not None else time.time() - seconds)
+        reserved = 0
+        if self._storage is not None:
+            # Melhor descartar o clipe do que gravar um arquivo truncado
+            reserved = self._storage.reserve(codec, seconds)
+            if reserved is None:
+                CLIPS_TOTAL.labels(self._location, "no_space").inc()
+                log.warning("Sem espaço em disco, clipe descartado: %s", title)
+                return None
+        log.debug("Salvando em: %s", title)
+        on_exported = functools.partial(self._on_clip_exported, codec=codec, reserved=reserved)
+        # O nome final vem do primeiro frame/segmento realmente gravado
+        namer = functools.partial(self._clip_title, containerv)
+        if self._segments is not None:
+            future = self._segments.save(title, seconds=seconds, namer=namer,
+                                         start_time=start_time, end_time=end_time)
+            future.add_done_callback(on_exported)
+            if callback is not None:
+                future.add_done_callback(callback)
+            return future
+        # No modo JPEG os clipes saem do anel comprimido (decodificado em lotes na gravação)
+        buffer = self._jpeg if self._jpeg is not None else self.buffer_frames
+        state = self._degrader.state() if self._degrader is not None else None
+        try:
+            if state is not None:
+                # Nível atual de degradação (o fps gravado é dividido pela decimação)
+                future = self._exporter.submit(
+                    buffer, title, self._make_encoder(codec, state["preset"]), self.frame,
+                    (self.get_cam_width(), self.get_cam_height()),
+                    block=block, timeout=timeout, start_time=start_time, end_time=end_time,
+                    decimation=state["decimation"], scale=state["scale"], metadata={"degradation": state},
+                    namer=namer,
+                )
+            else:
+                future = self._exporter.submit(
+                    buffer, title, self._make_encoder(codec), self.frame,
+                    (self.get_cam_width(), self.get_cam_height()),
+                    block=block, timeout=timeout, start_time=start_time, end_time=end_time, namer=namer,
+                )
+        except queue.Full:
+            CLIPS_TOTAL.labels(self._location, "queue_full").inc()
+            log.warning("Fila de exportação cheia, clipe descartado: %s", title)
+            if self._storage is not None:
+                self._storage.release(reserved)
+            return None
+        future.add_done_callback(on_exported)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def _clip_title(self, containerv, start_time):
+        """Caminho de um clipe que começou em start_time (nome ISO 8601, na partição dessa hora)."""
+        if self._layout == self.LAYOUT_PARTITIONED:
+            return clip_path(self.get_path(), self._location, start_time, containerv)
+        return os.path.join(self.get_path(), clip_name(start_time, containerv))
+
+    def _make_encoder(self, codec, preset=None):
+        """Retorna (e reaproveita) o encoder do backend configurado para o codec (e preset)."""
+        key = (codec, preset)
+        if key not in self._encoders:
+            options = dict(self._encoder_options)
+            if preset is not None:
+                options["preset"] = preset
+            self._encoders[key] = make_encoder(codec, self._encoder_backend, **options)
+        return self._encoders[key]
+
+    def _on_clip_exported(self, future, codec=None, reserved=0):
+        """Chamado pela thread do exportador quando um clipe termina."""
+        if future.exception() is not None:
+            CLIPS_TOTAL.labels(self._location, "failed").inc()
+            log.error("Erro ao gravar clipe: %s", future.exception())
+            if self._storage is not None:
+                self._storage.release(reserved)
+            return
+        clip = future.result()
+        log.info("Clipe salvo: %s (%d frames em %.2fs)", clip['path'], clip['frames'], clip['encode_s'])
+        try:
+            size = os.path.getsize(clip['path'])
+        except OSError:
+            size = None
+        CLIPS_TOTAL.labels(self._location, "saved").inc()
+        if size is not None:
+            CLIP_BYTES.labels(self._location).observe(size)
+        if self._degrader is not None:
+            duration = clip['end_time'] - clip['start_time'] or (clip['frames'] / clip['fps'] if clip['fps'] else 0)
+            self._degrader.observe_clip(clip['encode_s'], duration)
+        if clip['frames'] and clip.get('encode_s') is not None:
+            ENCODE_MS_PER_FRAME.labels(self._location, codec).observe(clip['encode_s'] * 1000 / clip['frames'])
+        if self._storage is not None:
+            self._storage.on_clip_written(
+                clip['path'], size=size, codec=codec, duration_s=clip['frames'] / clip['fps'] if clip['fps'] else None,
+                start_time=clip['start_time'], reserved=reserved,
+            )
+        if self._catalog is not None:
+            self._catalog.add_exported_clip(clip, self._location, camera=self._ip_address)
+
+    def close(self):
+        """Finaliza o exportador, esperando os clipes pendentes."""
+        if self._degrader is not None:
+            self._degrader.stop()
+            self._degrader = None
+        if self._bus is not None:
+            # Pede as janelas ainda abertas antes de fechar o exportador
+            self._bus.close(flush=True)
+            self._bus = None
+        if self._segments is not None:
+            self._segments.close()
+            self._segments = None
+        if self._live is not None:
+            self._live.close()
+            self._live = None
+        self._exporter.shutdown(wait=True)
+        if self._jpeg is not None:
+            # Depois do exportador: os clipes pendentes ainda decodificam do anel
+            self._jpeg.close()
+            self._jpeg = None
+        if self._catalog is not None:
+            self._catalog.flush()
+
+    def get_activity_stats(self):
+        """Retorna as estatísticas do detector de atividade (ou None se desativado)."""
+        if self._detector is None:
+            return None
+        return self._detector.stats()
+
+    def get_buffer_stats(self):
+        """
+        Estatísticas do anel JPEG (ou None fora desse modo): memória usada e
+        orçamento, janela efetiva alcançada (window_s), tempo de compressão
+        por frame, taxa de compressão e frames descartados/removidos.
+        """
+        if self._jpeg is None:
+            return None
+        return self._jpeg.stats()
+
+    def get_degradation_stats(self):
+        """Nível atual de degradação e as últimas mudanças (ou None se desativada)."""
+        if self._degrader is None:
+            return None
+        return self._degrader.stats()
+
+    def get_live_stats(self):
+        """Retorna as estatísticas da transmissão ao vivo (ou None se desativada)."""
+        if self._live is None:
+            return None
+        return self._live.stats()
+
+    def get_export_metrics(self):
+        """Retorna as métricas da fila de exportação (profundidade, tempo de codificação...)."""
+        return self._exporter.metrics()
     # 4. Métodos da Instância
     # São funções que pertencem a um objeto. Eles podem acessar e modificar
     # os atributos da instância (usando 'self').
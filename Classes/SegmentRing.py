@@ -0,0 +1,360 @@
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from Classes.Encoders import OpenCVEncoder
+from Classes.Log import get_logger
+
+log = get_logger("segments")
+
+
+def default_segment_dir():
+    """Usa /dev/shm (tmpfs) quando disponível, senão a pasta temporária do sistema."""
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+class SegmentRing:
+    """
+    Grava os frames continuamente em segmentos curtos (ex: 1 s) já
+    comprimidos, mantendo apenas os segmentos necessários para a janela
+    de gravação. Cada segmento é um arquivo novo do VideoWriter, então
+    começa sempre com um keyframe.
+
+    Salvar "os últimos 15 s" apenas concatena (remux, sem recodificar) os
+    segmentos que já existem.
+
+    Com o backend ffmpeg um único processo persistente recebe todos os
+    frames e faz a divisão em segmentos (muxer "segment").
+    """
+
+    def __init__(self, staging, encoder, containerv: str, fps: float, size: tuple,
+                 window_s: float, segment_s: float = 1.0, directory: str = None):
+        """
+        Inicializa o anel de segmentos.
+
+        :param staging: FrameRingBuffer pequeno onde a captura escreve os frames.
+        :param encoder: VideoEncoder usado nos segmentos (ou um FourCC, para o OpenCV).
+        :param containerv: Extensão do contêiner (ex: '.mp4').
+        :param fps: Taxa de quadros.
+        :param size: (largura, altura) dos frames.
+        :param window_s: Duração da janela que deve ficar disponível, em segundos.
+        :param segment_s: Duração de cada segmento (GOP), em segundos.
+        :param directory: Pasta dos segmentos (padrão: tmpfs em /dev/shm).
+        """
+        self._staging = staging
+        if isinstance(encoder, str):
+            encoder = OpenCVEncoder(encoder)
+        self._encoder = encoder
+        self._codec = encoder.codec
+        self._containerv = containerv
+        self._fps = float(fps)
+        self._size = size
+        self._window_s = window_s
+        self._segment_s = segment_s
+        self._segment_frames = max(1, int(round(fps * segment_s)))
+        # Um segmento extra cobre o segmento que está sendo escrito
+        self._max_segments = int(window_s / segment_s) + 1
+        self._dir = tempfile.mkdtemp(prefix="segments_", dir=directory or default_segment_dir())
+
+        self._queue = queue.Queue(maxsize=staging.capacity)
+        self._segments = deque()  # Segmentos fechados: dicts com path/start/end/frames
+        self._segments_lock = threading.Lock()
+        self._rotation = threading.Condition()
+        self._rotate_requested = False
+        self._generation = 0  # Incrementa a cada segmento fechado
+
+        self._writer = None
+        self._current = None
+        self._counter = 0
+        # Modo persistente: o próprio ffmpeg fecha os segmentos e os anota numa lista
+        self._persistent = hasattr(encoder, "open_segmented")
+        self._list_path = os.path.join(self._dir, "segments.csv")
+        self._list_file = None
+        self._list_pending = ""
+        self._stream_start = None
+        self.dropped_frames = 0
+        # Cópia do slot: o frame só vai para o encoder se não foi sobrescrito durante a cópia
+        self._frame = np.empty(staging.frame_shape, dtype=np.uint8)
+        # Erro que parou o codificador (encoder indisponível, ffmpeg encerrado...)
+        self.error = None
+
+        self._saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SegmentRing-save")
+        self._thread = threading.Thread(target=self._encode_loop, name="SegmentRing-encode", daemon=True)
+        self._thread.start()
+
+    # --- Captura ---
+
+    def push(self, index: int):
+        """
+        Informa que o slot `index` do buffer de staging tem um frame novo.
+        Não bloqueia: se o codificador estiver atrasado (ou parado por erro)
+        o frame é descartado.
+        """
+        if self.error is not None:
+            self.dropped_frames += 1
+            return
+        try:
+            self._queue.put_nowait((index, self._staging.timestamp_at(index)))
+        except queue.Full:
+            self.dropped_frames += 1
+
+    @property
+    def containerv(self):
+        return self._containerv
+
+    # --- Salvamento ---
+
+    def save(self, output_path: str, seconds: float = None, callback=None, namer=None,
+             start_time: float = None, end_time: float = None):
+        """
+        Concatena os segmentos dos últimos `seconds` segundos em output_path,
+        em segundo plano. Retorna um Future com os dados do clipe.
+
+        :param namer: Função que recebe o início do primeiro segmento e
+                      retorna o caminho final do clipe (no lugar de output_path).
+        :param start_time: Se informado, salva os segmentos que cobrem [start_time, end_time]
+                           (horários de captura) em vez dos últimos `seconds` segundos.
+        :param end_time: Fim do trecho (None = até o segmento mais recente).
+        """
+        requested_at = time.time()
+        if start_time is None:
+            start_time = requested_at - (seconds or self._window_s)
+        future = self._saver.submit(self._save, output_path, start_time, end_time, requested_at, namer)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def memory_bytes(self):
+        """Bytes ocupados pelos segmentos guardados."""
+        with self._segments_lock:
+            return sum(seg["bytes"] for seg in self._segments)
+
+    def close(self, timeout: float = 5.0):
+        """Fecha o segmento atual, espera os salvamentos e apaga os segmentos."""
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                log.warning("Codificador de segmentos não respondeu ao encerramento.")
+            self._thread.join(timeout)
+        self._saver.shutdown(wait=True)
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    # --- Threads internas ---
+
+    def _encode_loop(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._close_segment()
+                    return
+                index, timestamp = item
+                frame = self._copy_slot(index, timestamp)
+                if frame is None:
+                    self.dropped_frames += 1
+                    continue
+
+                if self._persistent:
+                    self._write_persistent(frame, timestamp)
+                    continue
+
+                if (self._writer is None or self._current["frames"] >= self._segment_frames
+                        or self._rotate_requested):
+                    self._close_segment()
+                    self._open_segment(timestamp)
+
+                self._writer.write(frame)
+                self._current["frames"] += 1
+                self._current["end"] = timestamp
+        except Exception as e:
+            self._fail(e)
+
+    def _copy_slot(self, index, timestamp):
+        """Copia o slot do staging; None se ele foi (ou está sendo) sobrescrito pela captura."""
+        if not self._staging.is_intact(index, timestamp):
+            return None
+        np.copyto(self._frame, self._staging.slot(index))
+        if not self._staging.is_intact(index, timestamp):
+            return None
+        return self._frame
+
+    def _fail(self, error):
+        """
+        Para o codificador depois de um erro: novos frames são descartados,
+        os salvamentos pendentes falham e close() não fica esperando a fila.
+        """
+        log.error("Codificador de segmentos parado: %s", error)
+        self.error = error
+        with self._rotation:
+            self._rotation.notify_all()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._writer is not None:
+            try:
+                self._writer.release()
+            except Exception:
+                pass
+            self._writer = None
+
+    def _write_persistent(self, frame, timestamp):
+        if self._writer is None:
+            self._stream_start = timestamp
+            self._writer = self._encoder.open_segmented(
+                self._dir, self._containerv, self._fps, self._size, self._segment_s, self._list_path,
+            )
+        self._writer.write(frame)
+        self._poll_segment_list()
+
+    def _poll_segment_list(self):
+        """Lê as linhas novas da lista de segmentos concluídos pelo ffmpeg."""
+        if self._list_file is None:
+            if not os.path.exists(self._list_path):
+                return
+            self._list_file = open(self._list_path, "r")
+        self._list_pending += self._list_file.read()
+        *lines, self._list_pending = self._list_pending.split("\n")
+        for line in lines:
+            name, start, end = line.rsplit(",", 2)
+            path = os.path.join(self._dir, name)
+            self._add_segment({
+                "path": path,
+                "start": self._stream_start + float(start),
+                "end": self._stream_start + float(end),
+                "frames": int(round((float(end) - float(start)) * self._fps)),
+                "bytes": os.path.getsize(path),
+            })
+
+    def _open_segment(self, timestamp):
+        path = os.path.join(self._dir, f"seg_{self._counter:08d}{self._containerv}")
+        self._counter += 1
+        self._writer = self._encoder.open(path, self._fps, self._size)
+        self._current = {"path": path, "start": timestamp, "end": timestamp, "frames": 0}
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        self._writer.release()
+        self._writer = None
+        if self._persistent:
+            # Ao fechar o stdin o ffmpeg finaliza o último segmento
+            self._poll_segment_list()
+            if self._list_file is not None:
+                self._list_file.close()
+                self._list_file = None
+            return
+        segment = self._current
+        segment["bytes"] = os.path.getsize(segment["path"])
+        self._current = None
+        self._add_segment(segment)
+
+        with self._rotation:
+            self._rotate_requested = False
+            self._generation += 1
+            self._rotation.notify_all()
+
+    def _add_segment(self, segment):
+        with self._segments_lock:
+            self._segments.append(segment)
+            while len(self._segments) > self._max_segments:
+                old = self._segments.popleft()
+                try:
+                    os.remove(old["path"])
+                except OSError:
+                    pass
+
+    def _request_rotation(self, timeout):
+        """Fecha o segmento atual para que os frames mais recentes entrem no clipe."""
+        if self._persistent:
+            # O ffmpeg decide quando fechar o segmento: o clipe inclui só os
+            # segmentos já concluídos (até segment_s de atraso)
+            return
+        with self._rotation:
+            generation = self._generation
+            self._rotate_requested = True
+            self._rotation.wait_for(lambda: self._generation > generation or self.error is not None,
+                                    timeout=timeout)
+
+    def _save(self, output_path, start_time, end_time, requested_at, namer=None):
+        start = time.perf_counter()
+        if self.error is None:
+            self._request_rotation(timeout=2 * self._segment_frames / self._fps)
+        if self.error is not None:
+            raise RuntimeError(f"Codificador de segmentos parado: {self.error}")
+
+        # Hard links protegem os segmentos de serem apagados pelo anel durante a cópia
+        job_dir = tempfile.mkdtemp(prefix="save_", dir=self._dir)
+        try:
+            with self._segments_lock:
+                # Segmentos que se sobrepõem ao trecho (o corte é no limite do segmento)
+                selected = [seg for seg in self._segments
+                            if seg["end"] >= start_time and (end_time is None or seg["start"] <= end_time)]
+                linked = []
+                for seg in selected:
+                    target = os.path.join(job_dir, os.path.basename(seg["path"]))
+                    os.link(seg["path"], target)
+                    linked.append(target)
+            if not linked:
+                raise RuntimeError("Nenhum segmento disponível para salvar.")
+            if namer is not None:
+                output_path = namer(selected[0]["start"])
+
+            self._concat(linked, job_dir, output_path)
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+        return {
+            "path": output_path,
+            "codec": self._codec,
+            "encoder": self._encoder.describe(),
+            "fps": self._fps,
+            "frames": sum(seg["frames"] for seg in selected),
+            "start_time": selected[0]["start"],
+            "end_time": selected[-1]["end"],
+            "requested_at": requested_at,
+            "encode_s": time.perf_counter() - start,
+        }
+
+    def _concat(self, paths, job_dir, output_path):
+        if shutil.which("ffmpeg"):
+            list_path = os.path.join(job_dir, "list.txt")
+            with open(list_path, "w") as f:
+                for path in paths:
+                    f.write(f"file '{path}'\n")
+            cmd = [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy",  # Apenas remux, sem recodificar
+                output_path,
+            ]
+            subprocess.run(cmd, check=True)
+            return
+
+        # Sem ffmpeg: decodifica e recodifica os segmentos (mais lento)
+        log.warning("ffmpeg não encontrado, recodificando os segmentos com OpenCV.")
+        out = self._encoder.open(output_path, self._fps, self._size)
+        try:
+            for path in paths:
+                cap = cv2.VideoCapture(path)
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    out.write(frame)
+                cap.release()
+        finally:
+            out.release()
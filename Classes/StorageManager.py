@@ -3,6 +3,26 @@ import shutil
 from datetime import datetime, timedelta
 import time
 import math
+import heapq
+import multiprocessing as mp
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Classes.ClipIndex import parse_clip_timestamp
+from Classes.ClipLayout import expired_partitions, iter_partitions, partition_of, prune_empty_parents, scan_partitions
+from Classes.Log import get_logger
+from Classes.Metrics import REGISTRY
+from Classes.Transcoder import lower_priority, transcode_clip
+
+log = get_logger("storage")
+
+# Métricas das limpezas (mode: 'daemon' ou 'manual' = manage_storage)
+EVICTION_SECONDS = REGISTRY.histogram("sport_capture_eviction_seconds", "Duração de cada rodada de limpeza (s).",
+                                      ("mode",), buckets=(0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300))
+RECLAIMED_BYTES = REGISTRY.counter("sport_capture_reclaimed_bytes_total", "Bytes liberados apagando clipes.",
+                                   ("mode",))
+EVICTED_CLIPS = REGISTRY.counter("sport_capture_evicted_clips_total", "Clipes apagados pela limpeza.", ("mode",))
+DISK_USAGE = REGISTRY.gauge("sport_capture_disk_usage_percent", "Uso do disco estimado pelo daemon (%).", ("path",))
 
 class StorageManager:
     """
@@ -14,19 +34,64 @@ class StorageManager:
     RETENTION_DAYS = 15
     SPACE_LIMIT_PERCENT = 60.0
     
+    # Modo daemon: a limpeza começa na marca alta e para na marca baixa
+    HIGH_WATERMARK_PERCENT = SPACE_LIMIT_PERCENT
+    LOW_WATERMARK_PERCENT = 50.0
+
+    # Limites das exclusões do daemon, para não competir com a escrita dos clipes
+    MAX_DELETES_PER_S = 5.0
+    MAX_DELETE_BYTES_PER_S = 200 * 1024 ** 2
+
+    # Estimativa de bytes/s de vídeo até medir o codec, e folga da reserva
+    DEFAULT_BYTES_PER_S = 2 * 1024 ** 2
+    RESERVE_MARGIN = 1.5
+
+    # Níveis de armazenamento (ver enable_tiering): recodificação para um
+    # codec compacto e, depois, arquivamento em outra pasta
+    TRANSCODE_AFTER_HOURS = 6
+    ARCHIVE_AFTER_DAYS = 7
+
+    # Atributo estendido que marca clipes já processados pelo nível compacto
+    TIER_XATTR = "user.sport_capture.tier"
+
+    # Extensões consideradas vídeo
+    VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
     # Constante para conversão (1024 * 1024 * 1024)
     GB_SCALE = 1024 ** 3
 
-    def __init__(self, video_path: str, test_total_storage_gb: float = None):
+    def __init__(self, video_path: str, test_total_storage_gb: float = None, catalog=None):
         """
         Inicializa o gerenciador.
 
         :param video_path: Caminho da pasta de vídeos a ser gerenciada.
         :param test_total_storage_gb: Valor em GB para simular o tamanho total do disco.
                                       Use None para usar o tamanho real do sistema.
+        :param catalog: bdManager.ClipCatalog opcional. Quando informado, as políticas
+                        consultam o catálogo em vez de varrer a pasta, e os clipes
+                        apagados são marcados nele.
         """
         self._video_path = video_path
         self._test_total_storage_gb = test_total_storage_gb
+        self._catalog = catalog
+
+        # Estado do modo daemon (ver start_daemon)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._daemon = None
+        self._video_bytes = None
+        self._other_bytes = 0
+        self._total_bytes = 0
+        self._reserved_bytes = 0
+        self._clips_heap = []
+        self._deleted_paths = set()
+        self._bytes_per_s = {}
+        self._resized = {}
+        self._tiering = None
+        self._tiered_paths = set()
+        self._daemon_stats = {"evicted": 0, "evicted_bytes": 0, "evictions_started": 0,
+                              "reservations": 0, "reservations_refused": 0}
         
         if not os.path.isdir(video_path):
             raise FileNotFoundError(f"O diretório '{video_path}' não existe.")
@@ -76,131 +141,658 @@ class StorageManager:
             print(f"Erro ao obter uso do disco: {e}")
             return 0, 0, 0
     
+    def _scan_clips(self, workers: int = 4):
+        """
+        Varre a pasta uma única vez. Retorna [(início, caminho, tamanho)] sem
+        ordenação, reaproveitando o stat do DirEntry (uma chamada por arquivo).
+        Os clipes soltos na pasta e os das partições por data (ver ClipLayout)
+        entram juntos; as partições são listadas em paralelo. O início vem do
+        nome do clipe (o mtime muda quando o nível compacto recodifica) e o
+        mtime só é usado em nomes fora do padrão.
+        """
+        directories = [path for _, _, path in iter_partitions(self._video_path)]
+        directories.append(self._video_path)
+        clips = []
+        for directory, entries in scan_partitions(directories, workers, self.VIDEO_EXTENSIONS):
+            for name, size, mtime in entries:
+                if name.startswith("."):
+                    continue  # Temporários (ex: recodificação em andamento)
+                timestamp = parse_clip_timestamp(name)
+                clips.append((mtime if timestamp is None else timestamp, os.path.join(directory, name), size))
+        return clips
+
     def _get_video_files(self):
-        """Retorna uma lista de caminhos completos dos arquivos .mp4 na pasta."""
-        files = []
-        for entry in os.scandir(self._video_path):
-            # Garante que só pega arquivos de vídeo (mp4, avi, mov)
-            if entry.is_file() and entry.name.lower().endswith(('.mp4', '.avi', '.mov')):
-                files.append(entry.path)
-        return files
+        """Retorna uma lista de caminhos completos dos arquivos de vídeo na pasta."""
+        return [path for _, path, _ in self._scan_clips()]
 
-    # --- Políticas de Exclusão ---
+    def _iter_oldest_first(self):
+        """
+        Itera os clipes do mais antigo ao mais novo como (timestamp, caminho, tamanho).
 
-    def _check_retention_policy(self):
-        """Deleta arquivos mais antigos que RETENTION_DAYS."""
-        
-        cutoff_date = datetime.now() - timedelta(days=self.RETENTION_DAYS)
-        deleted_count = 0
-        deleted_size = 0
-        
-        print(f"\n[Política de Retenção] A procurar ficheiros anteriores a {cutoff_date.strftime('%Y-%m-%d')}...")
+        Com catálogo a ordem vem do índice de start_time. Sem ele, a pasta é
+        varrida uma vez e um heap (heapify O(n)) entrega os mais antigos sob
+        demanda: só os clipes realmente removidos pagam O(log n).
+        """
+        if self._catalog is not None:
+            video_dir = os.path.abspath(self._video_path)
+            for clip in self._catalog.list_clips():
+                if clip["path"].startswith(video_dir):
+                    yield clip["start_time"], clip["path"], clip["size_bytes"]
+            return
+        heap = self._scan_clips()
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)
 
-        for file_path in self._get_video_files():
-            try:
-                # Usa o tempo de última modificação para determinar a idade
-                mod_timestamp = os.path.getmtime(file_path)
-                mod_date = datetime.fromtimestamp(mod_timestamp)
+    def _mark_deleted(self, paths):
+        """Registra no catálogo (se houver) os clipes apagados."""
+        if self._catalog is not None and paths:
+            self._catalog.mark_deleted(paths)
 
-                if mod_date < cutoff_date:
-                    file_size = os.path.getsize(file_path)
-                    os.remove(file_path)
-                    deleted_count += 1
-                    deleted_size += file_size
-                    print(f"  🗑️ Deletado por idade: {os.path.basename(file_path)} (Modificado em: {mod_date.strftime('%Y-%m-%d')})")
+    # --- Políticas de Exclusão ---
 
-            except OSError as e:
-                print(f"Erro ao deletar ou processar {file_path}: {e}")
+    def plan_eviction(self, now: float = None):
+        """
+        Calcula, sem apagar nada, quais clipes as duas políticas removeriam:
+        1. Retenção: clipes mais antigos que RETENTION_DAYS.
+        2. Espaço: os mais antigos restantes até o uso ficar abaixo de SPACE_LIMIT_PERCENT.
 
-        if deleted_count > 0:
-            print(f"✅ Ficheiros antigos removidos: {deleted_count} (Total: {deleted_size / self.GB_SCALE:.2f} GB)")
-        else:
-            print("Nenhum ficheiro encontrado com mais de 15 dias.")
-        
-        return deleted_count
+        As duas políticas removem sempre o mais antigo primeiro, então são
+        calculadas juntas numa única passada. Os clipes de partições por data
+        inteiramente vencidas ficam agrupados por pasta, que é removida no
+        fim se ficar vazia.
 
-    def _check_space_policy(self):
-        """Deleta os arquivos mais antigos (após 15 dias) até que o uso de disco caia abaixo do limite."""
-        
+        :return: Dicionário com a lista de clipes ('files': [(caminho, tamanho, motivo)]),
+                 as partições vencidas ('partitions': {pasta: [(caminho, tamanho)]}),
+                 os bytes que seriam liberados e o uso do disco antes/depois.
+        """
+        now = time.time() if now is None else now
+        cutoff_timestamp = now - self.RETENTION_DAYS * 24 * 60 * 60
         total_bytes, used_bytes, _ = self._get_system_disk_usage()
-        
-        if total_bytes <= 0:
-            print("❌ Erro: Não foi possível obter o tamanho total do disco.")
-            return 0
+        limit_bytes = (total_bytes * self.SPACE_LIMIT_PERCENT) / 100 if total_bytes > 0 else None
+        # Só os nomes das pastas são lidos aqui
+        expired = {os.path.abspath(p) for p in expired_partitions(self._video_path, cutoff_timestamp)}
 
-        # Calcula o limite em bytes
-        limit_bytes = (total_bytes * self.SPACE_LIMIT_PERCENT) / 100
-        current_usage_percent = (used_bytes / total_bytes) * 100
-        
-        print(f"\n[Política de Espaço] Uso Atual do Disco: {current_usage_percent:.2f}% (Limite: {self.SPACE_LIMIT_PERCENT:.2f}%)")
-        
-        if current_usage_percent < self.SPACE_LIMIT_PERCENT:
-            print("Não é necessário liberar espaço.")
-            return 0
+        plan = {
+            "files": [],
+            "partitions": {},
+            "bytes": 0,
+            "retention_count": 0,
+            "space_count": 0,
+            "cutoff": cutoff_timestamp,
+            "total_bytes": total_bytes,
+            "usage_before_percent": (used_bytes / total_bytes) * 100 if total_bytes > 0 else None,
+        }
 
-        # Se o limite foi ultrapassado, começamos a deletar
-        print("🚨 LIMITE EXCEDIDO! Iniciando exclusão de ficheiros mais antigos...")
-        
-        # Obtém todos os ficheiros (agora só os que sobraram da política de retenção)
-        all_files = self._get_video_files()
-        
-        # Ordena pelo tempo de modificação (do mais antigo para o mais novo)
-        files_to_delete_sorted = sorted(
-            [(os.path.getmtime(f), f) for f in all_files],
-            key=lambda x: x[0]
-        )
-        
+        for mod_timestamp, file_path, file_size in self._iter_oldest_first():
+            if mod_timestamp < cutoff_timestamp:
+                reason = "retention"
+                plan["retention_count"] += 1
+            elif limit_bytes is not None and used_bytes >= limit_bytes:
+                reason = "space"
+                plan["space_count"] += 1
+            else:
+                # Clipe recente e uso abaixo do limite: os demais são mais novos
+                break
+            partition = partition_of(os.path.abspath(file_path)) if reason == "retention" else None
+            if partition in expired:
+                plan["partitions"].setdefault(partition, []).append((file_path, file_size))
+            else:
+                plan["files"].append((file_path, file_size, reason))
+            plan["bytes"] += file_size
+            # Assume que o espaço liberado reduz o 'used' do disco
+            used_bytes -= file_size
+
+        plan["usage_after_percent"] = (used_bytes / total_bytes) * 100 if total_bytes > 0 else None
+        return plan
+
+    def execute_plan(self, plan):
+        """
+        Apaga os clipes de um plano de plan_eviction(). Retorna (bytes
+        liberados, clipes apagados), contando só os arquivos realmente removidos.
+
+        As partições vencidas também são esvaziadas clipe a clipe: só os
+        arquivos realmente removidos contam como liberados, e a pasta só sai
+        (prune_empty_parents) se ficou vazia.
+        """
         bytes_freed = 0
-        
-        # Continua a deletar até que o espaço usado (o numerador na porcentagem) seja inferior ao limite
-        # Nota: Idealmente, o 'used_bytes' aqui deveria ser o espaço total da pasta de vídeos, 
-        # mas mantive o 'used' do disco para aderir ao pedido de "armazenamento total do sistema".
-        while current_usage_percent >= self.SPACE_LIMIT_PERCENT and files_to_delete_sorted:
-            
-            # Pega o ficheiro mais antigo na lista (o elemento 1 é o path)
-            oldest_file_path = files_to_delete_sorted.pop(0)[1]
-            
+        removed = 0
+        deleted_paths = []
+
+        def remove(file_path, file_size):
+            nonlocal bytes_freed, removed
             try:
-                file_size = os.path.getsize(oldest_file_path)
-                os.remove(oldest_file_path)
-                
-                # Atualiza o uso de bytes (assumindo que o espaço liberado afeta o 'used_bytes')
-                used_bytes -= file_size
-                bytes_freed += file_size
-                
-                # Recalcula o percentual de uso para verificar a condição de saída do loop
-                current_usage_percent = (used_bytes / total_bytes) * 100
-                
-                print(f"  🗑️ Deletado por limite de espaço: {os.path.basename(oldest_file_path)} (Uso Atual: {current_usage_percent:.2f}%)")
-                
+                os.remove(file_path)
+            except FileNotFoundError:
+                # Já foi apagado por fora: só atualiza o catálogo
+                deleted_paths.append(file_path)
+                return
             except OSError as e:
-                print(f"Erro ao deletar {oldest_file_path} durante a limpeza de espaço: {e}")
-        
-        # Verifica o uso final
-        print(f"✅ Espaço libertado: {bytes_freed / self.GB_SCALE:.2f} GB.")
-        print(f"Uso Final do Disco: {current_usage_percent:.2f}%")
+                log.warning("Erro ao deletar %s: %s", file_path, e)
+                return
+            bytes_freed += file_size
+            removed += 1
+            deleted_paths.append(file_path)
+            self.on_clip_deleted(file_path, file_size)
+
+        for partition, clips in plan.get("partitions", {}).items():
+            for file_path, file_size in clips:
+                remove(file_path, file_size)
+            prune_empty_parents(partition)
+        for file_path, file_size, reason in plan["files"]:
+            remove(file_path, file_size)
+            prune_empty_parents(file_path)
+        self._mark_deleted(deleted_paths)
+        return bytes_freed, removed
 
-        return bytes_freed
+    @staticmethod
+    def _format_percent(value):
+        return "?" if value is None else f"{value:.2f}%"
+
+    def _print_plan(self, plan):
+        cutoff_date = datetime.fromtimestamp(plan["cutoff"])
+        print(f"\n[Política de Retenção] Ficheiros anteriores a {cutoff_date.strftime('%Y-%m-%d')}: {plan['retention_count']} "
+              f"({len(plan['partitions'])} partições inteiras)")
+        print(f"[Política de Espaço] Uso Atual do Disco: {self._format_percent(plan['usage_before_percent'])} "
+              f"(Limite: {self.SPACE_LIMIT_PERCENT:.2f}%) - ficheiros a remover: {plan['space_count']}")
+        print(f"Total a libertar: {plan['bytes'] / self.GB_SCALE:.2f} GB "
+              f"(Uso Final previsto: {self._format_percent(plan['usage_after_percent'])})")
 
     # --- Método Principal de Gerenciamento ---
 
-    def manage_storage(self):
+    def manage_storage(self, dry_run: bool = False):
         """
-        Executa as duas políticas de exclusão em ordem:
-        1. Política de Retenção (15 dias).
-        2. Política de Espaço (60% do disco).
+        Executa as duas políticas de exclusão (retenção de 15 dias e limite
+        de 60% do disco) numa única passada.
+
+        :param dry_run: Se True, apenas calcula e mostra o plano de exclusão.
+        :return: O plano calculado (com 'bytes_freed' e 'files_deleted' quando executado).
         """
         print("\n==============================================")
         print(f"Iniciando Gerenciamento de Armazenamento - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("==============================================")
-        
-        # 1. Política de Retenção (remove ficheiros antigos)
-        self._check_retention_policy()
-        
-        # 2. Política de Espaço (remove os mais antigos para liberar espaço, se necessário)
-        self._check_space_policy()
-        
+
+        started = time.perf_counter()
+        plan = self.plan_eviction()
+        plan["plan_s"] = time.perf_counter() - started
+        self._print_plan(plan)
+
+        if plan["space_count"] and self._tiering is not None and not dry_run:
+            # Política de espaço: primeiro reduz os clipes antigos, depois apaga o que faltar
+            print("\n[Política de Espaço] Recodificando clipes antigos antes de apagar...")
+            tiers = self.run_tiers()
+            plan = self.plan_eviction()
+            plan["tiers"] = tiers
+            self._print_plan(plan)
+
+        if dry_run:
+            print("\nModo simulação: nenhum ficheiro foi apagado.")
+            return plan
+
+        evict_started = time.perf_counter()
+        plan["bytes_freed"], plan["files_deleted"] = self.execute_plan(plan)
+        EVICTION_SECONDS.labels("manual").observe(time.perf_counter() - evict_started)
+        RECLAIMED_BYTES.labels("manual").inc(plan["bytes_freed"])
+        EVICTED_CLIPS.labels("manual").inc(plan["files_deleted"])
+        print(f"✅ Espaço libertado: {plan['bytes_freed'] / self.GB_SCALE:.2f} GB "
+              f"({plan['files_deleted']} ficheiros em {time.perf_counter() - started:.2f}s).")
         print("\nGerenciamento de Armazenamento Concluído.")
+        return plan
+
+
+    # --- Modo Daemon ---
+
+    def start_daemon(self, check_interval: float = 5.0, disk_refresh_s: float = 60.0):
+        """
+        Inicia a limpeza contínua numa thread, para rodar junto do Recorder.
+
+        A pasta é varrida uma única vez; depois o total de bytes é mantido
+        pelos eventos on_clip_written()/on_clip_deleted(). Quando o uso passa
+        de HIGH_WATERMARK_PERCENT os clipes mais antigos são apagados (com
+        limite de exclusões por segundo) até ficar abaixo de LOW_WATERMARK_PERCENT.
+
+        :param check_interval: Intervalo máximo entre duas verificações.
+        :param disk_refresh_s: Intervalo para reler o uso do disco por outros arquivos.
+        """
+        if self._daemon is not None:
+            raise RuntimeError("O daemon de armazenamento já está rodando.")
+        with self._lock:
+            self._clips_heap = list(self._iter_oldest_first())
+            heapq.heapify(self._clips_heap)
+            self._video_bytes = sum(size for _, _, size in self._clips_heap)
+            self._deleted_paths.clear()
+        self._refresh_disk_usage()
+        self._stop_event.clear()
+        self._daemon = threading.Thread(
+            target=self._daemon_loop, args=(check_interval, disk_refresh_s),
+            name="StorageManager-daemon", daemon=True,
+        )
+        self._daemon.start()
+        DISK_USAGE.labels(self._video_path).set_function(self.usage_percent)
+        print(f"Daemon de armazenamento iniciado: {self._format_percent(self.usage_percent())} em uso "
+              f"(marcas {self.HIGH_WATERMARK_PERCENT:.0f}%/{self.LOW_WATERMARK_PERCENT:.0f}%).")
+
+    def stop_daemon(self):
+        """Para a thread de limpeza."""
+        if self._daemon is None:
+            return
+        self._stop_event.set()
+        self._wakeup.set()
+        self._daemon.join()
+        self._daemon = None
+
+    def on_clip_written(self, path: str, size: int = None, codec: str = None, duration_s: float = None,
+                        start_time: float = None, reserved: float = 0):
+        """
+        Evento de clipe gravado: soma os bytes ao total e atualiza a taxa
+        de bytes/s medida para o codec.
+
+        :param reserved: Valor retornado por reserve() para este clipe (é liberado).
+        """
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+        with self._lock:
+            self._reserved_bytes = max(0, self._reserved_bytes - (reserved or 0))
+            if codec is not None and duration_s and size:
+                rate = size / duration_s
+                previous = self._bytes_per_s.get(codec)
+                # Média móvel: acompanha mudanças de cena sem oscilar a cada clipe
+                self._bytes_per_s[codec] = rate if previous is None else 0.7 * previous + 0.3 * rate
+            if self._video_bytes is None:
+                return
+            self._video_bytes += size
+            self._deleted_paths.discard(path)
+            heapq.heappush(self._clips_heap, (start_time or time.time(), path, size))
+        self._wake_if_needed()
+
+    def on_clip_deleted(self, path: str, size: int):
+        """Evento de clipe apagado por outro componente: desconta os bytes do total."""
+        with self._lock:
+            if self._video_bytes is None:
+                return
+            self._video_bytes = max(0, self._video_bytes - size)
+            # A entrada no heap é descartada quando chegar ao topo
+            self._deleted_paths.add(path)
+
+    def estimate_clip_bytes(self, codec: str, seconds: float):
+        """Bytes esperados para um clipe de `seconds` segundos, pela taxa medida do codec."""
+        with self._lock:
+            rate = self._bytes_per_s.get(codec, self.DEFAULT_BYTES_PER_S)
+        return rate * seconds * self.RESERVE_MARGIN
+
+    def reserve(self, codec: str, seconds: float):
+        """
+        Reserva espaço para o próximo clipe antes da exportação. A reserva
+        entra no cálculo das marcas d'água, então a limpeza começa antes do
+        clipe ser gravado.
+
+        :return: Bytes reservados (passe para on_clip_written ou release), ou
+                 None se o disco não tem espaço livre nem para o clipe.
+        """
+        needed = self.estimate_clip_bytes(codec, seconds)
+        try:
+            free = shutil.disk_usage(self._video_path).free
+        except OSError:
+            free = None
+        with self._lock:
+            self._daemon_stats["reservations"] += 1
+            if free is not None and free - self._reserved_bytes < needed:
+                self._daemon_stats["reservations_refused"] += 1
+                self._wakeup.set()
+                return None
+            self._reserved_bytes += needed
+        self._wake_if_needed()
+        return needed
+
+    def release(self, reserved: float):
+        """Libera uma reserva de um clipe que não foi gravado."""
+        if not reserved:
+            return
+        with self._lock:
+            self._reserved_bytes = max(0, self._reserved_bytes - reserved)
+
+    def usage_percent(self):
+        """Uso estimado do disco (outros arquivos + clipes + reservas), sem varrer a pasta."""
+        with self._lock:
+            return self._usage_percent_locked()
+
+    def daemon_stats(self):
+        """Total de bytes, reservas, uso e exclusões do daemon."""
+        with self._lock:
+            stats = dict(self._daemon_stats)
+            stats.update(
+                video_bytes=self._video_bytes,
+                reserved_bytes=self._reserved_bytes,
+                usage_percent=self._usage_percent_locked(),
+                bytes_per_s=dict(self._bytes_per_s),
+                clips=len(self._clips_heap) - len(self._deleted_paths),
+            )
+        return stats
+
+    def _usage_percent_locked(self):
+        if not self._total_bytes or self._video_bytes is None:
+            return None
+        used = self._other_bytes + self._video_bytes + self._reserved_bytes
+        return used / self._total_bytes * 100
+
+    def _wake_if_needed(self):
+        usage = self.usage_percent()
+        if usage is not None and usage >= self.HIGH_WATERMARK_PERCENT:
+            self._wakeup.set()
+
+    def _refresh_disk_usage(self):
+        """Relê o disco (statvfs, sem varrer a pasta) para acompanhar os outros arquivos."""
+        total_bytes, used_bytes, _ = self._get_system_disk_usage()
+        with self._lock:
+            self._total_bytes = total_bytes
+            # Bytes no disco que não são clipes (sistema, logs...)
+            self._other_bytes = max(0, used_bytes - (self._video_bytes or 0))
+
+    def _daemon_loop(self, check_interval, disk_refresh_s):
+        next_refresh = time.monotonic() + disk_refresh_s
+        next_tiers = time.monotonic()
+        while not self._stop_event.is_set():
+            self._wakeup.wait(check_interval)
+            self._wakeup.clear()
+            if self._stop_event.is_set():
+                return
+            if time.monotonic() >= next_refresh:
+                self._refresh_disk_usage()
+                next_refresh = time.monotonic() + disk_refresh_s
+            try:
+                # Apagar vem antes: a recodificação é lenta (prioridade mínima) e
+                # precisa de espaço temporário, enquanto a gravação continua
+                self._evict()
+                usage = self.usage_percent()
+                below_high = usage is None or usage < self.HIGH_WATERMARK_PERCENT
+                if self._tiering is not None and below_high and time.monotonic() >= next_tiers:
+                    self.run_tiers(max_clips=self._tiering["batch_size"])
+                    next_tiers = time.monotonic() + self._tiering["interval_s"]
+            except Exception as e:
+                log.error("Erro no daemon de armazenamento: %s", e)
+
+    def _evict(self):
+        """
+        Apaga os clipes mais antigos: os que passaram da retenção e, se o uso
+        passou da marca alta, os seguintes até a marca baixa. Entre duas
+        exclusões espera o suficiente para respeitar MAX_DELETES_PER_S e
+        MAX_DELETE_BYTES_PER_S.
+        """
+        started = time.perf_counter()
+        freed = 0
+        cutoff_timestamp = time.time() - self.RETENTION_DAYS * 24 * 60 * 60
+        usage = self.usage_percent()
+        evicting = usage is not None and usage >= self.HIGH_WATERMARK_PERCENT
+        if evicting:
+            with self._lock:
+                self._daemon_stats["evictions_started"] += 1
+            log.info("Uso do disco em %.2f%%: limpando até %.0f%%.", usage, self.LOW_WATERMARK_PERCENT)
+
+        deleted_paths, failed = [], []
+        try:
+            while not self._stop_event.is_set():
+                with self._lock:
+                    if not self._clips_heap:
+                        break
+                    mod_timestamp, file_path, file_size = self._clips_heap[0]
+                    if file_path in self._deleted_paths:
+                        heapq.heappop(self._clips_heap)
+                        self._deleted_paths.discard(file_path)
+                        continue
+                    usage = self._usage_percent_locked()
+                    above_low = evicting and usage is not None and usage > self.LOW_WATERMARK_PERCENT
+                    if mod_timestamp >= cutoff_timestamp and not above_low:
+                        break
+                    heapq.heappop(self._clips_heap)
+                    # Tamanho atual, se o clipe foi recodificado depois de entrar no heap
+                    file_size = self._resized.pop(file_path, file_size)
+
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    # Apagado por fora: some do total, mas não conta como liberado aqui
+                    with self._lock:
+                        self._video_bytes = max(0, self._video_bytes - file_size)
+                    deleted_paths.append(file_path)
+                    continue
+                except OSError as e:
+                    # O arquivo continua no disco (e no total): volta ao heap no fim desta rodada
+                    log.warning("Erro ao deletar %s: %s", file_path, e)
+                    failed.append((mod_timestamp, file_path, file_size))
+                    continue
+                prune_empty_parents(file_path)
+                deleted_paths.append(file_path)
+                freed += file_size
+                with self._lock:
+                    self._video_bytes = max(0, self._video_bytes - file_size)
+                    self._daemon_stats["evicted"] += 1
+                    self._daemon_stats["evicted_bytes"] += file_size
+                # Limita a taxa de exclusões (I/O do cartão/disco fica para a gravação)
+                self._stop_event.wait(max(1.0 / self.MAX_DELETES_PER_S,
+                                          file_size / self.MAX_DELETE_BYTES_PER_S))
+        finally:
+            self._mark_deleted(deleted_paths)
+            with self._lock:
+                for clip in failed:
+                    heapq.heappush(self._clips_heap, clip)
+        if deleted_paths:
+            EVICTION_SECONDS.labels("daemon").observe(time.perf_counter() - started)
+            RECLAIMED_BYTES.labels("daemon").inc(freed)
+            EVICTED_CLIPS.labels("daemon").inc(len(deleted_paths))
+            log.info("%d clipes apagados, uso estimado: %s.", len(deleted_paths),
+                     self._format_percent(self.usage_percent()))
+
+
+    # --- Níveis de Armazenamento ---
+
+    def enable_tiering(self, codec: str = "avc1", crf: int = 28, preset: str = "veryfast",
+                       after_hours: float = None, workers: int = 1, nice: int = 19, cores=None,
+                       threads: int = 1, archive_path: str = None, archive_after_days: float = None,
+                       batch_size: int = 20, interval_s: float = 600.0):
+        """
+        Ativa os níveis de armazenamento:
+        1. Clipes mais velhos que `after_hours` são recodificados para um
+           codec mais compacto (ex: mp4v -> h264) e trocados de forma atômica.
+        2. Se `archive_path` for informado, clipes mais velhos que
+           `archive_after_days` são movidos para lá; sem ela, o próximo nível
+           é a exclusão pela retenção.
+
+        A recodificação roda num pool de processos com prioridade mínima
+        (nice, ionice idle) e, opcionalmente, presos a alguns núcleos, para
+        não disputar CPU e disco com a gravação. Com o nível ativo, o
+        manage_storage() reduz os clipes antes de apagá-los; no daemon a
+        exclusão vem primeiro e a recodificação só roda abaixo da marca alta.
+
+        :param codec: FourCC (ex: 'avc1') ou encoder do ffmpeg do nível compacto.
+        :param crf: Qualidade do nível compacto (maior = arquivo menor).
+        :param preset: Preset do encoder.
+        :param after_hours: Idade mínima para recodificar (padrão: TRANSCODE_AFTER_HOURS).
+        :param workers: Processos de recodificação simultâneos.
+        :param nice: Prioridade de CPU dos processos (19 = mínima).
+        :param cores: Núcleos permitidos (ex: [3]); None = todos.
+        :param threads: Threads do ffmpeg por clipe.
+        :param archive_path: Pasta do nível de arquivo (outro disco, NAS...).
+        :param archive_after_days: Idade mínima para arquivar (padrão: ARCHIVE_AFTER_DAYS).
+        :param batch_size: Clipes por rodada do daemon.
+        :param interval_s: Intervalo entre rodadas do daemon.
+        """
+        # Import local: o mapa de codecs fica junto dos encoders (que carregam o OpenCV)
+        from Classes.Encoders import FOURCC_TO_FFMPEG
+
+        if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+            raise RuntimeError("Os níveis de armazenamento precisam do ffmpeg e do ffprobe.")
+        self._tiering = {
+            "codec": codec,
+            "vcodec": FOURCC_TO_FFMPEG.get(codec, codec),
+            "crf": crf,
+            "preset": preset,
+            "threads": threads,
+            "after_hours": self.TRANSCODE_AFTER_HOURS if after_hours is None else after_hours,
+            "workers": max(1, workers),
+            "nice": nice,
+            "cores": list(cores) if cores else None,
+            "archive_path": archive_path,
+            "archive_after_days": self.ARCHIVE_AFTER_DAYS if archive_after_days is None else archive_after_days,
+            "batch_size": batch_size,
+            "interval_s": interval_s,
+        }
+        print(f"Níveis de armazenamento: clipes com mais de {self._tiering['after_hours']}h -> "
+              f"{self._tiering['vcodec']} (crf {crf})"
+              + (f", arquivo após {self._tiering['archive_after_days']} dias em {archive_path}" if archive_path else ""))
+
+    def _is_tiered(self, path):
+        if path in self._tiered_paths:
+            return True
+        try:
+            return os.getxattr(path, self.TIER_XATTR) == self._tiering["vcodec"].encode()
+        except (OSError, AttributeError):
+            return False
+
+    def _mark_tiered(self, path):
+        self._tiered_paths.add(path)
+        try:
+            # Persiste entre execuções (ignorado em sistemas de arquivos sem xattr, ex: FAT)
+            os.setxattr(path, self.TIER_XATTR, self._tiering["vcodec"].encode())
+        except (OSError, AttributeError):
+            pass
+
+    def _tier_candidates(self, now):
+        """Clipes para arquivar e para recodificar, do mais antigo ao mais novo."""
+        tiering = self._tiering
+        transcode_before = now - tiering["after_hours"] * 3600
+        archive_before = now - tiering["archive_after_days"] * 86400 if tiering["archive_path"] else None
+        retention_cutoff = now - self.RETENTION_DAYS * 24 * 60 * 60
+        to_archive, to_transcode = [], []
+        for timestamp, path, size in self._iter_known_clips():
+            if timestamp >= transcode_before:
+                break
+            if timestamp < retention_cutoff:
+                continue  # Será apagado pela retenção
+            if archive_before is not None and timestamp < archive_before:
+                to_archive.append((timestamp, path, size))
+            elif not self._is_tiered(path):
+                to_transcode.append((timestamp, path, size))
+        return to_archive, to_transcode
+
+    def _iter_known_clips(self):
+        """Clipes do mais antigo ao mais novo; com o daemon rodando usa o heap em memória (sem varrer a pasta)."""
+        with self._lock:
+            clips = None
+            if self._video_bytes is not None:
+                clips = sorted(c for c in self._clips_heap if c[1] not in self._deleted_paths)
+        return iter(clips) if clips is not None else self._iter_oldest_first()
+
+    def _archive(self, clips):
+        """Move clipes para a pasta de arquivo, mantendo o caminho relativo."""
+        moved, moved_bytes, renamed = 0, 0, []
+        for _, path, size in clips:
+            target = os.path.join(self._tiering["archive_path"], os.path.relpath(path, self._video_path))
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            except OSError as e:
+                log.warning("Erro ao arquivar %s: %s", path, e)
+                continue
+            moved += 1
+            moved_bytes += size
+            renamed.append((path, target))
+            self.on_clip_deleted(path, size)
+            prune_empty_parents(path)
+        if self._catalog is not None and renamed:
+            self._catalog.update_paths(renamed)
+        return moved, moved_bytes
+
+    def run_tiers(self, now: float = None, max_clips: int = None, dry_run: bool = False):
+        """
+        Executa uma rodada dos níveis de armazenamento (ver enable_tiering).
+
+        :param max_clips: Máximo de clipes recodificados nesta rodada.
+        :param dry_run: Só conta os candidatos.
+        :return: Relatório da rodada: clipes por status, bytes antes/depois,
+                 bytes economizados e vazão da recodificação.
+        """
+        if self._tiering is None:
+            raise RuntimeError("Níveis de armazenamento desativados: use enable_tiering().")
+        tiering = self._tiering
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        to_archive, to_transcode = self._tier_candidates(now)
+        if max_clips is not None:
+            to_transcode = to_transcode[:max_clips]
+
+        report = {"candidates": len(to_transcode), "transcoded": 0, "skipped": 0, "not_smaller": 0,
+                  "failed": 0, "bytes_before": 0, "bytes_after": 0, "bytes_saved": 0,
+                  "video_s": 0.0, "archived": 0, "archived_bytes": 0, "dry_run": dry_run}
+        if dry_run:
+            report["archive_candidates"] = len(to_archive)
+            report["candidate_bytes"] = sum(size for _, _, size in to_transcode)
+            return report
+
+        if to_archive:
+            report["archived"], report["archived_bytes"] = self._archive(to_archive)
+
+        if to_transcode:
+            options = {k: tiering[k] for k in ("vcodec", "crf", "preset", "threads")}
+            # spawn: os processos não herdam as threads de captura/exportação
+            with ProcessPoolExecutor(max_workers=tiering["workers"], mp_context=mp.get_context("spawn"),
+                                     initializer=lower_priority,
+                                     initargs=(tiering["nice"], tiering["cores"])) as pool:
+                futures = {pool.submit(transcode_clip, path, **options): (timestamp, path)
+                           for timestamp, path, _ in to_transcode}
+                for future in as_completed(futures):
+                    timestamp, path = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        log.warning("Erro ao recodificar %s: %s", path, e)
+                        report["failed"] += 1
+                        continue
+                    self._apply_transcode(result, timestamp)
+                    report[result["status"]] += 1
+                    if result["status"] == "transcoded":
+                        report["bytes_before"] += result["bytes_before"]
+                        report["bytes_after"] += result["bytes_after"]
+                        report["video_s"] += result["duration_s"] or 0.0
+
+        elapsed = time.perf_counter() - started
+        report["bytes_saved"] = report["bytes_before"] - report["bytes_after"]
+        report["elapsed_s"] = elapsed
+        report["throughput_mb_s"] = report["bytes_before"] / elapsed / (1024 ** 2) if elapsed > 0 else 0.0
+        # Segundos de vídeo recodificados por segundo de relógio
+        report["realtime_factor"] = report["video_s"] / elapsed if elapsed > 0 else 0.0
+        log.info("%d recodificados, %d arquivados, %d mantidos, %d falhas | economia: %.1f MB | "
+                 "%.2f MB/s (%.1fx tempo real) em %.1fs", report['transcoded'], report['archived'],
+                 report['skipped'] + report['not_smaller'], report['failed'], report['bytes_saved'] / 1024 ** 2,
+                 report['throughput_mb_s'], report['realtime_factor'], elapsed)
+        return report
+
+    def _apply_transcode(self, result, timestamp):
+        """Atualiza marcação, total do daemon e catálogo depois de um clipe recodificado."""
+        if result["status"] in ("transcoded", "skipped", "not_smaller"):
+            self._mark_tiered(result["new_path"])
+        if result["status"] != "transcoded":
+            return
+        path, new_path = result["path"], result["new_path"]
+        self.on_clip_resized(path, result["bytes_before"], result["bytes_after"], new_path, timestamp)
+        if self._catalog is not None:
+            self._catalog.update_clip(path, new_path=new_path, codec=self._tiering["codec"],
+                                      size_bytes=result["bytes_after"])
+
+    def on_clip_resized(self, path: str, old_size: int, new_size: int, new_path: str = None,
+                        start_time: float = None):
+        """Evento de clipe recodificado (ou renomeado): ajusta o total do daemon."""
+        with self._lock:
+            if self._video_bytes is None:
+                return
+            self._video_bytes = max(0, self._video_bytes + new_size - old_size)
+            if new_path is None or new_path == path:
+                self._resized[path] = new_size
+            else:
+                self._deleted_paths.add(path)
+                heapq.heappush(self._clips_heap, (start_time or time.time(), new_path, new_size))
 
 
 # --- EXEMPLO DE USO ---
@@ -268,6 +860,9 @@ if __name__ == '__main__':
         test_total_storage_gb=1.0 # Simulação de disco de 1 GB
     )
     
+    # Mostra o plano de exclusão sem apagar nada
+    storage_mgr.manage_storage(dry_run=True)
+
     # Execute a gestão de armazenamento
     storage_mgr.manage_storage()
 
@@ -0,0 +1,282 @@
+"""
+Download de vários clipes num único arquivo zip ou tar montado durante o
+envio, sem arquivos temporários e com memória constante.
+
+Os vídeos já são comprimidos, então as entradas são gravadas sem
+compressão ("stored"): o arquivo final tem o tamanho da soma dos clipes
+mais os cabeçalhos, todos calculados antes do envio. Com isso a resposta
+tem Content-Length e aceita Range, e um download interrompido pode
+continuar de onde parou.
+
+No zip o CRC-32 de cada clipe vai no descritor depois dos dados e no
+diretório central (no fim), e é calculado enquanto o clipe é enviado. Ao
+retomar do meio, os CRCs dos clipes que ficaram para trás são calculados
+lendo esses arquivos de novo. O tar não tem CRC dos dados.
+"""
+import hashlib
+import os
+import struct
+import tarfile
+import time
+import zlib
+
+from Classes.ClipIndex import get_clip_index
+from Classes.ClipLayout import location_slug
+from Classes.HttpFiles import CHUNK_SIZE, resolve_path
+
+FORMATS = ("zip", "tar")
+CONTENT_TYPES = {"zip": "application/zip", "tar": "application/x-tar"}
+
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP_FLAGS = 0x0808              # Bit 3: CRC/tamanhos no descritor; bit 11: nomes em UTF-8
+ZIP_VERSION = 20
+ZIP64_VERSION = 45
+ZIP_MADE_BY = (3 << 8) | ZIP64_VERSION   # Unix
+ZIP_EXTERNAL_ATTR = (0o100644 << 16)     # Arquivo comum, rw-r--r--
+
+
+def collect_clips(video_dir: str, start: float = None, end: float = None, location: str = None, names=None):
+    """
+    Clipes do download em lote: uma lista de nomes (caminhos relativos,
+    como em /videos/list) ou os clipes que começaram em [start, end],
+    opcionalmente só de um local. Retorna [(nome no arquivo, caminho)].
+
+    :raises LookupError: Nome fora da pasta de vídeos ou clipe inexistente.
+    """
+    if names is not None:
+        clips = []
+        for name in names:
+            path = resolve_path(video_dir, name)
+            if path is None or not os.path.isfile(path):
+                raise LookupError(f"Clipe não encontrado: {name}")
+            clips.append((name.replace(os.sep, "/").lstrip("/"), path))
+        return clips
+    prefix = location_slug(location) + "/" if location else None
+    clips = []
+    for name in get_clip_index(video_dir).range(start, end):
+        name = name.replace(os.sep, "/")
+        if prefix is None or name.startswith(prefix):
+            clips.append((name, os.path.join(video_dir, name)))
+    return clips
+
+
+class _Entry:
+    __slots__ = ("name", "path", "size", "mtime", "mtime_ns", "offset", "crc")
+
+    def __init__(self, name, path, st):
+        self.name = name
+        self.path = path
+        self.size = st.st_size
+        self.mtime = int(st.st_mtime)
+        self.mtime_ns = st.st_mtime_ns
+        self.offset = 0     # Posição do cabeçalho local (zip)
+        self.crc = None     # Calculado durante o envio (zip)
+
+
+class StreamingArchive:
+    """
+    Plano de um arquivo zip/tar: uma sequência de partes com tamanho
+    conhecido (cabeçalhos, dados de um clipe, descritores) que é percorrida
+    sob demanda em iter_bytes(start, end).
+    """
+
+    def __init__(self, clips, fmt: str = "zip"):
+        """
+        :param clips: [(nome dentro do arquivo, caminho)], na ordem do arquivo.
+        :param fmt: 'zip' ou 'tar'.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato inválido: {fmt} (use {' ou '.join(FORMATS)})")
+        self.format = fmt
+        self._entries = [_Entry(name, path, os.stat(path)) for name, path in clips]
+        # Partes: (tamanho, tipo, dado); tipo 'bytes', 'file' (índice da entrada) ou 'lazy' (função)
+        self._parts = []
+        if fmt == "zip":
+            self._plan_zip()
+        else:
+            self._plan_tar()
+        self.size = sum(length for length, _, _ in self._parts)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.format]
+
+    @property
+    def etag(self):
+        """Muda se algum clipe mudar (ex: recodificado pelo nível compacto) entre o início e a retomada."""
+        digest = hashlib.sha1(self.format.encode())
+        for entry in self._entries:
+            digest.update(f"{entry.name}\0{entry.size}\0{entry.mtime_ns}\0".encode())
+        return f'"{digest.hexdigest()}"'
+
+    @property
+    def last_modified(self):
+        return max((entry.mtime for entry in self._entries), default=time.time())
+
+    # --- Tar ---
+
+    def _plan_tar(self):
+        for index, entry in enumerate(self._entries):
+            info = tarfile.TarInfo(entry.name)
+            info.size = entry.size
+            info.mtime = entry.mtime
+            info.mode = 0o644
+            header = info.tobuf(tarfile.PAX_FORMAT, encoding="utf-8", errors="surrogateescape")
+            self._parts.append((len(header), "bytes", header))
+            self._parts.append((entry.size, "file", index))
+            padding = -entry.size % tarfile.BLOCKSIZE
+            if padding:
+                self._parts.append((padding, "bytes", b"\0" * padding))
+        # Fim do arquivo: dois blocos zerados
+        self._parts.append((2 * tarfile.BLOCKSIZE, "bytes", b"\0" * (2 * tarfile.BLOCKSIZE)))
+
+    # --- Zip ---
+
+    def _plan_zip(self):
+        offset = 0
+        for index, entry in enumerate(self._entries):
+            entry.offset = offset
+            header = self._zip_local_header(entry)
+            descriptor_size = 24 if entry.size >= ZIP32_LIMIT else 16
+            self._parts.append((len(header), "bytes", header))
+            self._parts.append((entry.size, "file", index))
+            self._parts.append((descriptor_size, "lazy", lambda entry=entry: self._zip_descriptor(entry)))
+            offset += len(header) + entry.size + descriptor_size
+        # O diretório central depende dos CRCs: é montado quando chega a vez dele
+        central_size = sum(46 + len(entry.name.encode()) + self._zip64_extra_size(entry)
+                           for entry in self._entries)
+        self._parts.append((central_size, "lazy", self._zip_central_directory))
+        end = self._zip_end(offset, central_size)
+        self._parts.append((len(end), "bytes", end))
+
+    @staticmethod
+    def _dos_time(mtime):
+        t = time.localtime(max(mtime, 315532800))  # O zip não representa datas antes de 1980
+        return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+               ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+    def _zip_local_header(self, entry):
+        name = entry.name.encode()
+        dos_time, dos_date = self._dos_time(entry.mtime)
+        if entry.size >= ZIP32_LIMIT:
+            # Zip64: tamanhos no campo extra (zerados, os reais vão no descritor)
+            extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+            version, sizes = ZIP64_VERSION, ZIP32_LIMIT
+        else:
+            extra, version, sizes = b"", ZIP_VERSION, 0
+        return struct.pack("<IHHHHHIIIHH", 0x04034B50, version, ZIP_FLAGS, 0, dos_time, dos_date,
+                           0, sizes, sizes, len(name), len(extra)) + name + extra
+
+    def _zip_descriptor(self, entry):
+        crc = self._crc(entry)
+        if entry.size >= ZIP32_LIMIT:
+            return struct.pack("<IIQQ", 0x08074B50, crc, entry.size, entry.size)
+        return struct.pack("<IIII", 0x08074B50, crc, entry.size, entry.size)
+
+    @staticmethod
+    def _zip64_fields(entry):
+        """Campos que não cabem em 32 bits (ordem do campo extra zip64)."""
+        fields = []
+        if entry.size >= ZIP32_LIMIT:
+            fields += [entry.size, entry.size]
+        if entry.offset >= ZIP32_LIMIT:
+            fields.append(entry.offset)
+        return fields
+
+    def _zip64_extra_size(self, entry):
+        fields = self._zip64_fields(entry)
+        return 4 + 8 * len(fields) if fields else 0
+
+    def _zip_central_directory(self):
+        records = []
+        for entry in self._entries:
+            name = entry.name.encode()
+            fields = self._zip64_fields(entry)
+            extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields) if fields else b""
+            size = min(entry.size, ZIP32_LIMIT)
+            dos_time, dos_date = self._dos_time(entry.mtime)
+            records.append(struct.pack(
+                "<IHHHHHHIIIHHHHHII", 0x02014B50, ZIP_MADE_BY, ZIP64_VERSION if fields else ZIP_VERSION,
+                ZIP_FLAGS, 0, dos_time, dos_date, self._crc(entry), size, size, len(name), len(extra),
+                0, 0, 0, ZIP_EXTERNAL_ATTR, min(entry.offset, ZIP32_LIMIT),
+            ) + name + extra)
+        return b"".join(records)
+
+    def _zip_end(self, central_offset, central_size):
+        count = len(self._entries)
+        end = b""
+        if count >= 0xFFFF or central_offset >= ZIP32_LIMIT or central_size >= ZIP32_LIMIT:
+            # Registro e localizador do fim do diretório central zip64
+            zip64_end_offset = central_offset + central_size
+            end += struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, ZIP_MADE_BY, ZIP64_VERSION, 0, 0,
+                               count, count, central_size, central_offset)
+            end += struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+        end += struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                           min(central_size, ZIP32_LIMIT), min(central_offset, ZIP32_LIMIT), 0)
+        return end
+
+    def _crc(self, entry):
+        if entry.crc is None:
+            # Retomada depois desse clipe: o CRC é calculado relendo o arquivo
+            crc = 0
+            with open(entry.path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    crc = zlib.crc32(chunk, crc)
+            entry.crc = crc
+        return entry.crc
+
+    # --- Envio ---
+
+    def iter_bytes(self, start: int = 0, end: int = None, chunk_size: int = CHUNK_SIZE):
+        """
+        Gera os bytes [start, end) do arquivo em blocos de até chunk_size.
+
+        :raises IOError: Se um clipe mudou de tamanho ou sumiu durante o envio
+                         (o tamanho anunciado não pode mais ser cumprido).
+        """
+        end = self.size if end is None else end
+        position = 0
+        for length, kind, data in self._parts:
+            part_start, part_end = position, position + length
+            position = part_end
+            if part_end <= start:
+                continue
+            if part_start >= end:
+                return
+            first = max(start, part_start) - part_start
+            last = min(end, part_end) - part_start
+            if kind == "file":
+                yield from self._iter_file(self._entries[data], first, last, chunk_size)
+                continue
+            payload = data() if kind == "lazy" else data
+            for offset in range(first, last, chunk_size):
+                yield payload[offset:min(offset + chunk_size, last)]
+
+    def _iter_file(self, entry, first, last, chunk_size):
+        # O CRC só é aproveitado se o clipe for enviado inteiro, do começo ao fim
+        track_crc = self.format == "zip" and first == 0 and last == entry.size and entry.crc is None
+        crc = 0
+        with open(entry.path, "rb") as f:
+            f.seek(first)
+            remaining = last - first
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    raise IOError(f"Clipe mudou durante o envio: {entry.name}")
+                if track_crc:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if track_crc:
+            entry.crc = crc
+
+
+def archive_name(fmt: str, start: float = None, location: str = None):
+    """Nome sugerido para o download (ex: 'quadra_1_2024-11-09T10-00-00.zip')."""
+    parts = [location_slug(location)] if location else []
+    if start is not None:
+        parts.append(time.strftime("%Y-%m-%dT%H-%M-%S", time.localtime(start)))
+    return "_".join(parts or ["clipes"]) + "." + fmt
@@ -0,0 +1,254 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+from Classes.Log import get_logger
+
+log = get_logger("supervisor")
+
+
+def _camera_process(name, recorder_kwargs, codec, containerv, core, control, status, metrics_url=None):
+    """
+    Processo de uma câmera: cria o Recorder em modo headless, executa os
+    comandos recebidos em `control` e envia um heartbeat por segundo em
+    `status` com as estatísticas de captura. Com metrics_url, envia as
+    métricas do processo para <metrics_url>/<nome>.
+    """
+    # Import local: o processo filho carrega o OpenCV só quando precisa
+    from Classes.Metrics import MetricsPusher
+    from Classes.Recorder import Recorder
+
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+
+    recorder = Recorder(**recorder_kwargs)
+    recorder.start_headless(codec, containerv)
+    pusher = None
+    if metrics_url:
+        pusher = MetricsPusher(f"{metrics_url.rstrip('/')}/{name}")
+        pusher.start()
+    try:
+        next_heartbeat = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_heartbeat:
+                status.put(("heartbeat", name, os.getpid(), time.time(),
+                            recorder.get_capture_stats(), recorder.get_export_metrics()))
+                next_heartbeat = now + 1.0
+            try:
+                command, options = control.get(timeout=max(0.0, next_heartbeat - time.monotonic()))
+            except queue.Empty:
+                continue
+            if command == "trigger":
+                recorder.trigger(**options)
+            elif command == "stop":
+                break
+    finally:
+        if pusher is not None:
+            pusher.stop()
+        recorder.stop_headless()
+
+
+class RecorderSupervisor:
+    """
+    Supervisiona várias câmeras (ex: uma por quadra), cada uma em seu
+    próprio processo com buffer, encoder e gatilhos independentes. Um
+    processo que morre ou para de capturar frames é reiniciado.
+    """
+
+    def __init__(self, heartbeat_timeout: float = 5.0, stall_timeout: float = 10.0,
+                 restart_delay: float = 2.0, metrics_url: str = None):
+        """
+        :param heartbeat_timeout: Segundos sem heartbeat até considerar o processo travado.
+        :param stall_timeout: Segundos sem frames novos até considerar a câmera travada.
+        :param restart_delay: Espera mínima entre dois reinícios da mesma câmera.
+        :param metrics_url: Base para enviar as métricas de cada câmera
+                            (ex: http://127.0.0.1:5000/metrics/push), ou None.
+        """
+        self._metrics_url = metrics_url
+        self._heartbeat_timeout = heartbeat_timeout
+        self._stall_timeout = stall_timeout
+        self._restart_delay = restart_delay
+        self._ctx = mp.get_context("spawn")
+        self._status = self._ctx.Queue()
+        self._cameras = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._monitor = None
+
+    def add_camera(self, name: str, codec: str, containerv: str, core: int = None, **recorder_kwargs):
+        """
+        Registra uma câmera.
+
+        :param name: Identificador da câmera (ex: 'quadra3').
+        :param codec: FourCC usado nos clipes.
+        :param containerv: Extensão do contêiner.
+        :param core: Núcleo da CPU ao qual o processo é fixado (None = livre).
+        :param recorder_kwargs: Argumentos do Recorder (location, ip_address,
+                                cam_height, cam_width, path, source...).
+        """
+        with self._lock:
+            if name in self._cameras:
+                raise ValueError(f"Câmera já registrada: {name}")
+            self._cameras[name] = {
+                "args": (recorder_kwargs, codec, containerv, core),
+                "process": None,
+                "control": None,
+                "started_at": 0.0,
+                "last_heartbeat": 0.0,
+                "last_progress": 0.0,
+                "frames": -1,
+                "restarts": 0,
+                "capture": None,
+                "export": None,
+            }
+
+    def start(self):
+        """Inicia todos os processos e a thread de monitoramento."""
+        with self._lock:
+            for name in self._cameras:
+                self._spawn(name)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="RecorderSupervisor", daemon=True)
+        self._monitor.start()
+
+    def trigger(self, name: str, **options):
+        """Pede um clipe para uma câmera (ex: trigger('quadra3'))."""
+        with self._lock:
+            camera = self._cameras[name]
+            camera["control"].put(("trigger", options))
+
+    def trigger_all(self, **options):
+        """Pede um clipe para todas as câmeras."""
+        with self._lock:
+            for camera in self._cameras.values():
+                camera["control"].put(("trigger", options))
+
+    def status(self):
+        """Retorna o estado de cada câmera (pid, reinícios, estatísticas de captura)."""
+        with self._lock:
+            return {
+                name: {
+                    "pid": camera["process"].pid if camera["process"] else None,
+                    "alive": bool(camera["process"] and camera["process"].is_alive()),
+                    "restarts": camera["restarts"],
+                    "last_heartbeat": camera["last_heartbeat"],
+                    "capture": camera["capture"],
+                    "export": camera["export"],
+                }
+                for name, camera in self._cameras.items()
+            }
+
+    def stop(self, timeout: float = 10.0):
+        """Para todas as câmeras, esperando os clipes pendentes."""
+        self._stop_event.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        with self._lock:
+            for camera in self._cameras.values():
+                if camera["process"] is not None and camera["process"].is_alive():
+                    camera["control"].put(("stop", {}))
+            for camera in self._cameras.values():
+                process = camera["process"]
+                if process is None:
+                    continue
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+    # --- Internos ---
+
+    def _spawn(self, name):
+        """Inicia o processo de uma câmera (chamado com self._lock)."""
+        self._install(name, *self._start_process(name))
+
+    def _start_process(self, name):
+        """Cria e inicia o processo de uma câmera; retorna (fila de controle, processo)."""
+        recorder_kwargs, codec, containerv, core = self._cameras[name]["args"]
+        control = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_camera_process,
+            args=(name, recorder_kwargs, codec, containerv, core, control, self._status,
+                  self._metrics_url),
+            name=f"camera-{name}",
+            daemon=True,
+        )
+        process.start()
+        return control, process
+
+    def _install(self, name, control, process):
+        """Passa a acompanhar o processo novo da câmera (chamado com self._lock)."""
+        camera = self._cameras[name]
+        camera["control"] = control
+        camera["process"] = process
+        now = time.monotonic()
+        camera["started_at"] = now
+        camera["last_heartbeat"] = 0.0
+        camera["last_progress"] = now
+        camera["frames"] = -1
+
+    def _restart(self, name, reason, process):
+        """
+        Encerra o processo travado e inicia outro. Roda sem self._lock: o
+        join/terminate pode levar segundos e não deve travar trigger() e status().
+        """
+        log.warning("Reiniciando câmera %s: %s", name, reason)
+        if process.is_alive():
+            process.terminate()
+        process.join(1.0)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        if self._stop_event.is_set():
+            return
+        control, new_process = self._start_process(name)
+        with self._lock:
+            self._cameras[name]["restarts"] += 1
+            self._install(name, control, new_process)
+
+    def _monitor_loop(self):
+        while not self._stop_event.is_set():
+            # Consome os heartbeats pendentes
+            messages = []
+            try:
+                messages.append(self._status.get(timeout=0.5))
+                while True:
+                    messages.append(self._status.get_nowait())
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                for _, name, pid, sent_at, capture, export in messages:
+                    camera = self._cameras.get(name)
+                    if camera is None or camera["process"].pid != pid:
+                        continue  # Heartbeat de um processo já substituído
+                    camera["last_heartbeat"] = sent_at
+                    camera["capture"] = capture
+                    camera["export"] = export
+                    frames = capture["frames"] if capture else 0
+                    if frames != camera["frames"]:
+                        camera["frames"] = frames
+                        camera["last_progress"] = time.monotonic()
+
+            # Decide sob o lock; encerra e reinicia os processos fora dele
+            now = time.monotonic()
+            restarts = []
+            with self._lock:
+                if self._stop_event.is_set():
+                    return
+                for name, camera in self._cameras.items():
+                    if now - camera["started_at"] < self._restart_delay:
+                        continue
+                    if not camera["process"].is_alive():
+                        restarts.append((name, "processo terminou", camera["process"]))
+                    elif now - camera["last_progress"] > self._stall_timeout:
+                        restarts.append((name, "sem frames novos", camera["process"]))
+                    elif (camera["last_heartbeat"] and
+                          time.time() - camera["last_heartbeat"] > self._heartbeat_timeout):
+                        restarts.append((name, "sem heartbeat", camera["process"]))
+            for name, reason, process in restarts:
+                if self._stop_event.is_set():
+                    return
+                self._restart(name, reason, process)
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+
+from Classes.Encoders import quality_args
+
+# Nome do codec no ffprobe para cada encoder do ffmpeg (clipe já no codec do nível é ignorado)
+FFPROBE_CODEC_NAMES = {
+    "libx264": "h264",
+    "libx265": "hevc",
+    "libsvtav1": "av1",
+    "libvpx-vp9": "vp9",
+    "mpeg4": "mpeg4",
+}
+
+# Contêineres que aceitam os codecs do nível compacto; os demais viram .mp4
+REPLACE_IN_PLACE = ('.mp4', '.mkv', '.mov')
+
+
+def lower_priority(nice: int = 19, cores=None):
+    """
+    Inicializador dos processos de transcodificação: prioridade mínima de
+    CPU e, se informado, fixa o processo em alguns núcleos. Os processos do
+    ffmpeg herdam essas configurações.
+    """
+    try:
+        os.nice(nice)
+    except OSError:
+        pass
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cores))
+
+
+def _io_idle_prefix():
+    """Prefixo que roda o comando na classe de I/O 'idle' (só usa o disco quando ele está livre)."""
+    ionice = shutil.which("ionice")
+    return [ionice, "-c", "3"] if ionice else []
+
+
+def probe_clip(path: str, ffprobe_bin: str = "ffprobe"):
+    """Retorna (codec, duração em segundos) do primeiro stream de vídeo, ou (None, None)."""
+    cmd = [ffprobe_bin, "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "stream=codec_name:format=duration", "-of", "json", path]
+    try:
+        output = subprocess.run(cmd, capture_output=True, check=True, timeout=30).stdout
+        data = json.loads(output)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None, None
+    streams = data.get("streams") or [{}]
+    duration = data.get("format", {}).get("duration")
+    return streams[0].get("codec_name"), float(duration) if duration else None
+
+
+def transcode_clip(path: str, vcodec: str = "libx264", crf: int = 28, preset: str = "veryfast",
+                   threads: int = 1, ffmpeg_bin: str = "ffmpeg", ffprobe_bin: str = "ffprobe"):
+    """
+    Recodifica um clipe para um codec mais compacto e troca o arquivo de
+    forma atômica (os.replace): quem abrir o clipe vê o arquivo antigo ou o
+    novo completo, nunca um pela metade. Roda num processo do pool de
+    transcodificação.
+
+    O resultado só substitui o original se ficar menor. O arquivo novo tem
+    uma data de modificação nova (Last-Modified, ETag e o cache dos
+    clientes mudam junto com o conteúdo); o horário da gravação continua no
+    nome do clipe e no catálogo.
+
+    :return: Dicionário com path/new_path, status ('transcoded', 'skipped',
+             'not_smaller' ou 'failed'), bytes antes/depois, duração e tempo gasto.
+    """
+    started = time.perf_counter()
+    result = {"path": path, "new_path": path, "status": "skipped", "bytes_before": 0,
+              "bytes_after": 0, "duration_s": None, "elapsed_s": 0.0}
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        result["status"] = "failed"
+        return result
+    result["bytes_before"] = result["bytes_after"] = st.st_size
+
+    codec, duration = probe_clip(path, ffprobe_bin)
+    result["duration_s"] = duration
+    if codec is not None and codec == FFPROBE_CODEC_NAMES.get(vcodec, vcodec):
+        result["elapsed_s"] = time.perf_counter() - started
+        return result
+
+    stem, ext = os.path.splitext(path)
+    final_path = path if ext.lower() in REPLACE_IN_PLACE else stem + ".mp4"
+    final_ext = os.path.splitext(final_path)[1]
+    # Arquivo temporário oculto na mesma pasta (mesmo disco: os.replace é atômico)
+    directory, name = os.path.split(final_path)
+    tmp_path = os.path.join(directory, f".{name}.tmp{final_ext}")
+
+    cmd = _io_idle_prefix() + [
+        ffmpeg_bin, "-y", "-loglevel", "error", "-i", path,
+        "-map", "0:v:0", "-c:v", vcodec, "-threads", str(threads),
+    ]
+    cmd += quality_args(vcodec, preset, crf)
+    if vcodec in ("libx264", "libx265"):
+        cmd += ["-pix_fmt", "yuv420p"]
+    if final_ext.lower() in ('.mp4', '.mov'):
+        cmd += ["-movflags", "+faststart"]
+    cmd.append(tmp_path)
+
+    try:
+        subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+        new_size = os.path.getsize(tmp_path)
+        if new_size >= st.st_size:
+            os.remove(tmp_path)
+            result["status"] = "not_smaller"
+        else:
+            os.replace(tmp_path, final_path)
+            if final_path != path:
+                os.remove(path)
+            result.update(status="transcoded", new_path=final_path, bytes_after=new_size)
+    except (OSError, subprocess.SubprocessError) as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    result["elapsed_s"] = time.perf_counter() - started
+    return result
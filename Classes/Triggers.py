@@ -0,0 +1,422 @@
+"""
+Gatilhos de gravação: botão (GPIO), HTTP, teclado ou socket local, todos
+publicando no mesmo TriggerBus. O barramento descarta repetições
+(debounce), transforma cada gatilho numa janela [t - pre_roll, t + post_roll]
+e junta janelas sobrepostas num único clipe.
+"""
+import bisect
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from Classes.Log import get_logger
+
+log = get_logger("triggers")
+
+
+class LatencyHistogram:
+    """Histograma de latências em buckets fixos (segundos), com média e máximo."""
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._buckets) + 1)  # Último: acima do maior bucket
+        self._lock = threading.Lock()
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self._buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self):
+        """Contagem por bucket ('<=0.5': n, ..., '+inf': n), total, média e máximo."""
+        with self._lock:
+            buckets = {f"<={b:g}": n for b, n in zip(self._buckets, self._counts)}
+            buckets["+inf"] = self._counts[-1]
+            return {
+                "buckets": buckets,
+                "count": self._count,
+                "mean_s": self._sum / self._count if self._count else 0.0,
+                "max_s": self._max,
+            }
+
+
+class TriggerBus:
+    """
+    Recebe gatilhos de várias fontes e decide os clipes.
+
+    Cada gatilho pede a janela [t - pre_s, t + post_s]. O clipe só é pedido
+    quando a janela termina (depois do pós-roll). Um gatilho que chega
+    enquanto a janela anterior ainda está aberta a estende, em vez de gerar
+    outro clipe com os mesmos frames; quando a janela juntada passaria de
+    `max_window_s` (o tamanho do buffer), uma nova janela começa onde a
+    anterior termina.
+    """
+
+    def __init__(self, on_window, pre_s: float = 10.0, post_s: float = 5.0, debounce_s: float = 0.5,
+                 max_window_s: float = None, settle_s: float = 0.2):
+        """
+        :param on_window: Função chamada com a janela pronta ({'start', 'end', 'triggers'});
+                          pode retornar um Future do clipe para medir a latência.
+        :param pre_s: Segundos antes do gatilho incluídos no clipe.
+        :param post_s: Segundos depois do gatilho incluídos no clipe.
+        :param debounce_s: Gatilhos da mesma fonte mais próximos que isso são ignorados.
+        :param max_window_s: Duração máxima de um clipe (padrão: pre_s + post_s).
+        :param settle_s: Espera extra após o fim da janela para o último frame chegar ao buffer.
+        """
+        self._on_window = on_window
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self._debounce_s = debounce_s
+        self._max_window_s = max_window_s or (pre_s + post_s)
+        self._settle_s = settle_s
+
+        self._cond = threading.Condition()
+        self._windows = []          # Janelas abertas, em ordem
+        self._last_by_source = {}
+        self._last_end = None       # Fim do último clipe pedido (evita frames repetidos)
+        self._sources = []
+        self._closed = False
+        self._stats = {"received": 0, "debounced": 0, "merged": 0, "windows": 0, "failed": 0}
+
+        # Gatilho -> arquivo disponível (inclui o pós-roll) e fim da janela -> arquivo disponível
+        self.latency = LatencyHistogram()
+        self.finalize_latency = LatencyHistogram()
+
+        self._thread = threading.Thread(target=self._loop, name="TriggerBus", daemon=True)
+        self._thread.start()
+
+    # --- Fontes ---
+
+    def add_source(self, source):
+        """Registra e inicia uma fonte (GPIOSource, HTTPSource, KeyboardSource, SocketSource...)."""
+        source.start(self.emit)
+        self._sources.append(source)
+        return source
+
+    def emit(self, source: str = "manual", timestamp: float = None, pre_s: float = None, post_s: float = None):
+        """
+        Publica um gatilho. Pode ser chamado de qualquer thread.
+
+        :return: False se o gatilho foi descartado pelo debounce.
+        """
+        t = time.time() if timestamp is None else timestamp
+        pre_s = self.pre_s if pre_s is None else pre_s
+        post_s = self.post_s if post_s is None else post_s
+        with self._cond:
+            self._stats["received"] += 1
+            last = self._last_by_source.get(source)
+            if last is not None and t - last < self._debounce_s:
+                self._stats["debounced"] += 1
+                return False
+            self._last_by_source[source] = t
+
+            start, end = t - pre_s, t + post_s
+            if self._last_end is not None:
+                start = max(start, self._last_end)
+            if self._windows and start <= self._windows[-1]["end"]:
+                window = self._windows[-1]
+                if max(end, window["end"]) - window["start"] <= self._max_window_s:
+                    window["end"] = max(end, window["end"])
+                    window["triggers"].append((source, t))
+                    self._stats["merged"] += 1
+                    self._cond.notify()
+                    return True
+                # Janela cheia: a próxima começa onde esta termina
+                start = window["end"]
+            if end > start:
+                self._windows.append({"start": start, "end": end, "triggers": [(source, t)]})
+            else:
+                # Janela já coberta pelo último clipe pedido
+                self._stats["merged"] += 1
+            self._cond.notify()
+        return True
+
+    def stats(self):
+        """Contadores (recebidos, descartados, juntados, clipes) e histogramas de latência."""
+        with self._cond:
+            data = dict(self._stats)
+            data["open_windows"] = len(self._windows)
+        data["latency"] = self.latency.snapshot()
+        data["finalize_latency"] = self.finalize_latency.snapshot()
+        return data
+
+    def close(self, flush: bool = True):
+        """Para as fontes e o barramento; com flush=True pede já as janelas abertas."""
+        for source in self._sources:
+            source.stop()
+        with self._cond:
+            self._closed = True
+            if not flush:
+                self._windows.clear()
+            self._cond.notify()
+        self._thread.join()
+
+    # --- Thread interna ---
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._windows:
+                        wait = self._windows[0]["end"] + self._settle_s - time.time()
+                        if wait <= 0 or self._closed:
+                            window = self._windows.pop(0)
+                            self._last_end = window["end"]
+                            self._stats["windows"] += 1
+                            break
+                        self._cond.wait(wait)
+                    elif self._closed:
+                        return
+                    else:
+                        self._cond.wait()
+            self._dispatch(window)
+
+    def _dispatch(self, window):
+        ready_at = time.time()
+        try:
+            future = self._on_window(window)
+        except Exception as e:
+            log.error("Erro ao pedir clipe do gatilho: %s", e)
+            with self._cond:
+                self._stats["failed"] += 1
+            return
+        if future is None:
+            return
+
+        def record(done):
+            if done.exception() is not None:
+                with self._cond:
+                    self._stats["failed"] += 1
+                return
+            now = time.time()
+            self.finalize_latency.observe(now - ready_at)
+            for _, t in window["triggers"]:
+                self.latency.observe(now - t)
+
+        future.add_done_callback(record)
+
+
+# --- Fontes de gatilho ---
+
+class TriggerSource:
+    """Fonte de gatilhos: start(emit) começa a publicar, stop() encerra."""
+
+    name = "source"
+
+    def start(self, emit):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class GPIOSource(TriggerSource):
+    """
+    Botão ligado a um pino do Raspberry Pi (via daemon pigpiod). O filtro
+    de glitch do pigpio descarta ruídos do contato antes do debounce do
+    barramento; o horário do gatilho é o da borda, não o da chamada.
+    """
+
+    name = "gpio"
+
+    def __init__(self, pin: int, pull_up: bool = True, glitch_us: int = 5000, host: str = None):
+        """
+        :param pin: Pino BCM do botão.
+        :param pull_up: Botão ligado ao GND com pull-up interno (gatilho na borda de descida).
+        :param glitch_us: Duração mínima de um nível estável (filtro de ruído).
+        :param host: Host do pigpiod (None = local).
+        """
+        self._pin = pin
+        self._pull_up = pull_up
+        self._glitch_us = glitch_us
+        self._host = host
+        self._pi = None
+        self._callback = None
+
+    def start(self, emit):
+        try:
+            import pigpio
+        except ImportError:
+            raise RuntimeError("GPIOSource precisa do pacote pigpio (e do daemon pigpiod).")
+        self._pi = pigpio.pi(self._host) if self._host else pigpio.pi()
+        if not self._pi.connected:
+            raise RuntimeError("Não foi possível conectar ao pigpiod.")
+        self._pi.set_mode(self._pin, pigpio.INPUT)
+        self._pi.set_pull_up_down(self._pin, pigpio.PUD_UP if self._pull_up else pigpio.PUD_DOWN)
+        self._pi.set_glitch_filter(self._pin, self._glitch_us)
+        edge = pigpio.FALLING_EDGE if self._pull_up else pigpio.RISING_EDGE
+        # Converte o tick (µs) da borda para o relógio do sistema
+        offset = time.time() - self._pi.get_current_tick() / 1e6
+
+        def on_edge(gpio, level, tick):
+            emit(self.name, timestamp=offset + tick / 1e6)
+
+        self._callback = self._pi.callback(self._pin, edge, on_edge)
+
+    def stop(self):
+        if self._callback is not None:
+            self._callback.cancel()
+            self._callback = None
+        if self._pi is not None:
+            self._pi.stop()
+            self._pi = None
+
+
+class HTTPSource(TriggerSource):
+    """
+    Gatilho por HTTP: POST /trigger (opcional: ?pre=10&post=5). Responde
+    202 assim que o gatilho entra no barramento.
+    """
+
+    name = "http"
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8081, path: str = "/trigger"):
+        self._address = (host, port)
+        self._path = path
+        self._server = None
+        self._thread = None
+
+    def start(self, emit):
+        path = self._path
+        source_name = self.name
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != path:
+                    self.send_error(404)
+                    return
+                params = parse_qs(url.query)
+                try:
+                    pre = float(params["pre"][0]) if "pre" in params else None
+                    post = float(params["post"][0]) if "post" in params else None
+                except ValueError:
+                    self.send_error(400, "pre/post inválidos")
+                    return
+                accepted = emit(source_name, pre_s=pre, post_s=post)
+                body = json.dumps({"accepted": accepted}).encode()
+                self.send_response(202 if accepted else 429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Sem log por requisição
+
+        self._server = ThreadingHTTPServer(self._address, Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="HTTPSource", daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self):
+        return self._server.server_address[1] if self._server else self._address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+
+class KeyboardSource(TriggerSource):
+    """
+    Gatilho pelo terminal (modo headless): cada linha digitada com a tecla
+    configurada (ex: 'r' + Enter) gera um gatilho. No modo com janela, o
+    'r' do cv2.waitKey já publica no barramento.
+    """
+
+    name = "keyboard"
+
+    def __init__(self, key: str = "r", stream=None):
+        self._key = key
+        self._stream = stream or sys.stdin
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self, emit):
+        def read_loop():
+            for line in self._stream:
+                if self._stop_event.is_set():
+                    return
+                if line.strip() == self._key:
+                    emit(self.name)
+
+        self._thread = threading.Thread(target=read_loop, name="KeyboardSource", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # A leitura do terminal não pode ser interrompida: a thread termina na próxima linha
+        self._stop_event.set()
+
+
+class SocketSource(TriggerSource):
+    """
+    Gatilho por socket Unix (datagrama), útil para scripts locais e para
+    simular o botão sem hardware:
+
+        python -c "import socket; s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM); s.sendto(b'{}', '/tmp/sport_capture_trigger.sock')"
+
+    O datagrama pode trazer um JSON com 'pre', 'post' e 'timestamp' (números);
+    datagramas inválidos são ignorados, com um aviso no log.
+    """
+
+    name = "socket"
+
+    def __init__(self, path: str = "/tmp/sport_capture_trigger.sock"):
+        self._path = path
+        self._sock = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self, emit):
+        if os.path.exists(self._path):
+            os.remove(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._path)
+        self._sock.settimeout(0.5)
+
+        def recv_loop():
+            while not self._stop_event.is_set():
+                try:
+                    data = self._sock.recv(4096)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return
+                try:
+                    options = json.loads(data) if data.strip() else {}
+                    if not isinstance(options, dict):
+                        raise ValueError("o JSON deve ser um objeto")
+                    values = {key: float(options[key]) if options.get(key) is not None else None
+                              for key in ("timestamp", "pre", "post")}
+                except (ValueError, TypeError) as e:
+                    log.warning("Datagrama de gatilho inválido ignorado (%s): %r", e, data[:200])
+                    continue
+                emit(self.name, timestamp=values["timestamp"], pre_s=values["pre"], post_s=values["post"])
+
+        self._thread = threading.Thread(target=recv_loop, name="SocketSource", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if os.path.exists(self._path):
+            os.remove(self._path)
@@ -0,0 +1,30 @@
+# Executar a partir da raiz do projeto: python -m Exemplos.supervisor_quadras
+import os
+import time
+
+from Classes.Supervisor import RecorderSupervisor
+
+
+if __name__ == '__main__':
+    supervisor = RecorderSupervisor()
+    base = os.path.join(os.getcwd(), "Videos")
+
+    # 4 quadras com fontes sintéticas (sem câmera); em produção troque o
+    # 'source' pelo índice da câmera, URL ou arquivo
+    for n in range(1, 5):
+        supervisor.add_camera(
+            f"quadra{n}", 'mp4v', '.mp4', core=n % os.cpu_count(),
+            location=f"Quadra {n}", ip_address="127.0.0.1",
+            cam_height=480, cam_width=640,
+            path=os.path.join(base, f"quadra{n}") + "/",
+            source={"kind": "synthetic", "width": 640, "height": 480, "fps": 30},
+        )
+
+    supervisor.start()
+    time.sleep(20)
+
+    # Salva os últimos 15 s da quadra 3
+    supervisor.trigger("quadra3")
+    time.sleep(5)
+    print(supervisor.status())
+    supervisor.stop()
@@ -1,19 +1,18 @@
 import os
+import sys
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.ClipLayout import iter_clip_files
+
 def calcular_tamanho_medio(caminho_pasta):
     try:
-        # Lista todos os itens na pasta
-        itens = os.listdir(caminho_pasta)
-        # Filtra apenas arquivos (ignora subpastas)
-        arquivos = [f for f in itens if os.path.isfile(os.path.join(caminho_pasta, f))]
+        # Clipes soltos na pasta e nas partições por data (uma varredura, tamanho do scandir)
+        tamanhos = [tamanho for _, tamanho in iter_clip_files(caminho_pasta)]
         
-        if not arquivos:
+        if not tamanhos:
             return 0
         
-        # Obtém o tamanho de cada arquivo em bytes
-        tamanhos = [os.path.getsize(os.path.join(caminho_pasta, f)) for f in arquivos]
-        
         # Calcula a média (em Megabytes para facilitar a leitura)
         media_bytes = sum(tamanhos) / len(tamanhos)
         media_mb = media_bytes / (1024 * 1024)
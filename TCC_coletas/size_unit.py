@@ -1,12 +1,15 @@
 import os
+import sys
 import matplotlib.pyplot as plt
 import numpy as np
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.ClipLayout import iter_clip_files
+
 def obter_lista_tamanhos(caminho_pasta):
     try:
-        itens = os.listdir(caminho_pasta)
-        arquivos = [f for f in itens if os.path.isfile(os.path.join(caminho_pasta, f))]
-        return [os.path.getsize(os.path.join(caminho_pasta, f)) / (1024 * 1024) for f in arquivos]
+        # Clipes soltos na pasta e nas partições por data
+        return [tamanho / (1024 * 1024) for _, tamanho in iter_clip_files(caminho_pasta)]
     except Exception as e:
         print(f"Erro ao acessar {caminho_pasta}: {e}")
         return []
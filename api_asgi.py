@@ -0,0 +1,387 @@
+"""
+Modo assíncrono (ASGI) da API de vídeos, com o mesmo contrato do
+api_solver.py (/video/<filename>, /videos/list, /videos/extract e
+/videos/archive), para muitos acessos
+simultâneos (ex: fim de partida, todos baixando os clipes ao mesmo tempo).
+
+Como rodar (ver README):
+    nice -n 10 uvicorn api_asgi:app --host 0.0.0.0 --port 5000 --workers 4
+"""
+import asyncio
+import json
+import os
+import time
+from email.utils import formatdate
+from urllib.parse import parse_qsl
+
+from Classes.ClipExtractor import download_name, get_clip_extractor
+from Classes.ClipIndex import get_clip_index, parse_filter_timestamp
+from Classes.HttpFiles import (CACHE_CONTROL, CHUNK_SIZE, content_type, file_etag, is_not_modified,
+                               last_modified, parse_range, resolve_path)
+from Classes.Metrics import REGISTRY, PushedMetrics, render_families
+from Classes.StreamingArchive import StreamingArchive, archive_name, collect_clips
+
+# Mesmo diretório usado pelo api_solver.py
+VIDEO_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'Videos/')
+
+# Máximo de requisições atendidas ao mesmo tempo por worker; acima disso
+# a API responde 503 em vez de acumular conexões até travar
+MAX_CONNECTIONS = int(os.environ.get('API_MAX_CONNECTIONS', '200'))
+
+# Tamanho máximo (MB) do cache em disco dos trechos extraídos (/videos/extract)
+EXTRACT_CACHE_MB = float(os.environ.get('API_EXTRACT_CACHE_MB', '2048'))
+# Catálogo SQLite dos clipes (bdManager.ClipCatalog), opcional: horários exatos para o /videos/extract
+CATALOG_DB = os.environ.get('API_CATALOG_DB') or None
+
+_slots = None
+
+# Mesmas métricas do api_solver.py (cada worker tem as suas). Aqui a latência
+# inclui o envio do corpo da resposta.
+REQUEST_SECONDS = REGISTRY.histogram("sport_capture_http_request_seconds",
+                                     "Latência das requisições da API por rota (s).", ("route", "method", "status"))
+PUSHED_METRICS = PushedMetrics()
+
+
+async def app(scope, receive, send):
+    global _slots
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    if _slots is None:
+        _slots = asyncio.Semaphore(MAX_CONNECTIONS)
+    if _slots.locked():
+        await _send_json(send, 503, {"error": "Servidor ocupado, tente novamente."},
+                         extra_headers=[(b'retry-after', b'1')])
+        return
+
+    started = time.perf_counter()
+    status = {}
+
+    async def send_tracked(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+        await send(message)
+
+    async with _slots:
+        # scope['path'] já vem decodificado pelo servidor (não decodificar de novo: '%25' -> '%')
+        path = scope['path']
+        method = scope['method']
+        if path.startswith('/video/') and method in ('GET', 'HEAD'):
+            route = '/video/<path:filename>'
+            await get_video(scope, send_tracked, path[len('/video/'):])
+        elif path == '/videos/list' and method == 'GET':
+            route = '/videos/list'
+            await list_videos(receive, send_tracked)
+        elif path == '/videos/extract' and method in ('GET', 'HEAD'):
+            route = '/videos/extract'
+            await extract_video(scope, receive, send_tracked)
+        elif path == '/videos/archive' and method in ('GET', 'HEAD', 'POST'):
+            route = '/videos/archive'
+            await archive_videos(scope, receive, send_tracked)
+        elif path == '/metrics' and method == 'GET':
+            route = '/metrics'
+            await get_metrics(send_tracked)
+        elif path.startswith('/metrics/push/') and method in ('PUT', 'POST'):
+            route = '/metrics/push/<job>'
+            await push_metrics(receive, send_tracked, path[len('/metrics/push/'):])
+        else:
+            route = '<sem rota>'
+            await _send_json(send_tracked, 404, {"error": "Rota não encontrada."})
+    REQUEST_SECONDS.labels(route, method, status.get('code', 0)).observe(time.perf_counter() - started)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Carrega o índice de clipes fora do event loop
+            if os.path.isdir(VIDEO_DIR):
+                await asyncio.to_thread(get_clip_index, VIDEO_DIR)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+# --- Rotas ---
+
+async def get_video(scope, send, filename):
+    """Serve um vídeo com suporte a Range, ETag e 304, em blocos limitados."""
+    path = resolve_path(VIDEO_DIR, filename)
+    if path is None:
+        await _send_json(send, 404, {"error": "Arquivo não encontrado."})
+        return
+    await _send_file(scope, send, path)
+
+
+async def _send_file(scope, send, path, extra_headers=()):
+    """Envia um arquivo com Range, ETag/304 e envio sem cópia quando disponível."""
+    try:
+        # open/stat podem bloquear (cartão SD): rodam numa thread
+        f = await asyncio.to_thread(open, path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
+        await _send_json(send, 404, {"error": "Arquivo não encontrado."})
+        return
+
+    try:
+        st = await asyncio.to_thread(os.fstat, f.fileno())
+        request_headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+        etag = file_etag(st)
+        headers = [
+            (b'etag', etag.encode()),
+            (b'last-modified', last_modified(st).encode()),
+            (b'cache-control', CACHE_CONTROL.encode()),
+            (b'accept-ranges', b'bytes'),
+        ]
+        overridden = {name for name, _ in extra_headers}
+        headers = [header for header in headers if header[0] not in overridden]
+        headers.extend(extra_headers)
+
+        if is_not_modified(st, etag, request_headers.get('if-none-match'),
+                           request_headers.get('if-modified-since')):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        byte_range = parse_range(request_headers.get('range'), st.st_size,
+                                 etag, request_headers.get('if-range'))
+        if byte_range is False:
+            headers.append((b'content-range', f'bytes */{st.st_size}'.encode()))
+            await send({'type': 'http.response.start', 'status': 416, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if byte_range is None:
+            start, end, status = 0, st.st_size, 200
+        else:
+            start, end = byte_range
+            status = 206
+            headers.append((b'content-range', f'bytes {start}-{end - 1}/{st.st_size}'.encode()))
+        length = end - start
+        headers.append((b'content-length', str(length).encode()))
+        headers.append((b'content-type', content_type(path).encode()))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        if 'http.response.zerocopysend' in scope.get('extensions', {}):
+            # Servidor com envio sem cópia (sendfile) disponível. A extensão
+            # recebe o objeto de arquivo; ele só é fechado (finally) depois
+            # que o send terminar de enviar os bytes
+            await send({'type': 'http.response.zerocopysend', 'file': f,
+                        'offset': start, 'count': length, 'more_body': False})
+            return
+
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            # Leitura em blocos limitados, fora do event loop: a memória por
+            # conexão fica constante e clientes lentos não travam os demais
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+        if remaining > 0:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def list_videos(receive, send):
+    """Mesmo contrato do /videos/list do api_solver.py (JSON opcional com start/end)."""
+    body = await _read_body(receive)
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+
+    try:
+        start_filter = parse_filter_timestamp(data.get('start'))
+        end_filter = parse_filter_timestamp(data.get('end'))
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+
+    if not await asyncio.to_thread(os.path.isdir, VIDEO_DIR):
+        await _send_json(send, 404, {"error": "Diretório 'Videos' não encontrado."})
+        return
+
+    try:
+        # Consulta ao índice fora do event loop
+        filtered_files = await asyncio.to_thread(
+            lambda: get_clip_index(VIDEO_DIR).range(start_filter, end_filter)
+        )
+    except Exception as e:
+        await _send_json(send, 500, {"error": str(e)})
+        return
+    await _send_json(send, 200, {"total_videos": len(filtered_files), "videos": filtered_files})
+
+
+async def extract_video(scope, receive, send):
+    """Mesmo contrato do /videos/extract do api_solver.py (query string ou JSON com start/end/location)."""
+    body = await _read_body(receive)
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    data.update(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+
+    try:
+        start = parse_filter_timestamp(data.get('start'))
+        end = parse_filter_timestamp(data.get('end'))
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    if start is None or end is None:
+        await _send_json(send, 400, {"error": "Informe o início (start) e o fim (end) do trecho."})
+        return
+    location = data.get('location') or None
+
+    try:
+        # Busca no índice, ffprobe e remux rodam fora do event loop
+        extractor = await asyncio.to_thread(get_clip_extractor, VIDEO_DIR, cache_mb=EXTRACT_CACHE_MB,
+                                              catalog=CATALOG_DB)
+        path, hit = await asyncio.to_thread(extractor.extract, start, end, location)
+    except LookupError as e:
+        await _send_json(send, 404, {"error": str(e)})
+        return
+    except ValueError as e:
+        await _send_json(send, 422, {"error": str(e)})
+        return
+    except RuntimeError as e:
+        await _send_json(send, 500, {"error": str(e)})
+        return
+    name = download_name(start, location, os.path.splitext(path)[1])
+    await _send_file(scope, send, path, extra_headers=[
+        (b'x-extract-cache', b'hit' if hit else b'miss'),
+        (b'content-disposition', f'inline; filename="{name}"'.encode()),
+        (b'cache-control', b'no-cache'),
+    ])
+
+
+async def archive_videos(scope, receive, send):
+    """Mesmo contrato do /videos/archive do api_solver.py (zip/tar montado durante o envio)."""
+    body = await _read_body(receive)
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    data.update(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    names = data.get('clips')
+    if isinstance(names, str):
+        names = [name for name in names.split(',') if name]
+    try:
+        start = parse_filter_timestamp(data.get('start'))
+        end = parse_filter_timestamp(data.get('end'))
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    if names is None and start is None and end is None:
+        await _send_json(send, 400, {"error": "Informe os clipes (clips) ou o intervalo (start/end)."})
+        return
+    location = data.get('location') or None
+    fmt = data.get('format', 'zip')
+
+    try:
+        # Índice e stat de cada clipe fora do event loop
+        archive = await asyncio.to_thread(
+            lambda: StreamingArchive(collect_clips(VIDEO_DIR, start, end, location, names), fmt)
+        )
+    except (LookupError, FileNotFoundError) as e:
+        await _send_json(send, 404, {"error": str(e)})
+        return
+    except ValueError as e:
+        await _send_json(send, 400, {"error": str(e)})
+        return
+    if not len(archive):
+        await _send_json(send, 404, {"error": "Nenhum clipe no intervalo pedido."})
+        return
+
+    request_headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+    etag = archive.etag
+    headers = [
+        (b'etag', etag.encode()),
+        (b'last-modified', formatdate(archive.last_modified, usegmt=True).encode()),
+        (b'accept-ranges', b'bytes'),
+        (b'cache-control', b'no-cache'),
+        (b'content-disposition', f'attachment; filename="{archive_name(fmt, start, location)}"'.encode()),
+        (b'content-type', archive.content_type.encode()),
+    ]
+    byte_range = parse_range(request_headers.get('range'), archive.size, etag, request_headers.get('if-range'))
+    if byte_range is False:
+        headers.append((b'content-range', f'bytes */{archive.size}'.encode()))
+        await send({'type': 'http.response.start', 'status': 416, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    if byte_range is None:
+        first, last, status = 0, archive.size, 200
+    else:
+        first, last = byte_range
+        status = 206
+        headers.append((b'content-range', f'bytes {first}-{last - 1}/{archive.size}'.encode()))
+    headers.append((b'content-length', str(last - first).encode()))
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    if scope['method'] == 'HEAD':
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    chunks = archive.iter_bytes(first, last)
+    while True:
+        # Leitura dos clipes (e CRCs da retomada) fora do event loop, um bloco por vez
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def get_metrics(send):
+    """Métricas deste worker e as recebidas dos Recorders, no formato do Prometheus."""
+    body = render_families(REGISTRY.collect() + PUSHED_METRICS.collect()).encode()
+    headers = [(b'content-type', b'text/plain; version=0.0.4'), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def push_metrics(receive, send, job):
+    """Recebe as métricas de um Recorder (JSON de MetricsRegistry.collect())."""
+    try:
+        families = json.loads(await _read_body(receive))
+    except ValueError:
+        families = None
+    if not isinstance(families, list) or not all(isinstance(f, dict) and "name" in f for f in families):
+        await _send_json(send, 400, {"error": "Esperada a lista de métricas de MetricsRegistry.collect()."})
+        return
+    PUSHED_METRICS.push(job, families)
+    await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return body
+
+
+async def _send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload).encode()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    headers.extend(extra_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
@@ -1,5 +1,14 @@
 import os
-from flask import Flask, send_from_directory, abort, request, jsonify
+import time
+from email.utils import formatdate
+from flask import Flask, Response, abort, g, request, jsonify, send_from_directory
+from Classes.ClipExtractor import download_name, get_clip_extractor
+from Classes.ClipIndex import get_clip_index, parse_filter_timestamp
+from Classes.HttpFiles import (CACHE_CONTROL, CHUNK_SIZE, content_type, file_etag, is_not_modified,
+                               iter_file, last_modified, parse_range, resolve_path)
+from Classes.LiveStream import DEFAULT_LIVE_DIR, PLAYLIST_NAME
+from Classes.StreamingArchive import StreamingArchive, archive_name, collect_clips
+from Classes.Metrics import REGISTRY, PushedMetrics, render_families
 
 # Cria a aplicação Flask
 app = Flask(__name__)
@@ -8,39 +17,113 @@ app = Flask(__name__)
 # Removi a barra final de 'Videos/' pois o os.path.join lida com isso.
 VIDEO_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'Videos/')
 
+# Tamanho máximo (MB) do cache em disco dos trechos extraídos (/videos/extract)
+EXTRACT_CACHE_MB = float(os.environ.get('API_EXTRACT_CACHE_MB', '2048'))
+# Catálogo SQLite dos clipes (bdManager.ClipCatalog), opcional: horários exatos para o /videos/extract
+CATALOG_DB = os.environ.get('API_CATALOG_DB') or None
+
+# Latência por rota, até o início da resposta (o envio do vídeo fica de fora)
+REQUEST_SECONDS = REGISTRY.histogram("sport_capture_http_request_seconds",
+                                     "Latência das requisições da API por rota (s).", ("route", "method", "status"))
+# Métricas enviadas pelos processos dos Recorders (MetricsPusher)
+PUSHED_METRICS = PushedMetrics()
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else '<sem rota>'
+        REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(time.perf_counter() - started)
+    return response
+
 @app.route('/video/<path:filename>')
 def get_video(filename):
     """
     Esta rota serve um arquivo de vídeo do diretório VIDEO_DIR.
+
+    Suporta pedidos parciais (Range -> 206), usados pelos players ao
+    avançar/voltar o vídeo, e GET condicional (ETag/Last-Modified -> 304).
+    Quando o servidor WSGI oferece wsgi.file_wrapper (gunicorn, uWSGI) o
+    arquivo é enviado pelo kernel com sendfile, sem passar pelo Python.
     """
+    # Impede acesso fora da pasta de vídeos (ex: '../')
+    path = resolve_path(VIDEO_DIR, filename)
+    if path is None:
+        abort(404)
+    return _send_file(path)
+
+def _send_file(path, extra_headers=None):
+    """Resposta de um arquivo com Range, ETag/304 e sendfile (ver get_video)."""
     try:
-        # send_from_directory lida com a segurança de caminhos
-        # e também define o mimetype (tipo de conteúdo) correto.
-        
-        # Corrigi o print para mostrar o caminho de forma mais clara
-        print(f"Tentando servir: {os.path.join(VIDEO_DIR, filename)}")
-        
-        return send_from_directory(
-            VIDEO_DIR,
-            filename,
-            as_attachment=False  # Define como False para o navegador tentar tocar o vídeo
-        )
-    except FileNotFoundError:
+        f = open(path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
         # Retorna um erro 404 se o arquivo não for encontrado
         abort(404)
 
+    st = os.fstat(f.fileno())
+    etag = file_etag(st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': last_modified(st),
+        'Cache-Control': CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+    headers.update(extra_headers or {})
+
+    if is_not_modified(st, etag, request.headers.get('If-None-Match'),
+                       request.headers.get('If-Modified-Since')):
+        f.close()
+        return Response(status=304, headers=headers)
+
+    byte_range = parse_range(request.headers.get('Range'), st.st_size,
+                             etag, request.headers.get('If-Range'))
+    if byte_range is False:
+        f.close()
+        headers['Content-Range'] = f'bytes */{st.st_size}'
+        return Response(status=416, headers=headers)
+
+    if byte_range is None:
+        start, end, status = 0, st.st_size, 200
+    else:
+        start, end = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{st.st_size}'
+    length = end - start
+    headers['Content-Length'] = str(length)
+
+    if request.method == 'HEAD':
+        f.close()
+        body = []
+    elif 'wsgi.file_wrapper' in request.environ:
+        # O servidor usa a posição atual do arquivo e o Content-Length
+        # para chamar sendfile (cópia feita pelo kernel)
+        f.seek(start)
+        body = request.environ['wsgi.file_wrapper'](f, CHUNK_SIZE)
+    else:
+        body = iter_file(f, start, length)
+
+    response = Response(body, status=status, headers=headers, mimetype=content_type(path))
+    # Impede que o Flask/Werkzeug reprocessem o corpo
+    response.direct_passthrough = True
+    return response
+
 # --- NOVO ENDPOINT ---
 @app.route('/videos/list', methods=['GET']) # Alterado para aceitar POST
 def list_videos():
     """
     Lista os arquivos de vídeo que estão dentro de um intervalo de tempo,
-    usando o nome do arquivo como registro.
+    usando o horário de início lido do nome do arquivo.
     
     Espera um JSON no body do request (opcional):
     {
         "start": "2024-11-09_10-00",
         "end": "2024-11-09_12-00"
     }
+    As datas também podem vir em ISO 8601 (ex: "2024-11-09T10:00:00").
     """
     
     # 1. Pega os dados do JSON body
@@ -48,49 +131,170 @@ def list_videos():
     # data será um dicionário vazio ({}).
     data = request.get_json(silent=True) or {}
     
-    start_filter = data.get('start')
-    end_filter = data.get('end')
-    
-    print(f"Buscando arquivos. Início: {start_filter}, Fim: {end_filter}")
-    
-    filtered_files = []
+    try:
+        start_filter = parse_filter_timestamp(data.get('start'))
+        end_filter = parse_filter_timestamp(data.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
+    if not os.path.isdir(VIDEO_DIR):
+        return jsonify({"error": "Diretório 'Videos' não encontrado."}), 404
+
     try:
-        # 2. Lista todos os arquivos no diretório de vídeos
-        print(VIDEO_DIR)
-        all_files = os.listdir(VIDEO_DIR)
-        
-        for filename in all_files:
-            # Garante que estamos olhando apenas para arquivos (ignora pastas)
-            if not os.path.isfile(os.path.join(VIDEO_DIR, filename)):
-                continue
-            
-            print(f"Verificando arquivo: {filename}")
-            # 3. Aplica os filtros (usa comparação de string simples)
-            
-            # Se 'start' foi fornecido e o arquivo for "menor" (alfabeticamente), pule.
-            if start_filter and filename < start_filter:
-                continue
-            
-            # Se 'end' foi fornecido e o arquivo for "maior" (alfabeticamente), pule.
-            if end_filter and filename > end_filter:
-                continue
-                
-            # 4. Se passou nos filtros, adicione à lista
-            filtered_files.append(filename)
-            num_videos = len(filtered_files)
-            print(f"Arquivo adicionado: {filename}. Total até agora: {num_videos}")
-            
-        # 5. Retorna a lista filtrada e ordenada como JSON
-        filtered_files.sort()
-        return jsonify({"total_videos": num_videos, "videos": filtered_files} )
+        # 2. Consulta o índice em memória (busca binária, já em ordem cronológica).
+        # O índice é mantido pelas notificações do sistema de arquivos, sem
+        # listar a pasta a cada requisição.
+        filtered_files = get_clip_index(VIDEO_DIR).range(start_filter, end_filter)
+        return jsonify({"total_videos": len(filtered_files), "videos": filtered_files})
         
-    except FileNotFoundError:
-        return jsonify({"error": "Diretório 'Videos' não encontrado."}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 # --- FIM DO NOVO ENDPOINT ---
 
+@app.route('/videos/extract', methods=['GET'])
+def extract_video():
+    """
+    Trecho de um horário (ex: o lance das 19:42:10 às 19:42:40) montado a
+    partir dos clipes que cobrem o intervalo, cortados nos keyframes e sem
+    recodificar. Trechos já extraídos vêm do cache em disco
+    (cabeçalho X-Extract-Cache: hit/miss).
+
+    Parâmetros na query string ou num JSON no body:
+    {
+        "start": "2024-11-09T19:42:10",
+        "end": "2024-11-09T19:42:40",
+        "location": "Quadra 1"
+    }
+    """
+    data = dict(request.get_json(silent=True) or {})
+    data.update(request.args.to_dict())
+    try:
+        start = parse_filter_timestamp(data.get('start'))
+        end = parse_filter_timestamp(data.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start is None or end is None:
+        return jsonify({"error": "Informe o início (start) e o fim (end) do trecho."}), 400
+    location = data.get('location') or None
+
+    extractor = get_clip_extractor(VIDEO_DIR, cache_mb=EXTRACT_CACHE_MB, catalog=CATALOG_DB)
+    try:
+        path, hit = extractor.extract(start, end, location)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+    name = download_name(start, location, os.path.splitext(path)[1])
+    return _send_file(path, {
+        'X-Extract-Cache': 'hit' if hit else 'miss',
+        'Content-Disposition': f'inline; filename="{name}"',
+        # O mesmo intervalo pode ganhar clipes novos: o navegador revalida pelo ETag
+        'Cache-Control': 'no-cache',
+    })
+
+@app.route('/videos/archive', methods=['GET', 'POST'])
+def archive_videos():
+    """
+    Baixa vários clipes num único zip ou tar, montado durante o envio (sem
+    compressão: os vídeos já são comprimidos; sem arquivos temporários e
+    com memória constante). O tamanho total é conhecido de antemão, então
+    a resposta aceita Range e o download pode ser retomado.
+
+    Parâmetros na query string ou num JSON no body:
+    {
+        "start": "2024-11-09T10:00:00",
+        "end": "2024-11-09T18:00:00",
+        "location": "Quadra 1",
+        "format": "zip"
+    }
+    ou uma lista de clipes (nomes de /videos/list): {"clips": [...], "format": "tar"}
+    (na query string: clips=nome1,nome2).
+    """
+    data = dict(request.get_json(silent=True) or {})
+    data.update(request.args.to_dict())
+    names = data.get('clips')
+    if isinstance(names, str):
+        names = [name for name in names.split(',') if name]
+    try:
+        start = parse_filter_timestamp(data.get('start'))
+        end = parse_filter_timestamp(data.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if names is None and start is None and end is None:
+        return jsonify({"error": "Informe os clipes (clips) ou o intervalo (start/end)."}), 400
+    location = data.get('location') or None
+    fmt = data.get('format', 'zip')
+
+    try:
+        archive = StreamingArchive(collect_clips(VIDEO_DIR, start, end, location, names), fmt)
+    except (LookupError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not len(archive):
+        return jsonify({"error": "Nenhum clipe no intervalo pedido."}), 404
+
+    etag = archive.etag
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(archive.last_modified, usegmt=True),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache',
+        'Content-Disposition': f'attachment; filename="{archive_name(fmt, start, location)}"',
+    }
+    # If-Range com o ETag: se algum clipe mudou, a retomada recebe o arquivo inteiro
+    byte_range = parse_range(request.headers.get('Range'), archive.size,
+                             etag, request.headers.get('If-Range'))
+    if byte_range is False:
+        headers['Content-Range'] = f'bytes */{archive.size}'
+        return Response(status=416, headers=headers)
+    if byte_range is None:
+        first, last, status = 0, archive.size, 200
+    else:
+        first, last = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {first}-{last - 1}/{archive.size}'
+    headers['Content-Length'] = str(last - first)
+
+    body = [] if request.method == 'HEAD' else archive.iter_bytes(first, last)
+    response = Response(body, status=status, headers=headers, mimetype=archive.content_type)
+    response.direct_passthrough = True
+    return response
+
+@app.route('/live/<name>/<path:filename>')
+def get_live(name, filename):
+    """
+    Serve a transmissão HLS ao vivo gerada pelo Recorder
+    (ex: /live/quadra_3/index.m3u8). Os segmentos são codificados uma única
+    vez e compartilhados por todos os espectadores.
+    """
+    directory = resolve_path(DEFAULT_LIVE_DIR, name)
+    if directory is None or not os.path.isdir(directory):
+        abort(404)
+    # A playlist muda a cada segmento: não pode ficar em cache
+    max_age = 0 if filename == PLAYLIST_NAME else 60
+    response = send_from_directory(directory, filename, max_age=max_age)
+    if max_age == 0:
+        response.headers['Cache-Control'] = 'no-cache, no-store'
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    """Métricas deste processo e as recebidas dos Recorders, no formato do Prometheus."""
+    text = render_families(REGISTRY.collect() + PUSHED_METRICS.collect())
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/push/<job>', methods=['PUT', 'POST'])
+def push_metrics(job):
+    """Recebe as métricas de um Recorder (JSON de MetricsRegistry.collect())."""
+    families = request.get_json(silent=True)
+    if not isinstance(families, list) or not all(isinstance(f, dict) and "name" in f for f in families):
+        return jsonify({"error": "Esperada a lista de métricas de MetricsRegistry.collect()."}), 400
+    PUSHED_METRICS.push(job, families)
+    return Response(status=204)
+
 if __name__ == '__main__':
     # Roda a aplicação
     # host='0.0.0.0' torna o servidor acessível na sua rede local
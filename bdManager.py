@@ -0,0 +1,242 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ClipCatalog:
+    """
+    Catálogo dos clipes gravados em SQLite. Substitui as varreduras de
+    diretório (os.listdir + stat por arquivo) por consultas em índices:
+    listagem por intervalo de tempo, retenção e soma de tamanhos.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS clips (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            location    TEXT NOT NULL,
+            camera      TEXT,
+            start_time  REAL NOT NULL,
+            end_time    REAL NOT NULL,
+            duration    REAL NOT NULL,
+            codec       TEXT,
+            container   TEXT,
+            size_bytes  INTEGER NOT NULL DEFAULT 0,
+            path        TEXT NOT NULL UNIQUE,
+            created_at  REAL NOT NULL,
+            deleted_at  REAL,
+            fps         REAL,
+            width       INTEGER,
+            height      INTEGER,
+            degradation TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_clips_start ON clips (start_time);
+        CREATE INDEX IF NOT EXISTS idx_clips_location_start ON clips (location, start_time);
+        CREATE INDEX IF NOT EXISTS idx_clips_codec ON clips (codec);
+    """
+
+    COLUMNS = ("id", "location", "camera", "start_time", "end_time", "duration",
+               "codec", "container", "size_bytes", "path", "created_at", "deleted_at",
+               "fps", "width", "height", "degradation")
+
+    # Colunas adicionadas depois da primeira versão (migradas com ALTER TABLE)
+    MIGRATIONS = (("fps", "REAL"), ("width", "INTEGER"), ("height", "INTEGER"), ("degradation", "TEXT"))
+
+    def __init__(self, db_path: str, batch_size: int = 16, max_delay_s: float = 5.0):
+        """
+        Abre (ou cria) o catálogo.
+
+        :param db_path: Caminho do arquivo SQLite.
+        :param batch_size: Inserções acumuladas antes de gravar em uma única transação.
+        :param max_delay_s: Tempo máximo que uma inserção fica pendente (um timer grava o lote
+                            mesmo que nenhum outro clipe chegue).
+        """
+        self._db_path = db_path
+        self._batch_size = batch_size
+        self._max_delay_s = max_delay_s
+        self._pending = []
+        self._pending_since = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+        # Uma conexão compartilhada entre as threads, protegida pelo lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Adiciona as colunas que faltam em catálogos criados por versões anteriores."""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(clips)")}
+        for column, kind in self.MIGRATIONS:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE clips ADD COLUMN {column} {kind}")
+
+    # --- Escrita ---
+
+    def add_clip(self, path: str, location: str, start_time: float, end_time: float,
+                 codec: str = None, container: str = None, size_bytes: int = None, camera: str = None,
+                 fps: float = None, width: int = None, height: int = None, degradation: dict = None):
+        """
+        Registra um clipe (a gravação no banco é feita em lotes).
+        fps/width/height são os valores gravados no arquivo e `degradation`
+        o nível de degradação adaptativa usado (ver Classes/Degradation.py).
+        """
+        if container is None:
+            container = os.path.splitext(path)[1]
+        if size_bytes is None:
+            size_bytes = os.path.getsize(path)
+        row = (location, camera, start_time, end_time, max(0.0, end_time - start_time),
+               codec, container, size_bytes, os.path.abspath(path), time.time(),
+               fps, width, height, json.dumps(degradation) if degradation is not None else None)
+        with self._lock:
+            self._pending.append(row)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+                # O último clipe de uma sequência também fica visível (API, daemon) em até max_delay_s
+                self._timer = threading.Timer(self._max_delay_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            if (len(self._pending) >= self._batch_size or
+                    time.monotonic() - self._pending_since >= self._max_delay_s):
+                self._flush_locked()
+
+    def add_exported_clip(self, clip: dict, location: str, camera: str = None):
+        """Registra um clipe a partir do dicionário retornado pela exportação do Recorder."""
+        width, height = clip.get("size") or (None, None)
+        self.add_clip(clip["path"], location, clip["start_time"], clip["end_time"],
+                      codec=clip.get("codec"), camera=camera, fps=clip.get("fps"),
+                      width=width, height=height, degradation=clip.get("degradation"))
+
+    def flush(self):
+        """Grava as inserções pendentes."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO clips (location, camera, start_time, end_time, duration, "
+                "codec, container, size_bytes, path, created_at, fps, width, height, degradation) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+        self._pending_since = None
+
+    def mark_deleted(self, paths):
+        """Marca os clipes como apagados (aceita um caminho ou uma lista)."""
+        if isinstance(paths, str):
+            paths = [paths]
+        now = time.time()
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE clips SET deleted_at = ? WHERE path = ? AND deleted_at IS NULL",
+                    [(now, os.path.abspath(p)) for p in paths],
+                )
+
+    def update_paths(self, pairs):
+        """Atualiza o caminho de clipes movidos: pairs = [(caminho_antigo, caminho_novo)]."""
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE clips SET path = ? WHERE path = ?",
+                    [(os.path.abspath(new), os.path.abspath(old)) for old, new in pairs],
+                )
+
+    def update_clip(self, path: str, new_path: str = None, codec: str = None, size_bytes: int = None):
+        """Atualiza um clipe recodificado (novo caminho, codec e tamanho)."""
+        new_path = os.path.abspath(new_path or path)
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE clips SET path = ?, codec = COALESCE(?, codec), size_bytes = COALESCE(?, size_bytes), "
+                    "container = ? WHERE path = ?",
+                    (new_path, codec, size_bytes, os.path.splitext(new_path)[1], os.path.abspath(path)),
+                )
+
+    # --- Consultas ---
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            self._flush_locked()
+            cursor = self._conn.execute(sql, params)
+            return [dict(zip(self.COLUMNS, row)) for row in cursor.fetchall()]
+
+    def list_clips(self, start: float = None, end: float = None, location: str = None,
+                   codec: str = None, include_deleted: bool = False, limit: int = None):
+        """
+        Lista os clipes que começaram no intervalo [start, end], em ordem
+        cronológica. Usa os índices de start_time/location.
+        """
+        where, params = self._filters(start, end, location, codec, include_deleted)
+        sql = f"SELECT {', '.join(self.COLUMNS)} FROM clips {where} ORDER BY start_time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._query(sql, params)
+
+    def oldest_clips(self, limit: int = 100, location: str = None):
+        """Retorna os clipes não apagados mais antigos (candidatos à exclusão)."""
+        return self.list_clips(location=location, limit=limit)
+
+    def clips_before(self, cutoff: float, location: str = None):
+        """Clipes não apagados que começaram antes de `cutoff` (política de retenção)."""
+        return self.list_clips(end=cutoff, location=location)
+
+    def total_size(self, location: str = None, codec: str = None):
+        """Soma dos tamanhos (bytes) e quantidade de clipes não apagados."""
+        where, params = self._filters(None, None, location, codec, False)
+        with self._lock:
+            self._flush_locked()
+            count, total = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM clips {where}", params,
+            ).fetchone()
+        return {"count": count, "size_bytes": total}
+
+    def size_by_codec(self):
+        """Quantidade, tamanho total e médio dos clipes por codec."""
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT codec, COUNT(*), SUM(size_bytes), AVG(size_bytes) FROM clips "
+                "WHERE deleted_at IS NULL GROUP BY codec"
+            ).fetchall()
+        return {codec: {"count": n, "size_bytes": total, "avg_bytes": avg} for codec, n, total, avg in rows}
+
+    @staticmethod
+    def _filters(start, end, location, codec, include_deleted):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("start_time >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("start_time <= ?")
+            params.append(end)
+        if location is not None:
+            clauses.append("location = ?")
+            params.append(location)
+        if codec is not None:
+            clauses.append("codec = ?")
+            params.append(codec)
+        if not include_deleted:
+            clauses.append("deleted_at IS NULL")
+        where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
@@ -0,0 +1,69 @@
+"""
+Mede o custo por frame do ActivityDetector (meta: < 2 ms a 640x480 num Pi 4)
+e confere a histerese com uma cena parada seguida de movimento.
+
+Uso:
+    python testes/bench_activity.py --width 640 --height 480 --frames 900
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.ActivityDetector import ActivityDetector
+from Classes.FrameSources import SyntheticSource
+
+
+def run(method, args):
+    detector = ActivityDetector((args.width, args.height), args.fps, width=args.analysis_width,
+                                method=method, stride=args.stride)
+    source = SyntheticSource(args.width, args.height, args.fps, realtime=False)
+    frame = np.empty((args.height, args.width, 3), dtype=np.uint8)
+    _, still = source.read(frame)
+    still = still.copy()
+
+    events = []
+    started = time.perf_counter()
+    for i in range(args.frames):
+        # Quadra vazia (frame parado) no primeiro e no último terço; movimento no meio
+        if i < args.frames // 3 or i >= 2 * args.frames // 3:
+            current = still
+        else:
+            _, current = source.read(frame)
+        event = detector.process(current)
+        if event is not None:
+            events.append((i, event))
+    elapsed = time.perf_counter() - started
+
+    result = detector.stats()
+    result.update(method=method, frames=args.frames, events=events,
+                  wall_ms_per_frame=elapsed * 1000 / args.frames)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--analysis-width", type=int, default=160)
+    parser.add_argument("--stride", type=int, default=2)
+    parser.add_argument("--output", help="Arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    results = [run(method, args) for method in (ActivityDetector.METHOD_DIFF, ActivityDetector.METHOD_BACKGROUND)]
+    for r in results:
+        print(f"{r['method']:>10}: {r['cost_ms_mean']:.3f} ms/frame (máx {r['cost_ms_max']:.3f} ms, "
+              f"{r['over_budget']} acima de {r['budget_ms']} ms) | eventos: {r['events']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
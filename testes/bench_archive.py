@@ -0,0 +1,139 @@
+"""
+Compara o download em lote (/videos/archive, zip e tar montados durante o
+envio) com o download sequencial dos mesmos clipes, um /video/<nome> por
+vez. Mede tempo, vazão e CPU do servidor; com --check-resume interrompe o
+arquivo no meio, retoma com Range/If-Range e confere o SHA-1 do resultado.
+
+Uso: rode o servidor e informe o intervalo dos clipes:
+    gunicorn -w 1 -b 0.0.0.0:5000 api_solver:app &
+    python testes/bench_archive.py --api http://localhost:5000 --start 2024-11-09T10:00:00 \\
+        --end 2024-11-09T18:00:00 --location "Quadra 1" --pid $! --check-resume
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from bench_video_api import process_cpu_seconds
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.ClipLayout import location_slug
+
+CHUNK = 256 * 1024
+
+
+def download(url, data=None, headers=None, limit=None):
+    """Baixa a URL sem guardar o corpo: retorna (bytes recebidos, SHA-1, cabeçalhos)."""
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    digest = hashlib.sha1()
+    received = 0
+    with urllib.request.urlopen(request) as response:
+        while limit is None or received < limit:
+            chunk = response.read(CHUNK if limit is None else min(CHUNK, limit - received))
+            if not chunk:
+                break
+            digest.update(chunk)
+            received += len(chunk)
+        return received, digest, response.headers
+
+
+def list_clips(api, start, end, location):
+    body = json.dumps({"start": start, "end": end}).encode()
+    request = urllib.request.Request(f"{api}/videos/list", data=body, method="GET",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        videos = json.load(response)["videos"]
+    if location:
+        prefix = location_slug(location) + "/"
+        videos = [name for name in videos if name.startswith(prefix)]
+    return videos
+
+
+def measure(name, pid, function):
+    cpu_before = process_cpu_seconds(pid) if pid else None
+    started = time.perf_counter()
+    received, requests = function()
+    elapsed = time.perf_counter() - started
+    result = {
+        "mode": name,
+        "requests": requests,
+        "bytes": received,
+        "elapsed_s": elapsed,
+        "throughput_mb_s": received / elapsed / (1024 * 1024) if elapsed else None,
+    }
+    if cpu_before is not None:
+        result["server_cpu_s"] = process_cpu_seconds(pid) - cpu_before
+    print(f"{name:>12}: {received / 2 ** 20:8.1f} MB em {elapsed:6.2f} s "
+          f"({result['throughput_mb_s']:.1f} MB/s, {requests} requisições)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://localhost:5000")
+    parser.add_argument("--start", required=True)
+    parser.add_argument("--end", required=True)
+    parser.add_argument("--location")
+    parser.add_argument("--pid", type=int, help="PID do servidor (para medir CPU)")
+    parser.add_argument("--check-resume", action="store_true",
+                        help="Interrompe o zip no meio, retoma com Range e confere o resultado")
+    parser.add_argument("--output", help="Arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    clips = list_clips(args.api, args.start, args.end, args.location)
+    if not clips:
+        sys.exit("Nenhum clipe no intervalo.")
+    print(f"{len(clips)} clipes")
+
+    def sequential():
+        total = 0
+        for name in clips:
+            total += download(f"{args.api}/video/{urllib.parse.quote(name)}")[0]
+        return total, len(clips)
+
+    query = {"start": args.start, "end": args.end}
+    if args.location:
+        query["location"] = args.location
+
+    def archive(fmt):
+        url = f"{args.api}/videos/archive?" + urllib.parse.urlencode(dict(query, format=fmt))
+        return lambda: (download(url)[0], 1)
+
+    results = [
+        measure("sequencial", args.pid, sequential),
+        measure("zip", args.pid, archive("zip")),
+        measure("tar", args.pid, archive("tar")),
+    ]
+
+    report = {"clips": len(clips), "results": results}
+    if args.check_resume:
+        url = f"{args.api}/videos/archive?" + urllib.parse.urlencode(dict(query, format="zip"))
+        size, full, headers = download(url)
+        cut = size // 2
+        # Primeira metade (download "interrompido") e a retomada no mesmo SHA-1, sem guardar o arquivo
+        _, digest, _ = download(url, limit=cut)
+        request = urllib.request.Request(url, headers={"Range": f"bytes={cut}-", "If-Range": headers["ETag"]})
+        received = 0
+        with urllib.request.urlopen(request) as response:
+            status = response.status
+            while True:
+                chunk = response.read(CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                received += len(chunk)
+        ok = status == 206 and received == size - cut and digest.hexdigest() == full.hexdigest()
+        report["resume"] = {"size": size, "cut": cut, "status": status, "ok": ok}
+        print(f"Retomada no byte {cut} de {size}: {'OK' if ok else 'FALHOU'}")
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
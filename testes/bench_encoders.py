@@ -0,0 +1,258 @@
+"""
+Benchmark dos codecs/contêineres (OpenCV) e presets (ffmpeg) usados na gravação.
+
+Para cada combinação de codec, sequência de frames e resolução, mede:
+fps de codificação, CPU por frame (processo + ffmpeg), pico de memória (RSS),
+bytes por segundo de vídeo e o tempo para finalizar o arquivo (release).
+Cada caso roda num subprocesso próprio, para o pico de RSS não misturar casos.
+Não precisa de câmera.
+
+Sequências:
+    synthetic  bloco em movimento sobre degradê (SyntheticSource, caso fácil)
+    noise      ruído aleatório (pior caso para o encoder)
+    file:<arq> vídeo gravado, redimensionado para cada resolução
+
+Uso:
+    python testes/bench_encoders.py --resolutions 640x480 1280x720 --frames 300 \\
+        --json resultado.json --csv resultado.csv
+    python testes/bench_encoders.py --sequences synthetic file:Videos/exemplo.mp4 \\
+        --presets ultrafast veryfast medium
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.Encoders import make_encoder
+from Classes.FrameSources import FileSource, SyntheticSource
+from teste_encoders import CODECS
+
+# Codecs do ffmpeg testados com cada preset (os demais não têm preset)
+FFMPEG_CODECS = [('avc1', '.mp4'), ('hvc1', '.mp4'), ('AV01', '.mp4')]
+FFMPEG_PRESETS = ['ultrafast', 'veryfast', 'medium']
+
+# Frames distintos guardados em memória por caso; a sequência é repetida até --frames
+POOL_FRAMES = 30
+
+CSV_FIELDS = [
+    "backend", "codec", "container", "preset", "sequence", "width", "height", "fps", "frames",
+    "status", "encode_fps", "cpu_ms_per_frame", "peak_rss_mb", "encoder_peak_rss_mb",
+    "bytes_per_s", "finalize_s", "file_bytes", "error",
+]
+
+
+def load_sequence(sequence, width, height, fps, count):
+    """Gera (ou lê) até `count` frames BGR da sequência, na resolução pedida."""
+    frames = []
+    if sequence == "synthetic":
+        source = SyntheticSource(width, height, fps, realtime=False)
+        for _ in range(count):
+            frames.append(source.read()[1])
+    elif sequence == "noise":
+        rng = np.random.default_rng(0)
+        for _ in range(count):
+            frames.append(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    elif sequence.startswith("file:"):
+        source = FileSource(sequence[5:], realtime=False, loop=True)
+        if not source.isOpened():
+            raise RuntimeError(f"Não foi possível abrir {sequence[5:]}")
+        for _ in range(count):
+            ok, frame = source.read()
+            if not ok:
+                break
+            frames.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+        source.release()
+    else:
+        raise ValueError(f"Sequência desconhecida: {sequence}")
+    if not frames:
+        raise RuntimeError(f"Sequência vazia: {sequence}")
+    return frames
+
+
+def cpu_seconds():
+    """CPU (usuário + sistema) deste processo e dos filhos já finalizados (o ffmpeg)."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run_case(case):
+    """Executa um caso (no subprocesso) e retorna o dicionário de resultado."""
+    result = dict(case, status="ok", encode_fps=None, cpu_ms_per_frame=None, peak_rss_mb=None,
+                  encoder_peak_rss_mb=None, bytes_per_s=None, finalize_s=None, file_bytes=None, error="")
+    width, height, fps, frames = case["width"], case["height"], case["fps"], case["frames"]
+    options = {}
+    if case["backend"] == "ffmpeg":
+        options = {"preset": case["preset"], "crf": case["crf"], "threads": case["threads"]}
+    try:
+        pool = load_sequence(case["sequence"], width, height, fps, min(frames, POOL_FRAMES))
+        encoder = make_encoder(case["codec"], case["backend"], **options)
+    except Exception as e:
+        result.update(status="unavailable", error=str(e))
+        return result
+
+    directory = tempfile.mkdtemp(prefix="bench_encoders_")
+    path = os.path.join(directory, "clip" + case["container"])
+    cpu_start = cpu_seconds()
+    started = time.perf_counter()
+    try:
+        writer = encoder.open(path, fps, (width, height))
+    except Exception as e:
+        # FourCC/encoder não suportado nesta instalação
+        shutil.rmtree(directory, ignore_errors=True)
+        result.update(status="unavailable", error=str(e))
+        return result
+    try:
+        for i in range(frames):
+            writer.write(pool[i % len(pool)])
+        written = time.perf_counter()
+        writer.release()
+        finished = time.perf_counter()
+        cpu_total = cpu_seconds() - cpu_start
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size == 0:
+            raise RuntimeError("Arquivo de saída vazio")
+    except Exception as e:
+        result.update(status="failed", error=str(e))
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # ru_maxrss está em KB no Linux
+    result.update(
+        encode_fps=frames / (finished - started),
+        cpu_ms_per_frame=cpu_total * 1000 / frames,
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        encoder_peak_rss_mb=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        bytes_per_s=size / (frames / fps),
+        finalize_s=finished - written,
+        file_bytes=size,
+    )
+    return result
+
+
+def build_cases(args):
+    cases = []
+    for sequence in args.sequences:
+        for resolution in args.resolutions:
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            base = {"sequence": sequence, "width": width, "height": height, "fps": args.fps,
+                    "frames": args.frames, "preset": "", "crf": args.crf, "threads": args.threads}
+            for codec, container in CODECS:
+                if args.codecs and codec not in args.codecs:
+                    continue
+                cases.append(dict(base, backend="opencv", codec=codec, container=container))
+            if args.no_ffmpeg:
+                continue
+            for codec, container in FFMPEG_CODECS:
+                if args.codecs and codec not in args.codecs:
+                    continue
+                for preset in args.presets:
+                    cases.append(dict(base, backend="ffmpeg", codec=codec, container=container, preset=preset))
+    return cases
+
+
+def run_isolated(case, timeout):
+    """Roda o caso num subprocesso novo e lê o resultado (JSON) da saída padrão."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (subprocess.TimeoutExpired, ValueError, IndexError) as e:
+        return dict(case, status="failed", error=f"subprocesso: {e}")
+
+
+def machine_info():
+    """Dados da máquina, para comparar resultados entre hardwares."""
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith(("model name", "Model")):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    ffmpeg = shutil.which("ffmpeg")
+    ffmpeg_version = None
+    if ffmpeg:
+        ffmpeg_version = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    return {
+        "hostname": platform.node(),
+        "machine": platform.machine(),
+        "cpu": cpu,
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "ffmpeg": ffmpeg_version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", default=["640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--sequences", nargs="+", default=["synthetic", "noise"],
+                        help="synthetic, noise ou file:<caminho do vídeo>")
+    parser.add_argument("--codecs", nargs="+", help="Só estes FourCC (padrão: todos)")
+    parser.add_argument("--presets", nargs="+", default=FFMPEG_PRESETS)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--crf", type=int, default=23)
+    parser.add_argument("--threads", type=int, default=0, help="Threads do ffmpeg (0 = automático)")
+    parser.add_argument("--no-ffmpeg", action="store_true", help="Só o backend OpenCV")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Tempo máximo por caso (s)")
+    parser.add_argument("--json", help="Arquivo JSON com o resultado")
+    parser.add_argument("--csv", help="Arquivo CSV com o resultado")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        # Modo interno: um caso por subprocesso
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    if args.no_ffmpeg is False and shutil.which("ffmpeg") is None:
+        print("ffmpeg não encontrado: testando só o backend OpenCV.")
+        args.no_ffmpeg = True
+
+    results = []
+    print(f"{'Backend':<7} | {'Codec':<5} | {'Preset':<9} | {'Sequência':<10} | {'Resolução':<9} | "
+          f"{'fps':>7} | {'CPU ms/f':>8} | {'RSS MB':>7} | {'kB/s':>8} | {'final s':>7}")
+    print("-" * 100)
+    for case in build_cases(args):
+        r = run_isolated(case, args.timeout)
+        results.append(r)
+        resolution = f"{r['width']}x{r['height']}"
+        if r["status"] != "ok":
+            print(f"{r['backend']:<7} | {r['codec']:<5} | {r['preset']:<9} | {r['sequence'][:10]:<10} | "
+                  f"{resolution:<9} | {r['status']}: {r['error'][:40]}")
+            continue
+        print(f"{r['backend']:<7} | {r['codec']:<5} | {r['preset']:<9} | {r['sequence'][:10]:<10} | "
+              f"{resolution:<9} | {r['encode_fps']:>7.1f} | {r['cpu_ms_per_frame']:>8.2f} | "
+              f"{max(r['peak_rss_mb'], r['encoder_peak_rss_mb']):>7.1f} | {r['bytes_per_s'] / 1000:>8.1f} | "
+              f"{r['finalize_s']:>7.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    main()
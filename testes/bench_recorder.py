@@ -0,0 +1,242 @@
+"""
+Teste de carga de ponta a ponta do Recorder, sem câmera: captura headless
+de uma fonte sintética ou de um vídeo gravado, gatilhos em horários fixos e
+relatório de frames perdidos, latência captura -> buffer, latência de
+exportação, pico de memória e uso de CPU. Serve de linha de base para
+comparar cada mudança de desempenho.
+
+Uso:
+    python testes/bench_recorder.py --duration 60 --triggers 20 35 50 --json base.json
+    python testes/bench_recorder.py --source file:Videos/exemplo.mp4 --speed 2 --trigger-every 10
+    python testes/bench_recorder.py --width 1920 --height 1080 --buffer-mode segments \\
+        --encoder-backend ffmpeg --codec avc1
+    python testes/bench_recorder.py --buffer-mode jpeg --stime 120 --budget-mb 128 --trigger-every 30
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.Recorder import Recorder
+
+
+def source_options(args):
+    """Descrição da fonte no formato de open_source()."""
+    if args.source == "synthetic":
+        return {"kind": "synthetic", "width": args.width, "height": args.height, "fps": args.fps,
+                "speed": args.speed}
+    if args.source.startswith("file:"):
+        return {"kind": "file", "path": args.source[5:], "fps": args.fps, "speed": args.speed}
+    if args.source.startswith("camera:"):
+        return {"kind": "camera", "index": int(args.source[7:])}
+    raise ValueError(f"Fonte desconhecida: {args.source}")
+
+
+def read_status(field):
+    """Valor (em MB) de um campo de /proc/self/status, ex: VmRSS ou VmHWM."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def cpu_seconds():
+    """CPU do processo (todas as threads) e dos filhos finalizados, como o ffmpeg."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class Sampler(threading.Thread):
+    """Amostra RSS e CPU a cada `interval` segundos durante o teste."""
+
+    def __init__(self, interval=1.0):
+        super().__init__(name="Sampler", daemon=True)
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self.samples = []
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        last_wall, last_cpu = time.perf_counter(), cpu_seconds()
+        while not self._stop_event.wait(self._interval):
+            wall, cpu = time.perf_counter(), cpu_seconds()
+            self.samples.append({
+                "rss_mb": read_status("VmRSS"),
+                "cpu_percent": (cpu - last_cpu) / (wall - last_wall) * 100,
+            })
+            last_wall, last_cpu = wall, cpu
+
+
+def summarize(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="synthetic", help="synthetic, file:<vídeo> ou camera:<índice>")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--speed", type=float, default=1.0, help="Ritmo da fonte (2 = duas vezes mais rápido)")
+    parser.add_argument("--stime", type=int, default=15, help="Segundos no buffer (tamanho do clipe)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duração da captura (s)")
+    parser.add_argument("--triggers", type=float, nargs="*", default=[],
+                        help="Segundos (desde o início) em que um clipe é pedido")
+    parser.add_argument("--trigger-every", type=float, help="Pede um clipe a cada N segundos")
+    parser.add_argument("--buffer-mode", default=Recorder.BUFFER_RAW,
+                        choices=[Recorder.BUFFER_RAW, Recorder.BUFFER_SEGMENTS, Recorder.BUFFER_JPEG])
+    parser.add_argument("--budget-mb", type=float, default=256.0, help="Orçamento do anel JPEG (MB)")
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument("--jpeg-workers", type=int, default=2, help="Threads de compressão JPEG")
+    parser.add_argument("--encoder-backend", default="opencv", choices=["opencv", "ffmpeg"])
+    parser.add_argument("--codec", default="mp4v")
+    parser.add_argument("--container", default=".mp4")
+    parser.add_argument("--export-workers", type=int, default=1)
+    parser.add_argument("--output-dir", help="Pasta dos clipes (padrão: temporária, apagada no fim)")
+    parser.add_argument("--json", help="Arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    schedule = sorted(args.triggers)
+    if args.trigger_every:
+        schedule = sorted(set(schedule) | {
+            args.trigger_every * i for i in range(1, int(args.duration / args.trigger_every) + 1)
+        })
+
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="bench_recorder_")
+    recorder = Recorder(
+        "bench", "127.0.0.1", args.height, args.width, output_dir, source=source_options(args),
+        frame=args.fps, stime=args.stime, buffer_mode=args.buffer_mode,
+        encoder_backend=args.encoder_backend, export_workers=args.export_workers,
+        jpeg_buffer={"budget_mb": args.budget_mb, "quality": args.jpeg_quality, "workers": args.jpeg_workers},
+    )
+
+    exports = []
+    exports_lock = threading.Lock()
+
+    def on_exported(future, requested=None):
+        done = time.time()
+        with exports_lock:
+            if future.exception() is not None:
+                exports.append({"requested_at": requested, "error": str(future.exception())})
+                return
+            result = future.result()
+            exports.append({
+                "requested_at": requested,
+                "export_latency_s": done - requested,
+                "encode_s": result.get("encode_s"),
+                "frames": result.get("frames"),
+            })
+
+    sampler = Sampler()
+    sampler.start()
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    recorder.start_headless(args.codec, args.container)
+    started = time.perf_counter()
+
+    refused = 0
+    for at in schedule:
+        if at >= args.duration:
+            break
+        time.sleep(max(0.0, started + at - time.perf_counter()))
+        requested = time.time()
+        future = recorder.export_clip(args.codec, args.container, block=False)
+        if future is None:
+            refused += 1
+        else:
+            future.add_done_callback(lambda f, requested=requested: on_exported(f, requested))
+    time.sleep(max(0.0, started + args.duration - time.perf_counter()))
+
+    capture = recorder.get_capture_stats()
+    buffer_stats = recorder.get_buffer_stats()
+    capture_wall = time.perf_counter() - started
+    export_metrics = recorder.get_export_metrics()
+    # Espera os clipes pendentes
+    recorder.stop_headless()
+    cpu_total, wall_total = cpu_seconds() - cpu_start, time.perf_counter() - wall_start
+    sampler.stop()
+    sampler.join()
+
+    # Frames que a fonte simulada gerou no período (câmera: desconhecido)
+    expected = None
+    if args.speed and not args.source.startswith("camera:"):
+        expected = int(capture_wall * args.fps * args.speed)
+    report = {
+        "config": vars(args),
+        "frames": {
+            "captured": capture["frames"],
+            "expected": expected,
+            "dropped_by_source": capture["dropped"],
+            "grab_failures": capture["failures"],
+            "fps": capture["fps"],
+            "jitter_ms": capture["jitter_ms"],
+            "interval_max_ms": capture["interval_max_ms"],
+        },
+        "capture_to_buffer_ms": {"mean": capture["latency_mean_ms"], "max": capture["latency_max_ms"]},
+        "export": {
+            "requested": len(schedule),
+            "refused": refused,
+            "failed": sum(1 for e in exports if "error" in e),
+            "latency_s": summarize(e.get("export_latency_s") for e in exports),
+            "encode_s": summarize(e.get("encode_s") for e in exports),
+            "queue": export_metrics,
+        },
+        "jpeg_buffer": buffer_stats,
+        "memory_mb": {
+            "high_water": read_status("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "children_high_water": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+            "rss": summarize(s["rss_mb"] for s in sampler.samples),
+        },
+        "cpu": {
+            "percent_mean": cpu_total / wall_total * 100,
+            "percent_samples": summarize(s["cpu_percent"] for s in sampler.samples),
+        },
+    }
+
+    f, e = report["frames"], report["export"]
+    print(f"Frames: {f['captured']} capturados ({f['fps']:.1f} fps), {f['dropped_by_source']} perdidos, "
+          f"jitter {f['jitter_ms']:.2f} ms")
+    if report["capture_to_buffer_ms"]["mean"] is not None:
+        print(f"Captura -> buffer: média {report['capture_to_buffer_ms']['mean']:.2f} ms, "
+              f"máx {report['capture_to_buffer_ms']['max']:.2f} ms")
+    if e["latency_s"]:
+        print(f"Exportação: {e['latency_s']['count']} clipes, latência média {e['latency_s']['mean']:.2f} s "
+              f"(p95 {e['latency_s']['p95']:.2f} s), {e['refused']} recusados, {e['failed']} falhas")
+    if buffer_stats is not None:
+        print(f"Anel JPEG: {buffer_stats['bytes'] / 2 ** 20:.1f} de {buffer_stats['budget_bytes'] / 2 ** 20:.0f} MB, "
+              f"janela {buffer_stats['window_s']:.1f} s de {args.stime} s, "
+              f"compressão {buffer_stats['compress_ms_mean'] or 0:.2f} ms/frame "
+              f"({buffer_stats['compression_ratio'] or 0:.1f}x), {buffer_stats['dropped']} descartados")
+    print(f"Memória: pico {report['memory_mb']['high_water']:.1f} MB | "
+          f"CPU média {report['cpu']['percent_mean']:.1f}%")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+    if not args.output_dir:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark do endpoint /video/<filename>.
+
+Faz pedidos parciais (Range) aleatórios, como um player avançando o vídeo,
+e mede vazão e CPU do servidor por requisição (lida de /proc/<pid>/stat).
+
+Uso: rode o servidor (versão atual e a anterior, ex: baseline do git) e compare:
+    gunicorn -w 1 -b 0.0.0.0:5000 api_solver:app &
+    python testes/bench_video_api.py --url http://localhost:5000/video/clip.mp4 --pid $!
+"""
+import argparse
+import json
+import os
+import random
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def process_cpu_seconds(pid):
+    """CPU (usuário + sistema) do processo e dos filhos já finalizados, em segundos."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    utime, stime, cutime, cstime = (int(x) for x in fields[11:15])
+    return (utime + stime + cutime + cstime) / ticks
+
+
+def file_size(url):
+    request = urllib.request.Request(url, method="HEAD")
+    with urllib.request.urlopen(request) as response:
+        return int(response.headers["Content-Length"])
+
+
+def fetch(url, size, range_size):
+    headers = {}
+    if range_size:
+        start = random.randrange(0, max(1, size - range_size))
+        headers["Range"] = f"bytes={start}-{start + range_size - 1}"
+    request = urllib.request.Request(url, headers=headers)
+    received = 0
+    with urllib.request.urlopen(request) as response:
+        while True:
+            data = response.read(256 * 1024)
+            if not data:
+                break
+            received += len(data)
+    return received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="URL completa de um vídeo")
+    parser.add_argument("--pid", type=int, help="PID do servidor (para medir CPU)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--range-size", type=int, default=1024 * 1024,
+                        help="Bytes por pedido parcial (0 = arquivo inteiro)")
+    parser.add_argument("--output", help="Arquivo JSON com o resultado")
+    args = parser.parse_args()
+
+    size = file_size(args.url)
+    cpu_before = process_cpu_seconds(args.pid) if args.pid else None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        received = sum(pool.map(lambda _: fetch(args.url, size, args.range_size), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "url": args.url,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "range_size": args.range_size,
+        "elapsed_s": elapsed,
+        "requests_per_s": args.requests / elapsed,
+        "throughput_mb_s": received / elapsed / (1024 * 1024),
+    }
+    if cpu_before is not None:
+        cpu = process_cpu_seconds(args.pid) - cpu_before
+        result["server_cpu_s"] = cpu
+        result["server_cpu_ms_per_request"] = cpu * 1000 / args.requests
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
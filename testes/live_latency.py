@@ -0,0 +1,51 @@
+"""
+Mede a latência da transmissão ao vivo (HLS) servida pelo api_solver.
+
+Para cada leitura da playlist calcula quanto tempo se passou desde o início
+do segmento mais novo (EXT-X-PROGRAM-DATE-TIME: relógio do ffmpeg quando o
+segmento começou, não o horário de captura) até ele ficar disponível para
+os espectadores. O atraso entre a captura e o envio ao ffmpeg não entra
+nessa conta; ele aparece em HLSLiveStream.stats()['capture_to_encoder_s']. A latência ponta a ponta de um
+player é aproximadamente esse valor + o buffer do player (normalmente 2-3
+segmentos); para medir no player compare o horário desenhado na imagem
+(stamp_time) com o relógio de quem assiste.
+
+Uso: python testes/live_latency.py http://localhost:5000/live/quadra_3/index.m3u8
+"""
+import statistics
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+
+def newest_segment(playlist):
+    """Retorna (início no relógio do ffmpeg, duração) do último segmento da playlist."""
+    program_date, duration = None, None
+    for line in playlist.splitlines():
+        if line.startswith("#EXT-X-PROGRAM-DATE-TIME:"):
+            program_date = datetime.fromisoformat(line.split(":", 1)[1].replace("Z", "+00:00")).timestamp()
+        elif line.startswith("#EXTINF:"):
+            duration = float(line.split(":", 1)[1].split(",")[0])
+    return program_date, duration
+
+
+def main(url, samples=30):
+    latencies = []
+    last_start = None
+    while len(latencies) < samples:
+        with urllib.request.urlopen(url) as response:
+            playlist = response.read().decode()
+        start, duration = newest_segment(playlist)
+        if start is not None and start != last_start:
+            # Segmento novo: já está completo, então a latência mínima é o fim dele
+            latency = time.time() - (start + duration)
+            latencies.append(latency)
+            last_start = start
+            print(f"segmento {datetime.fromtimestamp(start):%H:%M:%S.%f} disponível após {latency * 1000:.0f} ms")
+        time.sleep(0.1)
+    print(f"mediana: {statistics.median(latencies) * 1000:.0f} ms, máx: {max(latencies) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,164 @@
+"""
+Servidor MJPEG local que simula uma câmera IP, alimentado por um vídeo
+(em loop) ou pela fonte sintética. Permite simular quedas da câmera.
+
+Uso:
+    python testes/mjpeg_server.py --file Videos/exemplo.mp4 --port 8090
+    python testes/mjpeg_server.py --width 1280 --height 720 --outage-every 30 --outage-s 5
+    # Recorder("Quadra 1", "http://127.0.0.1:8090/video.mjpg", 480, 640, "Videos/")
+
+Para testar RTSP, publique o mesmo arquivo num servidor RTSP (ex: mediamtx):
+    ffmpeg -re -stream_loop -1 -i Videos/exemplo.mp4 -c copy -f rtsp rtsp://127.0.0.1:8554/quadra
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.FrameSources import FileSource, SyntheticSource
+
+BOUNDARY = "frame"
+
+
+class MJPEGServer:
+    """
+    Codifica os frames em JPEG uma vez por tick (no fps da fonte) e envia o
+    mesmo JPEG para todos os clientes em multipart/x-mixed-replace.
+    """
+
+    def __init__(self, path: str = None, width: int = 640, height: int = 480, fps: float = 30.0,
+                 host: str = "127.0.0.1", port: int = 8090, quality: int = 80):
+        if path:
+            self._source = FileSource(path, realtime=True, loop=True, fps=fps)
+        else:
+            self._source = SyntheticSource(width, height, fps)
+        self._quality = quality
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._down_until = 0.0
+        self._stop_event = threading.Event()
+        self.frames_sent = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/video.mjpg":
+                    self.send_error(404)
+                    return
+                if server.is_down():
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                seq = 0
+                try:
+                    while not server.is_down():
+                        jpeg, seq = server.wait_frame(seq)
+                        if jpeg is None:
+                            break
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                        server.frames_sent += 1
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                # Queda simulada: fecha a conexão sem aviso
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://{host}:{self._httpd.server_address[1]}/video.mjpg"
+        self._threads = [
+            threading.Thread(target=self._produce, name="MJPEG-producer", daemon=True),
+            threading.Thread(target=self._httpd.serve_forever, name="MJPEG-http", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        print(f"Câmera MJPEG simulada em: {self.url}")
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._source.release()
+
+    def outage(self, seconds: float):
+        """Derruba as conexões e recusa novas por `seconds` segundos."""
+        print(f"Queda simulada de {seconds:.1f}s")
+        self._down_until = time.monotonic() + seconds
+        with self._cond:
+            self._cond.notify_all()
+
+    def is_down(self):
+        return self._stop_event.is_set() or time.monotonic() < self._down_until
+
+    def wait_frame(self, seq):
+        """Espera um JPEG mais novo que `seq`; retorna (jpeg, seq) ou (None, seq) se parado."""
+        with self._cond:
+            while self._seq == seq and not self.is_down():
+                self._cond.wait(1.0)
+            if self.is_down():
+                return None, seq
+            return self._jpeg, self._seq
+
+    def _produce(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self._quality]
+        while not self._stop_event.is_set():
+            ok, frame = self._source.read()
+            if not ok:
+                break
+            ok, jpeg = cv2.imencode(".jpg", frame, params)
+            with self._cond:
+                self._jpeg = jpeg.tobytes()
+                self._seq += 1
+                self._cond.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Vídeo reproduzido em loop (padrão: fonte sintética)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--outage-every", type=float, help="Simula uma queda a cada N segundos")
+    parser.add_argument("--outage-s", type=float, default=5.0, help="Duração de cada queda")
+    args = parser.parse_args()
+
+    server = MJPEGServer(args.file, args.width, args.height, args.fps, args.host, args.port).start()
+    try:
+        while True:
+            if args.outage_every:
+                time.sleep(args.outage_every)
+                server.outage(args.outage_s)
+            else:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
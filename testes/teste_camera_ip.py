@@ -0,0 +1,62 @@
+"""
+Testa a captura de câmera IP de ponta a ponta contra a câmera MJPEG
+simulada (mjpeg_server.py): Recorder headless lendo de ip_address, uma
+queda no meio do teste e um clipe pedido depois da reconexão.
+
+Uso:
+    python testes/teste_camera_ip.py --duration 20 --outage-at 8 --outage-s 3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.Recorder import Recorder
+from mjpeg_server import MJPEGServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="Vídeo da câmera simulada (padrão: fonte sintética)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--outage-at", type=float, default=8.0, help="Segundo em que a câmera cai")
+    parser.add_argument("--outage-s", type=float, default=3.0, help="Duração da queda")
+    parser.add_argument("--stime", type=int, default=5)
+    args = parser.parse_args()
+
+    server = MJPEGServer(args.file, args.width, args.height, args.fps, port=0).start()
+    output_dir = tempfile.mkdtemp(prefix="teste_camera_ip_")
+    recorder = Recorder("camera_ip", server.url, args.height, args.width, output_dir,
+                        frame=int(args.fps), stime=args.stime)
+    recorder.start_headless("mp4v", ".mp4")
+    started = time.monotonic()
+
+    time.sleep(args.outage_at)
+    server.outage(args.outage_s)
+    time.sleep(max(0.0, args.duration - (time.monotonic() - started)))
+
+    future = recorder.export_clip("mp4v", ".mp4")
+    clip = future.result() if future is not None else None
+    stats = recorder.get_capture_stats()
+    recorder.stop_headless()
+    server.stop()
+
+    network = stats.pop("network")
+    print(json.dumps({"capture": stats, "network": network}, indent=2, default=str))
+    print(f"Quedas: {network['outages']} ({network['outage_s']:.1f}s, ~{network['outage_lost_frames']} frames), "
+          f"descartados por atraso: {network['stale_dropped']}")
+    if clip is not None:
+        print(f"Clipe após a reconexão: {clip['frames']} frames em {clip['path']}")
+    ok = network["outages"] >= 1 and network["connected"] and clip is not None
+    print("OK" if ok else "FALHOU")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 import cv2
 import os
 
-def test_codecs():
-    # Lista de codecs para testar (FourCC, Extensão)
-    codecs = [
-        ('mp4v', '.mp4'),  # MPEG-4 (O mais provável de funcionar)
-        ('XVID', '.avi'),  # Clássico Linux
-        ('MJPG', '.avi'),  # Quase universal
-        ('avc1', '.mp4'),  # H.264
-        ('vp09', '.avixxxxxxxxxxxxx'), # VP9
-    ]
-    
+# Lista de codecs para testar (FourCC, Extensão); usada também por bench_encoders.py
+CODECS = [
+    ('mp4v', '.mp4'),  # MPEG-4 (O mais provável de funcionar)
+    ('XVID', '.avi'),  # Clássico Linux
+    ('MJPG', '.avi'),  # Quase universal
+    ('avc1', '.mp4'),  # H.264
+    ('AV01', '.mp4'),  # AV1 (Exemplos/teste_recorder.py)
+    ('vp09', '.avixxxxxxxxxxxxx'), # VP9
+]
+
+def test_codecs(codecs=CODECS):
     print(f"{'Codec':<10} | {'Ext':<5} | {'Resultado'}")
     print("-" * 30)
     
@@ -0,0 +1,105 @@
+"""
+Confere o /videos/extract com horários de captura conhecidos: grava um
+clipe de uma fonte sintética com o catálogo, extrai [t, t + 5] e verifica
+que o primeiro frame do trecho é o frame capturado em t (ou no keyframe
+anterior, até --tolerance segundos antes).
+
+O bloco branco da SyntheticSource anda 8 px por frame; com a largura
+padrão ele só repete depois da duração do clipe, então cada frame do
+trecho corresponde a um único frame do clipe original.
+
+Uso (precisa do ffmpeg/ffprobe no PATH):
+    python testes/teste_extract.py --stime 12 --offset 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from Classes.ClipExtractor import ClipExtractor
+from Classes.ClipIndex import parse_clip_timestamp
+from Classes.Recorder import Recorder
+from bdManager import ClipCatalog
+
+
+def read_frames(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=240)
+    parser.add_argument("--fps", type=int, default=10)
+    parser.add_argument("--stime", type=int, default=12, help="Duração do clipe gravado (s)")
+    parser.add_argument("--offset", type=float, default=4.0, help="Início do trecho, em segundos após o clipe")
+    parser.add_argument("--length", type=float, default=5.0, help="Duração do trecho (s)")
+    parser.add_argument("--tolerance", type=float, default=2.0,
+                        help="Quanto o trecho pode começar antes de t (volta até o keyframe)")
+    args = parser.parse_args()
+
+    output_dir = tempfile.mkdtemp(prefix="teste_extract_")
+    catalog = ClipCatalog(os.path.join(output_dir, "catalog.db"))
+    recorder = Recorder("teste", "127.0.0.1", args.height, args.width, os.path.join(output_dir, "Videos"),
+                        source={"kind": "synthetic", "width": args.width, "height": args.height,
+                                "fps": args.fps},
+                        frame=args.fps, stime=args.stime, catalog=catalog)
+    try:
+        recorder.start_headless("mp4v", ".mp4")
+        time.sleep(args.stime + 1)
+        future = recorder.export_clip("mp4v", ".mp4", block=False)
+        if future is None:
+            sys.exit("Exportação recusada.")
+        future.result(timeout=120)
+    finally:
+        recorder.stop_headless()
+
+    clips = catalog.list_clips()
+    if len(clips) != 1:
+        sys.exit(f"Esperado 1 clipe no catálogo, encontrados {len(clips)}.")
+    row = clips[0]
+    t = row["start_time"] + args.offset
+    name_start = parse_clip_timestamp(os.path.basename(row["path"]))
+    print(f"Clipe: {row['path']}")
+    print(f"Captura: {row['start_time']:.3f} -> {row['end_time']:.3f} (nome: {name_start:.0f})")
+
+    extractor = ClipExtractor(os.path.join(output_dir, "Videos"), cache_dir=os.path.join(output_dir, "cache"),
+                              catalog=catalog)
+    path, _ = extractor.extract(t, t + args.length)
+    extracted = read_frames(path)
+    original = read_frames(row["path"])
+    if not extracted or not original:
+        sys.exit("Não foi possível ler os vídeos.")
+
+    # Frame do clipe original mais parecido com o primeiro frame do trecho
+    errors = [float(np.mean(cv2.absdiff(frame, extracted[0]))) for frame in original]
+    index = int(np.argmin(errors))
+    wall = row["start_time"] + index / args.fps
+    print(f"Pedido t = {t:.3f}; primeiro frame do trecho = frame {index} do clipe, capturado em {wall:.3f} "
+          f"({wall - t:+.3f} s)")
+    print(f"Duração do trecho: {len(extracted) / args.fps:.2f} s (pedido: {args.length:.2f} s)")
+
+    ok = t - args.tolerance <= wall <= t + 1.0 / args.fps
+    ok = ok and len(extracted) / args.fps >= args.length - 1.0 / args.fps
+    print("OK" if ok else "FALHOU")
+    catalog.close()
+    shutil.rmtree(output_dir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()